@@ -0,0 +1,120 @@
+from __future__ import annotations
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import ProductDB, BrandDB, OrderDB, OrderItemDB
+from .crud import PRODUCT_COLUMNS, orders_query, products_query, seed_rows
+
+# AsyncSession counterparts of the functions in `crud.py`, for request
+# handlers running on the event loop. Background threads keep using `crud`.
+
+
+async def init_db(db: AsyncSession):
+  """Seed database with initial data if empty, one INSERT per table."""
+  if (await db.execute(select(ProductDB.id).limit(1))).first() is not None:
+    return
+
+  product_rows, brand_rows = seed_rows()
+  await db.execute(insert(ProductDB), product_rows)
+  await db.execute(insert(BrandDB), brand_rows)
+  await db.commit()
+
+
+async def get_product_by_id(db: AsyncSession, product_id: str) -> ProductDB | None:
+  return await db.get(ProductDB, product_id)
+
+
+async def get_product_row(db: AsyncSession, product_id: str) -> tuple | None:
+  """Fetch one product as a plain tuple in `PRODUCT_FIELDS` order."""
+  row = (await db.execute(select(*PRODUCT_COLUMNS).where(ProductDB.id == product_id))).first()
+  return None if row is None else tuple(row)
+
+
+async def list_product_rows(db: AsyncSession) -> list[tuple]:
+  """Fetch every product as plain tuples ordered by id, skipping ORM hydration."""
+  rows = await db.execute(select(*PRODUCT_COLUMNS).order_by(ProductDB.id))
+  return [tuple(row) for row in rows]
+
+
+async def list_products(
+  db: AsyncSession,
+  q: str | None = None,
+  brand: str | None = None,
+  category: str | None = None,
+  min_price: float | None = None,
+  max_price: float | None = None,
+) -> list[ProductDB]:
+  return list((await db.scalars(products_query(q, brand, category, min_price, max_price))).all())
+
+
+async def get_categories(db: AsyncSession) -> list[str]:
+  categories = await db.scalars(select(ProductDB.category).distinct())
+  return sorted([cat for cat in categories if cat])
+
+
+async def get_brands(db: AsyncSession) -> list[BrandDB]:
+  return list((await db.scalars(select(BrandDB))).all())
+
+
+async def create_order(
+  db: AsyncSession,
+  order_id: str,
+  date: str,
+  total: float,
+  product_ids: list[tuple[str, int]],
+  price_book_version: str | None = None,
+  commit: bool = True,
+) -> OrderDB:
+  """Create an order with products and quantities.
+
+  Product ids must already be validated; see `pricing.PriceBook.quote`. With
+  `commit=False` the rows are only flushed, for callers that commit more in
+  the same transaction.
+  """
+  order = OrderDB(
+    id=order_id, date=date, status="Processing", total=total, payment_status="pending",
+    price_book_version=price_book_version,
+  )
+  db.add(order)
+  await db.flush()  # Flush to ensure order is created before adding items
+
+  db.add_all(
+    OrderItemDB(order_id=order_id, product_id=product_id, quantity=quantity)
+    for product_id, quantity in product_ids
+  )
+
+  if not commit:
+    await db.flush()
+    return order
+  await db.commit()
+  await db.refresh(order)
+  return order
+
+
+async def create_orders_bulk(db: AsyncSession, orders: list[dict], items: list[dict], commit: bool = True) -> None:
+  """Insert many orders and their items in one transaction, one executemany
+  INSERT per table."""
+  if orders:
+    await db.execute(insert(OrderDB), orders)
+  if items:
+    await db.execute(insert(OrderItemDB), items)
+  if commit:
+    await db.commit()
+
+
+async def list_orders(
+  db: AsyncSession,
+  status: str | None = None,
+  payment_status: str | None = None,
+  date_from: str | None = None,
+  date_to: str | None = None,
+  before: str | None = None,
+  limit: int | None = None,
+) -> list[OrderDB]:
+  """List orders newest first, with items and products eagerly loaded.
+
+  Eager loading is required here: lazy loads are not allowed on an
+  AsyncSession.
+  """
+  query = orders_query(status, payment_status, date_from, date_to, before, limit)
+  return list((await db.scalars(query)).all())
+
@@ -0,0 +1,539 @@
+from __future__ import annotations
+import base64
+import heapq
+import json
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .crud import list_product_rows
+from .database import SessionLocal
+from .invalidation_bus import InvalidationBus
+from .models import BrandDB, ProductDB
+from .search import SearchIndex
+from .serializers import PRODUCT_FIELDS, encode_product
+
+SORT_KEYS = ("price-asc", "price-desc", "rating-desc")
+
+# Upper bounds (exclusive) of the price facet buckets; the last bucket is open.
+PRICE_BUCKET_EDGES = (250, 500, 1000, 2000)
+
+# A facet group is kept as a bitmap (rows/8 bytes) only if it holds more than
+# 1/DENSE_GROUP_RATIO of the rows; below that its sorted int32 positions are
+# smaller. With thousands of small brands, bitmaps for all of them would take
+# brands x rows/8 bytes.
+DENSE_GROUP_RATIO = 32
+
+
+def to_bitmap(positions: Iterable[int], size: int) -> int:
+  """Pack row positions into an int with bit `pos` set for each."""
+  bits = bytearray((size + 7) // 8)
+  for pos in positions:
+    bits[pos >> 3] |= 1 << (pos & 7)
+  return int.from_bytes(bits, "little")
+
+
+def group_members(codes: array, groups: int) -> list[int | array]:
+  """The rows of each group code, rows with a negative code left out: a
+  bitmap for dense groups, a sorted position array for sparse ones."""
+  members = [array("i") for _ in range(groups)]
+  for pos, code in enumerate(codes):
+    if code >= 0:
+      members[code].append(pos)
+  size = len(codes)
+  return [
+    to_bitmap(group, size) if len(group) * DENSE_GROUP_RATIO > size else group
+    for group in members
+  ]
+
+
+def as_bitmap(group: int | array, size: int) -> int:
+  return group if isinstance(group, int) else to_bitmap(group, size)
+
+
+def count_in(bits: int, packed: bytes, group: int | array) -> int:
+  """Rows of `group` set in `bits`; `packed` is `bits` as little-endian bytes,
+  so a sparse group is counted without shifting the whole int per row."""
+  if isinstance(group, int):
+    return (bits & group).bit_count()
+  return sum(packed[pos >> 3] >> (pos & 7) & 1 for pos in group)
+
+
+def encode_cursor(sort: str | None, key: tuple) -> str:
+  raw = json.dumps([sort, *key], separators=(",", ":")).encode()
+  return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str | None) -> tuple:
+  """Decode a keyset cursor, raising ValueError if it is malformed or was
+  issued for a different sort order."""
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    cursor_sort, *key = json.loads(raw)
+  except (ValueError, TypeError) as e:
+    raise ValueError("Malformed cursor") from e
+  if cursor_sort != sort:
+    raise ValueError("Cursor does not match the requested sort")
+  if sort is None:
+    valid = len(key) == 1 and isinstance(key[0], str)
+  else:
+    valid = len(key) == 2 and isinstance(key[0], (int, float)) and isinstance(key[1], str)
+  if not valid:
+    raise ValueError("Malformed cursor")
+  return tuple(key)
+
+
+@dataclass
+class CatalogPage:
+  snapshot: "CatalogSnapshot"
+  positions: list[int]
+  total: int
+  next_cursor: str | None = None
+  facets: dict | None = None
+
+
+class CatalogSnapshot:
+  """Immutable, column-oriented copy of the products table.
+
+  Numeric and categorical attributes live in compact arrays indexed by row
+  position, so filters and sorts never touch ORM objects or the database.
+  """
+
+  def __init__(self, rows: list[tuple], version: int):
+    self.version = version
+    self.rows = rows
+    self.ids = [row[0] for row in rows]
+    self.positions = {product_id: pos for pos, product_id in enumerate(self.ids)}
+
+    self.brands = sorted({row[4] for row in rows})
+    self.categories = sorted({row[5] for row in rows if row[5]})
+    brand_codes = {name: code for code, name in enumerate(self.brands)}
+    category_codes = {name: code for code, name in enumerate(self.categories)}
+
+    self.price = array("d", (row[3] for row in rows))
+    self.rating = array("d", (row[8] for row in rows))
+    self.discount = array("i", (row[10] or 0 for row in rows))
+    self.brand_code = array("i", (brand_codes[row[4]] for row in rows))
+    self.category_code = array("i", (category_codes.get(row[5], -1) for row in rows))
+    self.price_bucket = array("i", (bisect_right(PRICE_BUCKET_EDGES, price) for price in self.price))
+
+    # Facet groups: the rows having each brand, category and price bucket,
+    # as bitmaps (bit `pos` set for row `pos`) or position arrays; see
+    # `group_members`.
+    self.all_bits = (1 << len(rows)) - 1
+    self.brand_rows = group_members(self.brand_code, len(self.brands))
+    self.category_rows = group_members(self.category_code, len(self.categories))
+    self.price_bucket_rows = group_members(self.price_bucket, len(PRICE_BUCKET_EDGES) + 1)
+    self._orderings: dict[str | None, tuple[list[int], array]] = {}
+    self._encoded: list[bytes | None] = [None] * len(rows)
+
+  def __len__(self) -> int:
+    return len(self.rows)
+
+  def get(self, product_id: str) -> tuple | None:
+    pos = self.positions.get(product_id)
+    return None if pos is None else self.rows[pos]
+
+  def as_dict(self, pos: int) -> dict:
+    return dict(zip(PRODUCT_FIELDS, self.rows[pos]))
+
+  def encoded(self, pos: int) -> bytes:
+    """JSON bytes for one product, encoded once per snapshot."""
+    body = self._encoded[pos]
+    if body is None:
+      body = self._encoded[pos] = encode_product(self.rows[pos])
+    return body
+
+  def _codes_matching(self, names: list[str], term: str) -> set[int]:
+    """Codes of the names equal to `term`, ignoring case."""
+    term = term.lower()
+    return {code for code, name in enumerate(names) if name.lower() == term}
+
+  def filter(
+    self,
+    brand: str | None = None,
+    category: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    positions: Iterable[int] | None = None,
+  ) -> list[int]:
+    """Return the row positions (all rows by default) matching every predicate."""
+    if positions is None:
+      positions = range(len(self.rows))
+
+    if brand:
+      codes = self._codes_matching(self.brands, brand)
+      brand_code = self.brand_code
+      positions = [pos for pos in positions if brand_code[pos] in codes]
+
+    if category:
+      codes = self._codes_matching(self.categories, category)
+      category_code = self.category_code
+      positions = [pos for pos in positions if category_code[pos] in codes]
+
+    if min_price is not None:
+      price = self.price
+      positions = [pos for pos in positions if price[pos] >= min_price]
+
+    if max_price is not None:
+      price = self.price
+      positions = [pos for pos in positions if price[pos] <= max_price]
+
+    return list(positions)
+
+  def _group_filter(self, groups: list[int | array], names: list[str], term: str | None) -> int:
+    if not term:
+      return self.all_bits
+    bits = 0
+    for code in self._codes_matching(names, term):
+      bits |= as_bitmap(groups[code], len(self.rows))
+    return bits
+
+  def _counts(self, bits: int, groups: list[int | array]) -> list[int]:
+    packed = bits.to_bytes((len(self.rows) + 7) // 8, "little")
+    return [count_in(bits, packed, group) for group in groups]
+
+  def _price_filter(self, min_price: float | None, max_price: float | None) -> int:
+    if min_price is None and max_price is None:
+      return self.all_bits
+    permutation, _ = self.ordering("price-asc")
+    price = self.price.__getitem__
+    start = 0 if min_price is None else bisect_left(permutation, min_price, key=price)
+    end = len(permutation) if max_price is None else bisect_right(permutation, max_price, key=price)
+    return to_bitmap(permutation[start:end], len(self.rows))
+
+  def facets(
+    self,
+    matched: int | None = None,
+    brand: str | None = None,
+    category: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+  ) -> dict:
+    """Count rows per brand, category and price bucket.
+
+    `matched` is the bitmap of search hits (all rows by default). Each facet
+    is counted with every filter applied except its own, so the counts show
+    what selecting another value of that facet would return.
+    """
+    matched = self.all_bits if matched is None else matched
+    by_brand = self._group_filter(self.brand_rows, self.brands, brand)
+    by_category = self._group_filter(self.category_rows, self.categories, category)
+    by_price = self._price_filter(min_price, max_price)
+
+    brands = [
+      {"value": name, "count": count}
+      for name, count in zip(self.brands, self._counts(matched & by_category & by_price, self.brand_rows))
+    ]
+    categories = [
+      {"value": name, "count": count}
+      for name, count in zip(self.categories, self._counts(matched & by_brand & by_price, self.category_rows))
+    ]
+    edges = (0, *PRICE_BUCKET_EDGES, None)
+    price = [
+      {"min": edges[i], "max": edges[i + 1], "count": count}
+      for i, count in enumerate(self._counts(matched & by_brand & by_category, self.price_bucket_rows))
+    ]
+    return {"brands": brands, "categories": categories, "price": price}
+
+  def sort_key(self, sort: str | None) -> Callable[[int], tuple]:
+    """Total order for `sort`; ties are broken by product id."""
+    ids, price, rating = self.ids, self.price, self.rating
+    if sort == "price-asc":
+      return lambda pos: (price[pos], ids[pos])
+    if sort == "price-desc":
+      return lambda pos: (-price[pos], ids[pos])
+    if sort == "rating-desc":
+      return lambda pos: (-rating[pos], ids[pos])
+    return lambda pos: (ids[pos],)
+
+  def ordering(self, sort: str | None) -> tuple[list[int], array]:
+    """Return the permutation of all rows in `sort` order and its inverse
+    (the rank of each row), built on first use and kept for the snapshot's
+    lifetime."""
+    ordering = self._orderings.get(sort)
+    if ordering is None:
+      permutation = sorted(range(len(self.rows)), key=self.sort_key(sort))
+      rank = array("i", bytes(array("i").itemsize * len(permutation)))
+      for i, pos in enumerate(permutation):
+        rank[pos] = i
+      ordering = self._orderings[sort] = (permutation, rank)
+    return ordering
+
+  def page(
+    self,
+    positions: list[int],
+    sort: str | None,
+    limit: int,
+    offset: int = 0,
+    after: tuple | None = None,
+  ) -> tuple[list[int], bool]:
+    """Select one page of `positions` in `sort` order, starting after the
+    keyset `after` (if given) and skipping `offset` rows. Returns the page
+    and whether more rows follow it."""
+    permutation, rank = self.ordering(sort)
+    start = 0 if after is None else bisect_right(permutation, after, key=self.sort_key(sort))
+    end = start + offset + limit
+
+    if len(positions) == len(self.rows):
+      window = permutation[start + offset:end]
+      return window, end < len(permutation)
+
+    if start:
+      positions = [pos for pos in positions if rank[pos] >= start]
+    window = heapq.nsmallest(offset + limit, positions, key=rank.__getitem__)[offset:]
+    return window, len(positions) > offset + limit
+
+
+class Catalog:
+  """Process-wide, read-mostly product catalog.
+
+  The first read loads the products table into a `CatalogSnapshot`; later
+  reads are served from memory until `invalidate()` bumps the version, after
+  which the next read rebuilds the snapshot. The full-text `SearchIndex` is
+  patched in place for the products named in invalidations rather than being
+  rebuilt. With an `InvalidationBus` attached, invalidations reach every
+  worker process and the bus generation is the version.
+  """
+
+  def __init__(self, session_factory=SessionLocal):
+    self._session_factory = session_factory
+    self._lock = threading.Lock()  # version and changed ids; never held across I/O
+    self._build_lock = threading.Lock()  # one snapshot rebuild at a time
+    self._version = 0
+    self.modified_at = time.time()
+    self._snapshot: CatalogSnapshot | None = None
+    self.search_index = SearchIndex()
+    self._changed_ids: set[str] | None = None  # None means reindex everything
+    self._listeners: list[Callable[[set[str] | None], None]] = []
+    self._bus: InvalidationBus | None = None
+    self._sync_lock = threading.Lock()
+
+  @property
+  def version(self) -> int:
+    self.sync()
+    return self._version
+
+  def attach_bus(self, bus: InvalidationBus) -> None:
+    """Share invalidations with the other workers forked after this call.
+
+    A bus behind the local version is moved up to it, so the version never
+    goes backwards and a snapshot loaded before attaching stays current.
+    """
+    with self._lock:
+      bus.advance(self._version)
+      self._bus = bus
+      self._version = bus.generation
+
+  def add_invalidation_listener(self, listener: Callable[[set[str] | None], None]) -> None:
+    """Call `listener(product_ids)` on every invalidation; None means all."""
+    self._listeners.append(listener)
+
+  def invalidate(self, product_ids: Iterable[str] | None = None) -> None:
+    """Mark the snapshot stale; `product_ids` narrows the search reindex."""
+    if product_ids is not None:
+      product_ids = set(product_ids)
+    if self._bus is not None:
+      self._bus.publish(product_ids)
+      self.sync()
+    else:
+      self._apply(product_ids, None, time.time())
+
+  def sync(self) -> None:
+    """Apply invalidations other workers published since the last call."""
+    bus = self._bus
+    if bus is None or bus.generation == self._version:
+      return
+    with self._sync_lock:
+      generation, modified_at, product_ids = bus.changes_since(self._version)
+      if generation != self._version:
+        self._apply(product_ids, generation, modified_at)
+
+  def _apply(self, product_ids: set[str] | None, version: int | None, modified_at: float) -> None:
+    """Record an invalidation as `version`, or as the next version if None."""
+    with self._lock:
+      self._version = self._version + 1 if version is None else version
+      self.modified_at = modified_at
+      if product_ids is None:
+        self._changed_ids = None
+      elif self._changed_ids is not None:
+        self._changed_ids.update(product_ids)
+    for listener in self._listeners:
+      listener(product_ids)
+
+  def snapshot(self) -> CatalogSnapshot:
+    self.sync()
+    snapshot = self._snapshot
+    if snapshot is not None and snapshot.version == self._version:
+      return snapshot
+
+    with self._build_lock:
+      snapshot = self._snapshot
+      if snapshot is not None and snapshot.version == self._version:
+        return snapshot
+      # Take the version and the ids to reindex, then load without `_lock`,
+      # so invalidations (run on the event loop) never wait on the SELECT.
+      # One landing mid-load leaves this snapshot a version behind, and the
+      # next read rebuilds it.
+      with self._lock:
+        version = self._version
+        changed, self._changed_ids = self._changed_ids, set()
+      try:
+        snapshot = self._load(version)
+      except BaseException:
+        with self._lock:
+          self._changed_ids = None
+        raise
+      self._reindex(snapshot, changed)
+      self._snapshot = snapshot
+      return snapshot
+
+  async def refresh(self) -> CatalogSnapshot:
+    """`snapshot()` for the event loop: a stale snapshot is rebuilt on a
+    worker thread so the loop never waits on the database."""
+    self.sync()
+    snapshot = self._snapshot
+    if snapshot is not None and snapshot.version == self._version:
+      return snapshot
+    return await run_in_threadpool(self.snapshot)
+
+  def _reindex(self, snapshot: CatalogSnapshot, changed_ids: set[str] | None) -> None:
+    index = self.search_index
+    if changed_ids is None:
+      index = SearchIndex()
+      changed: Iterable[str] = snapshot.ids
+    else:
+      changed = changed_ids
+    for product_id in changed:
+      row = snapshot.get(product_id)
+      if row is None:
+        index.remove(product_id)
+      else:
+        index.add(product_id, name=row[1], description=row[2], brand=row[4], category=row[5])
+    self.search_index = index
+
+  def _load(self, version: int) -> CatalogSnapshot:
+    db = self._session_factory()
+    try:
+      rows = list_product_rows(db)
+    finally:
+      db.close()
+    return CatalogSnapshot(rows, version)
+
+  def query(
+    self,
+    q: str | None = None,
+    brand: str | None = None,
+    category: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    sort: str | None = None,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: str | None = None,
+    snapshot: CatalogSnapshot | None = None,
+    facets: bool = False,
+  ) -> CatalogPage:
+    """Filter, order and paginate the catalog.
+
+    A `q` search yields results in relevance order unless `sort` is given.
+    `cursor` continues from the last row of a previous page. Raises
+    ValueError for a malformed cursor. Pass `snapshot` (from `refresh()`) to
+    query without touching the database. With `facets`, the page carries
+    facet counts for the query (see `CatalogSnapshot.facets`).
+    """
+    if snapshot is None:
+      snapshot = self.snapshot()
+    if sort not in SORT_KEYS:
+      sort = "relevance" if q else None
+    after = decode_cursor(cursor, sort) if cursor else None
+
+    positions = None
+    if q:
+      lookup = snapshot.positions
+      scores = {}
+      for product_id, score in self.search_index.search(q):
+        pos = lookup.get(product_id)
+        if pos is not None:
+          scores[pos] = score
+      positions = list(scores)
+    facet_counts = None
+    if facets:
+      matched = None if positions is None else to_bitmap(positions, len(snapshot))
+      facet_counts = snapshot.facets(matched, brand, category, min_price, max_price)
+    positions = snapshot.filter(
+      brand=brand, category=category, min_price=min_price, max_price=max_price, positions=positions,
+    )
+    total = len(positions)
+
+    if sort == "relevance":
+      # Search hits already arrive best-first, so no index ordering is needed.
+      ids = snapshot.ids
+      key = lambda pos: (-scores[pos], ids[pos])
+      if after is not None:
+        positions = [pos for pos in positions if key(pos) > after]
+      window = positions[offset:offset + limit]
+      has_more = len(positions) > offset + limit
+    else:
+      window, has_more = snapshot.page(positions, sort, limit, offset, after)
+      key = snapshot.sort_key(sort)
+
+    next_cursor = encode_cursor(sort, key(window[-1])) if window and has_more else None
+    return CatalogPage(snapshot, window, total, next_cursor, facet_counts)
+
+
+catalog = Catalog()
+
+
+def invalidate_catalog(product_ids: Iterable[str] | None = None) -> None:
+  """Invalidation hook for product writes made outside an ORM session."""
+  catalog.invalidate(product_ids)
+
+
+# Sessions record which products they wrote under info["catalog_changes"]; a
+# value of None means "unknown" (bulk statements) and forces a full reindex.
+# Brand writes only bump the catalog version.
+_NOT_TRACKED = object()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_product_writes(session: Session, flush_context) -> None:
+  changed = session.info.get("catalog_changes", _NOT_TRACKED)
+  for obj in (*session.new, *session.dirty, *session.deleted):
+    if isinstance(obj, (ProductDB, BrandDB)):
+      if changed is _NOT_TRACKED:
+        changed = session.info["catalog_changes"] = set()
+      if changed is not None and isinstance(obj, ProductDB):
+        changed.add(obj.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_product_writes(orm_execute_state) -> None:
+  if orm_execute_state.is_select:
+    return
+  mapper = orm_execute_state.bind_mapper
+  if mapper is None:
+    return
+  if mapper.class_ is ProductDB:
+    orm_execute_state.session.info["catalog_changes"] = None
+  elif mapper.class_ is BrandDB:
+    orm_execute_state.session.info.setdefault("catalog_changes", set())
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+  changed = session.info.pop("catalog_changes", _NOT_TRACKED)
+  if changed is not _NOT_TRACKED:
+    invalidate_catalog(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+  session.info.pop("catalog_changes", None)
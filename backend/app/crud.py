@@ -1,39 +1,26 @@
 from __future__ import annotations
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, func, insert, select
+from sqlalchemy.orm import Session, selectinload
 from .models import ProductDB, BrandDB, OrderDB, OrderItemDB
 from .data import products, brands
+from .serializers import PRODUCT_FIELDS
+
+PRODUCT_COLUMNS = tuple(getattr(ProductDB, field) for field in PRODUCT_FIELDS)
+
+
+def seed_rows() -> tuple[list[dict], list[dict]]:
+  """Rows for the seed catalog in `data.py`: (products, brands)."""
+  return [product.model_dump() for product in products], [brand.model_dump() for brand in brands]
 
 
 def init_db(db: Session):
-  """Seed database with initial data if empty."""
-  if db.query(ProductDB).first() is not None:
+  """Seed database with initial data if empty, one INSERT per table."""
+  if db.execute(select(ProductDB.id).limit(1)).first() is not None:
     return
 
-  for product in products:
-    db_product = ProductDB(
-      id=product.id,
-      name=product.name,
-      description=product.description,
-      price=product.price,
-      brand=product.brand,
-      category=product.category,
-      imageUrl=product.imageUrl,
-      imageHint=product.imageHint,
-      rating=product.rating,
-      reviewCount=product.reviewCount,
-      discount=product.discount,
-    )
-    db.add(db_product)
-
-  for brand in brands:
-    db_brand = BrandDB(
-      id=brand.id,
-      name=brand.name,
-      logoUrl=brand.logoUrl,
-      logoHint=brand.logoHint,
-    )
-    db.add(db_brand)
-
+  product_rows, brand_rows = seed_rows()
+  db.execute(insert(ProductDB), product_rows)
+  db.execute(insert(BrandDB), brand_rows)
   db.commit()
 
 
@@ -41,37 +28,63 @@ def get_product_by_id(db: Session, product_id: str) -> ProductDB | None:
   return db.query(ProductDB).filter(ProductDB.id == product_id).first()
 
 
-def list_products(
-  db: Session,
+def get_product_row(db: Session, product_id: str) -> tuple | None:
+  """Fetch one product as a plain tuple in `PRODUCT_FIELDS` order."""
+  row = db.query(*PRODUCT_COLUMNS).filter(ProductDB.id == product_id).first()
+  return None if row is None else tuple(row)
+
+
+def list_product_rows(db: Session) -> list[tuple]:
+  """Fetch every product as plain tuples ordered by id, skipping ORM hydration."""
+  return [tuple(row) for row in db.query(*PRODUCT_COLUMNS).order_by(ProductDB.id).all()]
+
+
+def products_query(
   q: str | None = None,
   brand: str | None = None,
   category: str | None = None,
   min_price: float | None = None,
   max_price: float | None = None,
-) -> list[ProductDB]:
-  query = db.query(ProductDB)
+) -> Select:
+  """SELECT for `list_products`, shared with `async_crud`.
+
+  Brand and category match case-insensitively but exactly, so the
+  lower(column) indexes apply.
+  """
+  query = select(ProductDB)
 
   if q:
     term = f"%{q.lower()}%"
-    query = query.filter(
+    query = query.where(
       (ProductDB.name.ilike(term)) |
       (ProductDB.description.ilike(term)) |
       (ProductDB.brand.ilike(term))
     )
 
   if brand:
-    query = query.filter(ProductDB.brand.ilike(f"%{brand}%"))
+    query = query.where(func.lower(ProductDB.brand) == brand.lower())
 
   if category:
-    query = query.filter(ProductDB.category.ilike(f"%{category}%"))
+    query = query.where(func.lower(ProductDB.category) == category.lower())
 
   if min_price is not None:
-    query = query.filter(ProductDB.price >= min_price)
+    query = query.where(ProductDB.price >= min_price)
 
   if max_price is not None:
-    query = query.filter(ProductDB.price <= max_price)
+    query = query.where(ProductDB.price <= max_price)
 
-  return query.all()
+  return query
+
+
+def list_products(
+  db: Session,
+  q: str | None = None,
+  brand: str | None = None,
+  category: str | None = None,
+  min_price: float | None = None,
+  max_price: float | None = None,
+) -> list[ProductDB]:
+  return list(db.scalars(products_query(q, brand, category, min_price, max_price)).all())
 
 
 def get_categories(db: Session) -> list[str]:
@@ -83,22 +96,41 @@ def get_brands(db: Session) -> list[BrandDB]:
   return db.query(BrandDB).all()
 
 
-def create_order(db: Session, order_id: str, date: str, total: float, product_ids: list[tuple[str, int]]) -> OrderDB:
-  """Create an order with products and quantities."""
-  order = OrderDB(id=order_id, date=date, status="Processing", total=total)
-  db.add(order)
-  db.flush()  # Flush to ensure order is created before adding items
+def orders_query(
+  status: str | None = None,
+  payment_status: str | None = None,
+  date_from: str | None = None,
+  date_to: str | None = None,
+  before: str | None = None,
+  limit: int | None = None,
+) -> Select:
+  """SELECT for `async_crud.list_orders`.
 
-  for product_id, quantity in product_ids:
-    product = get_product_by_id(db, product_id)
-    if product:
-      order_item = OrderItemDB(order_id=order_id, product_id=product_id, quantity=quantity)
-      db.add(order_item)
+  `before` is an order id cursor: only orders with a smaller id are returned.
+  Items and their products arrive via two batched SELECT ... IN queries
+  regardless of how many orders are listed.
+  """
+  query = select(OrderDB).options(
+    selectinload(OrderDB.order_items).selectinload(OrderItemDB.product)
+  )
 
-  db.commit()
-  db.refresh(order)
-  return order
+  if status:
+    query = query.where(OrderDB.status == status)
+
+  if payment_status:
+    query = query.where(OrderDB.payment_status == payment_status)
+
+  if date_from:
+    query = query.where(OrderDB.date >= date_from)
+
+  if date_to:
+    query = query.where(OrderDB.date <= date_to)
+
+  if before:
+    query = query.where(OrderDB.id < before)
 
+  query = query.order_by(OrderDB.id.desc())
+  if limit is not None:
+    query = query.limit(limit)
+  return query
 
-def list_orders(db: Session) -> list[OrderDB]:
-  return db.query(OrderDB).all()
@@ -1,21 +1,164 @@
 import os
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from .metrics import instrument_engine
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./gtr_motors.db")
 
-engine = create_engine(
-  DATABASE_URL,
-  connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+# Async drivers used for request handlers, keyed by the sync URL's dialect.
+ASYNC_DRIVERS = {
+  "sqlite": "sqlite+aiosqlite",
+  "postgresql": "postgresql+asyncpg",
+  "mysql": "mysql+aiomysql",
+}
+
+# Pool settings; they apply to server databases and file-backed SQLite.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# PRAGMAs applied to every new SQLite connection. WAL lets readers proceed
+# alongside a writer, and busy_timeout makes a blocked writer wait for the
+# lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+  "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+  "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+  "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+  "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+  "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, so 64 MiB
+}
+
+
+class PoolStats:
+  """Counters fed by pool events, reported next to the pool's own gauges."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.counts = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+
+  def incr(self, name: str) -> None:
+    with self._lock:
+      self.counts[name] += 1
+
+  def attach(self, engine: Engine) -> None:
+    event.listen(engine, "connect", lambda *_: self.incr("connects"))
+    event.listen(engine, "checkout", lambda *_: self.incr("checkouts"))
+    event.listen(engine, "checkin", lambda *_: self.incr("checkins"))
+    event.listen(engine, "invalidate", lambda *_: self.incr("invalidations"))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+  cursor = dbapi_connection.cursor()
+  try:
+    for name, value in SQLITE_PRAGMAS.items():
+      cursor.execute(f"PRAGMA {name}={value}")
+  finally:
+    cursor.close()
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+  """ASYNC_DATABASE_URL if set, else `url` switched to its async driver."""
+  override = os.getenv("ASYNC_DATABASE_URL")
+  if override:
+    return override
+  parsed = make_url(url)
+  driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+  if driver is None:
+    raise ValueError(f"No async driver configured for {parsed.drivername}")
+  return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _engine_options(url: str, sync: bool) -> dict:
+  parsed = make_url(url)
+  options = {}
+  if parsed.get_backend_name() == "sqlite":
+    if sync:
+      options["connect_args"] = {"check_same_thread": False}
+    in_memory = parsed.database in (None, "", ":memory:") or "mode=memory" in str(parsed.query)
+  else:
+    in_memory = False
+  if not in_memory:
+    options.update(
+      pool_size=DB_POOL_SIZE,
+      max_overflow=DB_MAX_OVERFLOW,
+      pool_timeout=DB_POOL_TIMEOUT,
+      pool_recycle=DB_POOL_RECYCLE,
+      pool_pre_ping=DB_POOL_PRE_PING,
+    )
+  return options
+
+
+def create_db_engine(url: str = DATABASE_URL, **kwargs) -> Engine:
+  """Create an engine tuned for `url`.
+
+  SQLite connections get SQLITE_PRAGMAS; file databases and server databases
+  get a QueuePool sized from the DB_POOL_* settings. Keyword arguments are
+  passed to `create_engine` and take precedence.
+  """
+  new_engine = create_engine(url, **{**_engine_options(url, sync=True), **kwargs})
+  if new_engine.dialect.name == "sqlite":
+    event.listen(new_engine, "connect", _set_sqlite_pragmas)
+  return new_engine
+
+
+def create_async_db_engine(url: str | None = None, **kwargs) -> AsyncEngine:
+  """Async counterpart of `create_db_engine`, for request handlers."""
+  url = url or async_database_url()
+  new_engine = create_async_engine(url, **{**_engine_options(url, sync=False), **kwargs})
+  if new_engine.dialect.name == "sqlite":
+    event.listen(new_engine.sync_engine, "connect", _set_sqlite_pragmas)
+  return new_engine
+
+
+# The sync engine serves startup, the catalog loader and background workers;
+# request handlers use the async engine.
+engine = create_db_engine()
+pool_stats = PoolStats()
+pool_stats.attach(engine)
+instrument_engine(engine, "sync")
+
+async_engine = create_async_db_engine()
+async_pool_stats = PoolStats()
+async_pool_stats.attach(async_engine.sync_engine)
+instrument_engine(async_engine.sync_engine, "async")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
+def _pool_status(pool, stats: PoolStats) -> dict:
+  status = {"pool": type(pool).__name__}
+  for name in ("size", "checkedin", "checkedout", "overflow"):
+    gauge = getattr(pool, name, None)
+    if gauge is not None:
+      status[name] = gauge()
+  status.update(stats.counts)
+  return status
+
+
+def pool_status() -> dict:
+  """Connection pool gauges and lifetime counters for both engines."""
+  return {
+    "sync": _pool_status(engine.pool, pool_stats),
+    "async": _pool_status(async_engine.pool, async_pool_stats),
+  }
+
+
 def get_db():
   db = SessionLocal()
   try:
     yield db
   finally:
     db.close()
+
+
+async def get_async_db():
+  async with AsyncSessionLocal() as db:
+    yield db
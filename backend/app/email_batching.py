@@ -0,0 +1,166 @@
+from __future__ import annotations
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from . import email_service
+from .email_service import EMAIL_TEMPLATES, FROM_EMAIL
+from .metrics import timed
+
+# SES accepts at most 50 destinations per SendBulkTemplatedEmail call.
+SES_MAX_DESTINATIONS = 50
+QUOTA_REFRESH_SECONDS = float(os.getenv("SES_QUOTA_REFRESH_SECONDS", "300"))
+EMAIL_BULK_SEND = os.getenv("EMAIL_BULK_SEND", "1") == "1"
+
+
+class SendQuotaExceeded(Exception):
+  pass
+
+
+class SendRateLimiter:
+  """Paces sends to the account's SES MaxSendRate and daily quota.
+
+  Each call reserves a slot `n / rate` seconds wide after the previous one,
+  so concurrent callers are spread out instead of bursting into throttling.
+  Quota figures come from GetSendQuota and are refreshed periodically.
+  """
+
+  def __init__(self, refresh_seconds: float = QUOTA_REFRESH_SECONDS):
+    self.refresh_seconds = refresh_seconds
+    self._lock = threading.Lock()
+    self._refreshed_at = 0.0
+    self._max_rate = 1.0
+    self._max_24h = -1.0
+    self._sent_24h = 0.0
+    self._next_slot = 0.0
+
+  def _refresh(self, client) -> None:
+    try:
+      quota = client.get_send_quota()
+    except Exception as e:
+      print(f"Warning: Failed to fetch SES send quota: {e}")
+    else:
+      self._max_rate = max(float(quota.get("MaxSendRate", 1.0)), 1.0)
+      self._max_24h = float(quota.get("Max24HourSend", -1.0))
+      self._sent_24h = float(quota.get("SentLast24Hours", 0.0))
+    self._refreshed_at = time.monotonic()
+
+  def acquire(self, client, recipients: int) -> None:
+    """Block until `recipients` more messages may be sent."""
+    with self._lock:
+      now = time.monotonic()
+      if now - self._refreshed_at >= self.refresh_seconds:
+        self._refresh(client)
+      if self._max_24h >= 0 and self._sent_24h + recipients > self._max_24h:
+        raise SendQuotaExceeded("SES 24-hour send quota exhausted")
+      self._sent_24h += recipients
+      slot = max(now, self._next_slot)
+      self._next_slot = slot + recipients / self._max_rate
+    delay = slot - time.monotonic()
+    if delay > 0:
+      time.sleep(delay)
+
+
+class BatchingSender:
+  """Sends queued emails as SES templated bulk sends.
+
+  Messages of the same kind share one SES template, generated from that
+  kind's renderer with placeholder variables. Each call then carries only
+  the per-recipient substitution data, for up to SES_MAX_DESTINATIONS
+  recipients at a time.
+  """
+
+  def __init__(self, rate_limiter: SendRateLimiter | None = None):
+    self.rate_limiter = rate_limiter or SendRateLimiter()
+    self._lock = threading.Lock()
+    self._templates: dict[str, str] = {}
+
+  def template_name(self, client, kind: str) -> str:
+    """Return the SES template for `kind`, registering it on first use.
+
+    Names carry a digest of the template content, so editing a renderer
+    registers a new template instead of changing the one in flight.
+    """
+    with self._lock:
+      name = self._templates.get(kind)
+      if name is not None:
+        return name
+
+      # Triple braces keep SES from HTML-escaping the substituted values,
+      # matching local rendering.
+      _, render_fn = EMAIL_TEMPLATES[kind]
+      variables = inspect.signature(render_fn).parameters
+      subject, html_body, text_body = render_fn(**{var: "{{{" + var + "}}}" for var in variables})
+      digest = hashlib.sha256("\0".join((subject, html_body, text_body)).encode()).hexdigest()[:12]
+      name = f"gtr-{kind.replace('_', '-')}-{digest}"
+      try:
+        client.create_template(Template={
+          "TemplateName": name,
+          "SubjectPart": subject,
+          "HtmlPart": html_body,
+          "TextPart": text_body,
+        })
+      except Exception as e:
+        if "AlreadyExists" not in str(e):
+          raise
+      self._templates[kind] = name
+      return name
+
+  def send(self, messages: list[tuple[str, str, dict]]) -> list[dict]:
+    """Send `(kind, to_email, kwargs)` messages; returns one response per
+    message, in order, with either a MessageId or an error."""
+    client = email_service.get_ses_client()
+    if not client:
+      return [{"error": "SES not configured"} for _ in messages]
+
+    results: list[dict | None] = [None] * len(messages)
+    by_kind: dict[str, list[int]] = defaultdict(list)
+    for i, (kind, _, _) in enumerate(messages):
+      by_kind[kind].append(i)
+
+    for kind, indexes in by_kind.items():
+      data_fn, _ = EMAIL_TEMPLATES[kind]
+      try:
+        template = self.template_name(client, kind)
+      except Exception as e:
+        for i in indexes:
+          results[i] = {"error": f"Failed to register SES template: {e}"}
+        continue
+
+      for start in range(0, len(indexes), SES_MAX_DESTINATIONS):
+        chunk = indexes[start:start + SES_MAX_DESTINATIONS]
+        destinations = []
+        for i in chunk:
+          _, to_email, kwargs = messages[i]
+          destinations.append({
+            "Destination": {"ToAddresses": [to_email]},
+            "ReplacementTemplateData": json.dumps(data_fn(to_email, **kwargs)),
+          })
+        try:
+          self.rate_limiter.acquire(client, len(chunk))
+          with timed("ses", "send_bulk_templated_email"):
+            response = client.send_bulk_templated_email(
+              Source=FROM_EMAIL,
+              Template=template,
+              DefaultTemplateData="{}",
+              Destinations=destinations,
+            )
+        except Exception as e:
+          for i in chunk:
+            results[i] = {"error": str(e)}
+          continue
+
+        for i, status in zip(chunk, response.get("Status", [])):
+          if status.get("Status") == "Success":
+            results[i] = {"MessageId": status.get("MessageId")}
+          else:
+            results[i] = {"error": status.get("Error") or status.get("Status", "Unknown SES error")}
+
+    return [result or {"error": "No status returned by SES"} for result in results]
+
+
+batching_sender = BatchingSender()
@@ -0,0 +1,346 @@
+from __future__ import annotations
+import os
+import re
+from typing import Iterable, Mapping
+
+# Set EMAIL_MINIFY_HTML=1 to strip indentation and inter-tag whitespace from
+# HTML templates when they are compiled.
+EMAIL_MINIFY_HTML = os.getenv("EMAIL_MINIFY_HTML", "0") == "1"
+
+_PARTIAL = re.compile(r"\{\{>\s*(\w+)\s*\}\}")
+_SLOT = re.compile(r"\{\{\s*(\w+)(:[\w.,<>^=+\-#%]+)?\s*\}\}")
+
+# Fragments shared by several templates, included with `{{> name}}`. They are
+# spliced into the including template at compile time.
+PARTIALS = {
+  "document_start": """<!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+    </head>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto;">""",
+  "document_end": """</body>
+    </html>""",
+  "copyright": """<p style="margin: 5px 0;">© 2026 GTR Motorsport India Private Limited</p>""",
+  "copyright_text": "© 2026 GTR Motorsport India Private Limited",
+}
+
+# Template sources keyed by "<email kind>.<part>". `{{name}}` is replaced with
+# the value of `name`, inserted as-is without HTML escaping; `{{name:.2f}}`
+# applies a format spec first.
+TEMPLATES = {
+  "order_item.html": """
+        <tr>
+            <td style="padding: 10px; border-bottom: 1px solid #eee;">{{name}}</td>
+            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: center;">{{quantity}}</td>
+            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: right;">${{price:.2f}}</td>
+        </tr>
+        """,
+  "order_item.text": "- {{name}} x {{quantity}} - ${{price:.2f}}",
+  "order_confirmation.subject": "Order Confirmation - {{order_id}}",
+  "order_confirmation.html": """
+    {{> document_start}}
+        <div style="background: linear-gradient(135deg, #EA580C 0%, #DC2626 100%); padding: 20px; text-align: center;">
+            <h1 style="color: white; margin: 0;">GTR Motors</h1>
+            <p style="color: white; margin: 5px 0;">High-Performance Auto Parts</p>
+        </div>
+        
+        <div style="padding: 30px; background: #f9f9f9;">
+            <h2 style="color: #EA580C;">Thank You for Your Order!</h2>
+            <p>Hi {{customer_name}},</p>
+            <p>We've received your order and are processing it now. Here are your order details:</p>
+            
+            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                <h3 style="margin-top: 0; color: #EA580C;">Order #{{order_id}}</h3>
+                
+                <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
+                    <thead>
+                        <tr style="background: #f5f5f5;">
+                            <th style="padding: 10px; text-align: left; border-bottom: 2px solid #EA580C;">Item</th>
+                            <th style="padding: 10px; text-align: center; border-bottom: 2px solid #EA580C;">Qty</th>
+                            <th style="padding: 10px; text-align: right; border-bottom: 2px solid #EA580C;">Price</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {{items_html}}
+                    </tbody>
+                </table>
+                
+                <div style="text-align: right; padding: 15px 0; border-top: 2px solid #EA580C;">
+                    <strong style="font-size: 18px;">Total: ${{order_total}}</strong>
+                </div>
+            </div>
+            
+            <p>Your order will be shipped within 2-3 business days. You'll receive a shipping confirmation email with tracking information once your order ships.</p>
+            
+            <div style="margin: 30px 0; padding: 20px; background: #fff3cd; border-left: 4px solid #EA580C; border-radius: 4px;">
+                <strong>Need Help?</strong><br>
+                Contact us at <a href="mailto:support@gtrmotors.com" style="color: #EA580C;">support@gtrmotors.com</a><br>
+                Phone: 0091 80158 71346, 0091 95666 46777
+            </div>
+        </div>
+        
+        <div style="background: #333; color: white; padding: 20px; text-align: center;">
+            {{> copyright}}
+            <p style="margin: 5px 0;">SF.No. 28/1, Polichalur Main Road, Pammal, Chennai - 75</p>
+        </div>
+    {{> document_end}}
+    """,
+  "order_confirmation.text": """
+    GTR Motors - Order Confirmation
+    
+    Hi {{customer_name}},
+    
+    Thank you for your order! We've received it and are processing it now.
+    
+    Order #{{order_id}}
+    
+    Items:
+    {{items_text}}
+    
+    Total: ${{order_total}}
+    
+    Your order will be shipped within 2-3 business days.
+    
+    Need help? Contact us at support@gtrmotors.com
+    Phone: 0091 80158 71346, 0091 95666 46777
+    
+    {{> copyright_text}}
+    """,
+  "payment_success.subject": "Payment Confirmed - Order {{order_id}}",
+  "payment_success.html": """
+    {{> document_start}}
+        <div style="background: linear-gradient(135deg, #10b981 0%, #059669 100%); padding: 20px; text-align: center;">
+            <h1 style="color: white; margin: 0;">✓ Payment Successful</h1>
+        </div>
+        
+        <div style="padding: 30px; background: #f9f9f9;">
+            <h2 style="color: #10b981;">Payment Confirmed!</h2>
+            <p>Hi {{customer_name}},</p>
+            <p>Your payment has been successfully processed.</p>
+            
+            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #10b981;">
+                <h3 style="margin-top: 0; color: #059669;">Payment Details</h3>
+                <p><strong>Order ID:</strong> {{order_id}}</p>
+                <p><strong>Payment ID:</strong> {{payment_id}}</p>
+                <p><strong>Amount Paid:</strong> ₹{{amount}}</p>
+                <p><strong>Status:</strong> <span style="color: #10b981; font-weight: bold;">✓ CONFIRMED</span></p>
+            </div>
+            
+            <p>Your order is now being prepared for shipment. We'll send you another email with tracking information once it ships.</p>
+            
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="http://localhost:9002/account/orders/{{order_id}}" style="display: inline-block; background: #EA580C; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; font-weight: bold;">View Order Details</a>
+            </div>
+        </div>
+        
+        <div style="background: #333; color: white; padding: 20px; text-align: center;">
+            {{> copyright}}
+        </div>
+    {{> document_end}}
+    """,
+  "payment_success.text": """
+    GTR Motors - Payment Confirmed
+    
+    Hi {{customer_name}},
+    
+    Your payment has been successfully processed!
+    
+    Payment Details:
+    Order ID: {{order_id}}
+    Payment ID: {{payment_id}}
+    Amount Paid: ₹{{amount}}
+    Status: CONFIRMED
+    
+    Your order is now being prepared for shipment.
+    
+    {{> copyright_text}}
+    """,
+  "account_created.subject": "Welcome to GTR Motors - Account Created!",
+  "account_created.html": """
+    {{> document_start}}
+        <div style="background: linear-gradient(135deg, #EA580C 0%, #DC2626 100%); padding: 20px; text-align: center;">
+            <h1 style="color: white; margin: 0;">🎉 Welcome to GTR Motors!</h1>
+            <p style="color: white; margin: 5px 0;">Your Account is Ready</p>
+        </div>
+        
+        <div style="padding: 30px; background: #f9f9f9;">
+            <h2 style="color: #EA580C;">Welcome, {{customer_name}}!</h2>
+            <p>Your GTR Motors account has been successfully created. You're now ready to shop for high-performance auto parts!</p>
+            
+            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #EA580C;">
+                <h3 style="margin-top: 0; color: #EA580C;">✓ Account Created</h3>
+                <p><strong>Email:</strong> {{to_email}}</p>
+                <p><strong>Status:</strong> <span style="color: #10b981; font-weight: bold;">Active</span></p>
+            </div>
+            
+            <h3 style="color: #EA580C;">What's Next?</h3>
+            <ul style="line-height: 1.8;">
+                <li>🛒 Browse our <a href="http://localhost:9002/products" style="color: #EA580C; text-decoration: none;">product catalog</a></li>
+                <li>💳 Add items to your cart and checkout with Razorpay</li>
+                <li>📦 Track your orders in your account dashboard</li>
+                <li>⭐ Leave reviews for products you've purchased</li>
+            </ul>
+            
+            <div style="margin: 30px 0; padding: 20px; background: #e8f5e9; border-left: 4px solid #10b981; border-radius: 4px;">
+                <strong style="color: #059669;">🎁 Exclusive Offer:</strong><br>
+                New members get access to our full product catalog with exclusive deals on high-performance auto parts!
+            </div>
+            
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="http://localhost:9002/products" style="display: inline-block; background: #EA580C; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; font-weight: bold;">Start Shopping</a>
+            </div>
+        </div>
+        
+        <div style="background: #333; color: white; padding: 20px; text-align: center;">
+            <p style="margin: 5px 0;">Questions? Contact us at support@gtrmotors.com</p>
+            {{> copyright}}
+        </div>
+    {{> document_end}}
+    """,
+  "account_created.text": """
+    GTR Motors - Welcome!
+    
+    Hi {{customer_name}},
+    
+    Welcome to GTR Motors! Your account has been successfully created.
+    
+    Email: {{to_email}}
+    Status: Active
+    
+    What's Next?
+    - Browse our product catalog
+    - Add items to your cart
+    - Track your orders
+    - Leave reviews
+    
+    Start shopping: http://localhost:9002/products
+    
+    Questions? Contact us at support@gtrmotors.com
+    {{> copyright_text}}
+    """,
+  "login_notification.subject": "Login Notification - GTR Motors Account",
+  "login_notification.html": """
+    {{> document_start}}
+        <div style="background: linear-gradient(135deg, #3b82f6 0%, #1e40af 100%); padding: 20px; text-align: center;">
+            <h1 style="color: white; margin: 0;">🔐 Login Notification</h1>
+            <p style="color: white; margin: 5px 0;">Your Account Activity</p>
+        </div>
+        
+        <div style="padding: 30px; background: #f9f9f9;">
+            <h2 style="color: #3b82f6;">Hello {{customer_name}},</h2>
+            <p>Your GTR Motors account was accessed. Here are the login details:</p>
+            
+            <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #3b82f6;">
+                <h3 style="margin-top: 0; color: #3b82f6;">✓ Login Detected</h3>
+                <p><strong>Email:</strong> {{to_email}}</p>
+                <p><strong>Time:</strong> {{login_time}}</p>
+                <p><strong>Device:</strong> {{device_info}}</p>
+                <p><strong>Status:</strong> <span style="color: #10b981; font-weight: bold;">✓ Successful</span></p>
+            </div>
+            
+            <div style="margin: 30px 0; padding: 20px; background: #fef3c7; border-left: 4px solid #f59e0b; border-radius: 4px;">
+                <strong style="color: #b45309;">⚠️ Security Tip:</strong><br>
+                If you didn't recognize this login, please change your password immediately for security.
+            </div>
+            
+            <h3 style="color: #3b82f6;">Quick Links:</h3>
+            <ul style="line-height: 1.8;">
+                <li><a href="http://localhost:9002/account" style="color: #3b82f6; text-decoration: none;">View Account</a></li>
+                <li><a href="http://localhost:9002/account/orders" style="color: #3b82f6; text-decoration: none;">View Orders</a></li>
+                <li><a href="http://localhost:9002" style="color: #3b82f6; text-decoration: none;">Continue Shopping</a></li>
+            </ul>
+        </div>
+        
+        <div style="background: #333; color: white; padding: 20px; text-align: center;">
+            <p style="margin: 5px 0;">Questions? Contact us at support@gtrmotors.com</p>
+            {{> copyright}}
+        </div>
+    {{> document_end}}
+    """,
+  "login_notification.text": """
+    GTR Motors - Login Notification
+    
+    Hi {{customer_name}},
+    
+    Your GTR Motors account was accessed.
+    
+    Login Details:
+    Email: {{to_email}}
+    Time: {{login_time}}
+    Device: {{device_info}}
+    Status: Successful
+    
+    If you didn't recognize this login, please change your password.
+    
+    Questions? Contact us at support@gtrmotors.com
+    {{> copyright_text}}
+    """,
+}
+
+
+def minify_html(html: str) -> str:
+  """Drop indentation, blank lines and whitespace between tags, and tighten
+  inline `style` attributes."""
+  html = re.sub(r"\n\s*", "\n", html.strip())
+  html = re.sub(r">\s+<", "><", html)
+  return re.sub(
+    r'style="([^"]*)"',
+    lambda m: 'style="' + re.sub(r"\s*([:;,])\s*", r"\1", m.group(1)).rstrip(";") + '"',
+    html,
+  )
+
+
+class Template:
+  """A template compiled to Python functions.
+
+  Partials are inlined, and the result is turned into an f-string expression
+  with the literal text held in constants, so rendering runs as one string
+  build with no parsing or per-fragment Python calls.
+  """
+
+  def __init__(self, source: str, partials: Mapping[str, str] | None = None, minify: bool = False):
+    partials = PARTIALS if partials is None else partials
+    while _PARTIAL.search(source):
+      source = _PARTIAL.sub(lambda m: partials[m.group(1)], source)
+    if minify:
+      source = minify_html(source)
+
+    namespace: dict[str, object] = {}
+    expr, fields, pos = [], [], 0
+    for match in _SLOT.finditer(source):
+      literal = f"_{len(namespace)}"
+      namespace[literal] = source[pos:match.start()]
+      expr.append("{" + literal + "}{v[" + repr(match.group(1)) + "]" + (match.group(2) or "") + "}")
+      fields.append(match.group(1))
+      pos = match.end()
+    namespace[f"_{len(namespace)}"] = source[pos:]
+    expr.append("{_" + str(len(namespace) - 1) + "}")
+
+    body = 'f"' + "".join(expr) + '"'
+    exec(
+      f"def render(v): return {body}\n"
+      f"def render_each(rows, sep): return sep.join([{body} for v in rows])\n",
+      namespace,
+    )
+    self.source = source
+    self.fields = tuple(dict.fromkeys(fields))
+    self._render = namespace["render"]
+    self._render_each = namespace["render_each"]
+
+  def render(self, values: Mapping[str, object]) -> str:
+    return self._render(values)
+
+  def render_each(self, rows: Iterable[Mapping[str, object]], sep: str = "") -> str:
+    """Render once per row and join the results."""
+    return self._render_each(rows, sep)
+
+
+def compile_templates(minify: bool = EMAIL_MINIFY_HTML) -> dict[str, Template]:
+  return {
+    name: Template(source, minify=minify and name.endswith(".html"))
+    for name, source in TEMPLATES.items()
+  }
+
+
+templates = compile_templates()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import IdempotencyKeyDB
+from .serializers import json_response
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+PURGE_INTERVAL_SECONDS = 600
+MAX_KEY_LENGTH = 255
+
+_next_purge = 0.0
+
+
+class IdempotencyKeyReused(ValueError):
+  """The key was first used with a different request."""
+
+
+def request_fingerprint(route: str, payload: BaseModel) -> str:
+  """Hash a route and its parsed body, ignoring key order and whitespace."""
+  body = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+  return hashlib.sha256(f"{route}\n{body}".encode()).hexdigest()
+
+
+def _expiry_cutoff() -> datetime:
+  return datetime.utcnow() - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+async def find_response(db: AsyncSession, key: str, fingerprint: str) -> Response | None:
+  """Return the response stored for `key`, or None if it is new or expired.
+
+  Raises `IdempotencyKeyReused` if the key belongs to a different request.
+  """
+  record = await db.get(IdempotencyKeyDB, key)
+  if record is None:
+    return None
+  if record.created_at < _expiry_cutoff():
+    await db.delete(record)  # goes out with the transaction that reuses the key
+    return None
+  if record.fingerprint != fingerprint:
+    raise IdempotencyKeyReused("Idempotency-Key was already used with a different request")
+  return json_response(record.response.encode(), record.status_code, headers={"Idempotent-Replayed": "true"})
+
+
+async def commit_with_response(
+  db: AsyncSession, key: str, fingerprint: str, status_code: int, response: BaseModel,
+) -> Response:
+  """Store the response for `key`, commit it with the caller's changes and
+  return it, encoded exactly as replays will be.
+
+  If a concurrent request with the same key committed first, the caller's
+  changes are rolled back and that request's response is returned instead.
+  Expired keys are purged every few minutes as part of this commit.
+  """
+  global _next_purge
+  if time.monotonic() >= _next_purge:
+    _next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+    await db.execute(delete(IdempotencyKeyDB).where(IdempotencyKeyDB.created_at < _expiry_cutoff()))
+
+  content = response.model_dump_json().encode()
+  db.add(IdempotencyKeyDB(
+    key=key,
+    fingerprint=fingerprint,
+    status_code=status_code,
+    response=content.decode(),
+    created_at=datetime.utcnow(),
+  ))
+  try:
+    await db.commit()
+  except IntegrityError:
+    await db.rollback()
+    replay = await find_response(db, key, fingerprint)
+    if replay is None:
+      raise
+    return replay
+  return json_response(content, status_code)
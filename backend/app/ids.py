@@ -0,0 +1,51 @@
+from __future__ import annotations
+import os
+import secrets
+import threading
+import time
+
+# Crockford base32: no I, L, O or U, and ASCII order matches numeric order.
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_BITS = 80
+_RANDOM_CHARS = _RANDOM_BITS // 5
+
+
+class OrderIdGenerator:
+  """ULID-style order ids: `ORD-<utc ms>-<80 random bits>`.
+
+  The millisecond prefix keeps the old `ORD-<utc ms>` ids and the new ones in
+  one chronological order (order listings page by id). Random bits make ids
+  from separate processes or hosts distinct without any coordination; within
+  a process, ids in the same millisecond increment the previous random value
+  instead, so they stay strictly increasing even if the clock steps back.
+  """
+
+  def __init__(self):
+    self._reset()
+
+  def _reset(self) -> None:
+    self._lock = threading.Lock()
+    self._last_ms = 0
+    self._last_random = 0
+
+  def __call__(self) -> str:
+    with self._lock:
+      now = int(time.time() * 1000)
+      if now > self._last_ms:
+        self._last_ms, self._last_random = now, secrets.randbits(_RANDOM_BITS)
+      else:
+        self._last_random += 1
+        if self._last_random >> _RANDOM_BITS:  # 2^80 ids in one millisecond: borrow the next one
+          self._last_ms, self._last_random = self._last_ms + 1, secrets.randbits(_RANDOM_BITS)
+      ms, random = self._last_ms, self._last_random
+
+    chars = []
+    for _ in range(_RANDOM_CHARS):
+      random, digit = divmod(random, 32)
+      chars.append(_ALPHABET[digit])
+    return f"ORD-{ms:013d}-{''.join(reversed(chars))}"
+
+
+new_order_id = OrderIdGenerator()
+# A forked worker must not continue its parent's sequence within the same millisecond.
+os.register_at_fork(after_in_child=new_order_id._reset)
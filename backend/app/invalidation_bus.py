@@ -0,0 +1,75 @@
+from __future__ import annotations
+import json
+import mmap
+import multiprocessing
+import struct
+import time
+
+_HEADER = struct.Struct("=Qd")  # generation, modified_at
+_SLOT_HEADER = struct.Struct("=QI")  # generation, payload length
+_ALL = b"*"
+
+
+class InvalidationBus:
+  """Catalog invalidations shared by forked worker processes.
+
+  Lives in an anonymous shared mapping, so it must be created before the
+  workers fork. Every invalidation bumps one generation counter, which
+  becomes the catalog version in every worker, and records its product ids
+  in a ring of `slots` entries. A worker that falls more than `slots`
+  generations behind, or reads an entry too large for a slot, reloads
+  everything instead.
+  """
+
+  def __init__(self, slots: int = 256, slot_size: int = 1024):
+    self.slots = slots
+    self.slot_size = slot_size
+    self._map = mmap.mmap(-1, _HEADER.size + slots * slot_size)
+    self._lock = multiprocessing.Lock()
+    _HEADER.pack_into(self._map, 0, 0, time.time())
+
+  def advance(self, generation: int) -> None:
+    """Move the generation forward to `generation` without recording
+    changes, so catalog versions already handed out are never reused."""
+    with self._lock:
+      if generation > _HEADER.unpack_from(self._map, 0)[0]:
+        _HEADER.pack_into(self._map, 0, generation, time.time())
+
+  @property
+  def generation(self) -> int:
+    # Read without the lock: a stale value only delays a worker until its
+    # next check, and `changes_since` rereads it under the lock.
+    return _HEADER.unpack_from(self._map, 0)[0]
+
+  def _slot_offset(self, generation: int) -> int:
+    return _HEADER.size + (generation % self.slots) * self.slot_size
+
+  def publish(self, product_ids: set[str] | None) -> int:
+    """Record an invalidation; None means every product. Returns its generation."""
+    payload = _ALL if product_ids is None else json.dumps(sorted(product_ids)).encode()
+    if len(payload) > self.slot_size - _SLOT_HEADER.size:
+      payload = _ALL
+    with self._lock:
+      generation = _HEADER.unpack_from(self._map, 0)[0] + 1
+      offset = self._slot_offset(generation)
+      _SLOT_HEADER.pack_into(self._map, offset, generation, len(payload))
+      self._map[offset + _SLOT_HEADER.size:offset + _SLOT_HEADER.size + len(payload)] = payload
+      _HEADER.pack_into(self._map, 0, generation, time.time())
+    return generation
+
+  def changes_since(self, seen: int) -> tuple[int, float, set[str] | None]:
+    """Return (generation, modified_at, product ids) covering every
+    invalidation after generation `seen`; ids are None if unknown."""
+    with self._lock:
+      generation, modified_at = _HEADER.unpack_from(self._map, 0)
+      if generation - seen > self.slots:
+        return generation, modified_at, None
+      changed: set[str] = set()
+      for expected in range(seen + 1, generation + 1):
+        offset = self._slot_offset(expected)
+        slot_generation, length = _SLOT_HEADER.unpack_from(self._map, offset)
+        payload = self._map[offset + _SLOT_HEADER.size:offset + _SLOT_HEADER.size + length]
+        if slot_generation != expected or payload == _ALL:
+          return generation, modified_at, None
+        changed.update(json.loads(payload))
+      return generation, modified_at, changed
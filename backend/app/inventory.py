@@ -0,0 +1,391 @@
+from __future__ import annotations
+import os
+import random
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import Select, bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import OrderDB, OrderItemDB, StockReservationDB, StockShardDB
+
+# Each tracked product's stock is split over this many rows, so concurrent
+# checkouts of one product mostly update different rows instead of queueing
+# on a single row lock.
+STOCK_SHARDS = int(os.getenv("STOCK_SHARDS", "8"))
+RESERVATION_TTL_MINUTES = float(os.getenv("RESERVATION_TTL_MINUTES", "15"))
+RESERVATION_SWEEP_SECONDS = float(os.getenv("RESERVATION_SWEEP_SECONDS", "30"))
+SWEEP_BATCH_SIZE = 200
+
+# Functions here take a sync Session; request handlers call them through
+# `AsyncSession.run_sync`.
+
+# Statements on the checkout path are built once, against the tables: a
+# checkout runs several, and building ORM statements cost more than SQLite
+# took to execute them.
+_shards = StockShardDB.__table__
+_reservations = StockReservationDB.__table__
+_SHARD_LEVELS = (
+  select(_shards.c.product_id, _shards.c.shard, _shards.c.available)
+  .where(_shards.c.product_id.in_(bindparam("products", expanding=True)))
+)
+_TAKE = (
+  update(_shards)
+  .where(
+    _shards.c.product_id == bindparam("product"),
+    _shards.c.shard == bindparam("slot"),
+    _shards.c.available >= bindparam("units"),
+  )
+  .values(available=_shards.c.available - bindparam("units"))
+)
+_GIVE = (
+  update(_shards)
+  .where(_shards.c.product_id == bindparam("product"), _shards.c.shard == bindparam("slot"))
+  .values(available=_shards.c.available + bindparam("units"))
+)
+_FIRST_SHARD = select(func.min(_shards.c.shard)).where(_shards.c.product_id == bindparam("product")).scalar_subquery()
+_GIVE_TO_FIRST = (
+  update(_shards)
+  .where(_shards.c.product_id == bindparam("product"), _shards.c.shard == _FIRST_SHARD)
+  .values(available=_shards.c.available + bindparam("units"))
+)
+_CLAIM_HELD = (
+  update(_reservations)
+  .where(_reservations.c.order_id == bindparam("order"), _reservations.c.status == "held")
+  .values(status=bindparam("new_status"))
+  .returning(_reservations.c.product_id, _reservations.c.shard, _reservations.c.quantity)
+)
+# For databases without UPDATE ... RETURNING (MySQL): lock the rows, then update.
+_LOCK_HELD = (
+  select(_reservations.c.id, _reservations.c.product_id, _reservations.c.shard, _reservations.c.quantity)
+  .where(_reservations.c.order_id == bindparam("order"), _reservations.c.status == "held")
+  .with_for_update()
+)
+_SET_STATUS = (
+  update(_reservations)
+  .where(_reservations.c.id.in_(bindparam("ids", expanding=True)))
+  .values(status=bindparam("new_status"))
+)
+
+
+class OutOfStock(ValueError):
+  def __init__(self, product_id: str):
+    super().__init__(f"Insufficient stock for {product_id}")
+    self.product_id = product_id
+
+
+def set_stock(db: Session, product_id: str, quantity: int | None, shards: int = STOCK_SHARDS) -> None:
+  """Make `quantity` units of a product available, split evenly over
+  `shards` rows; None stops tracking it. Units held by reservations are not
+  counted and come back on top of `quantity` if released."""
+  db.execute(delete(StockShardDB).where(StockShardDB.product_id == product_id))
+  if quantity is None:
+    return
+  per_shard, extra = divmod(quantity, shards)
+  db.execute(insert(StockShardDB), [
+    {"product_id": product_id, "shard": shard, "available": per_shard + (shard < extra)}
+    for shard in range(shards)
+  ])
+
+
+def stock_levels(db: Session, product_ids: Iterable[str]) -> dict[str, int]:
+  """Available units per product; untracked products are left out."""
+  rows = db.execute(
+    select(StockShardDB.product_id, func.sum(StockShardDB.available))
+    .where(StockShardDB.product_id.in_(set(product_ids)))
+    .group_by(StockShardDB.product_id)
+  )
+  return {product_id: int(available) for product_id, available in rows}
+
+
+def _shard_levels(db: Session, product_ids: Iterable[str]) -> dict[str, list[list[int]]]:
+  """[shard, available] per tracked product; takes update the lists, so a
+  batch can keep using them."""
+  levels: dict[str, list[list[int]]] = {}
+  for product_id, shard, available in db.execute(_SHARD_LEVELS, {"products": list(set(product_ids))}):
+    levels.setdefault(product_id, []).append([shard, available])
+  return levels
+
+
+def _take(db: Session, product_id: str, shard: int, quantity: int) -> bool:
+  """Atomically take `quantity` units from one shard if it still has them."""
+  return db.execute(_TAKE, {"product": product_id, "slot": shard, "units": quantity}).rowcount == 1
+
+
+def _give(db: Session, product_id: str, shard: int, quantity: int) -> None:
+  """Return units to their shard, or to the product's first shard if the
+  stock was reset since; they are dropped if the product is untracked now."""
+  params = {"product": product_id, "slot": shard, "units": quantity}
+  if not db.execute(_GIVE, params).rowcount:
+    db.execute(_GIVE_TO_FIRST, params)
+
+
+def _take_from_shards(
+  db: Session, product_id: str, quantity: int, levels: list[list[int]], taken: list,
+) -> int:
+  """Take up to `quantity` units, trying shards from a random one onwards;
+  returns how many are still missing."""
+  start = random.randrange(len(levels)) if levels else 0
+  for level in levels[start:] + levels[:start]:
+    shard, available = level
+    take = min(available, quantity)
+    if take > 0 and _take(db, product_id, shard, take):
+      level[1] -= take
+      taken.append((product_id, shard, take))
+      quantity -= take
+      if not quantity:
+        break
+  return quantity
+
+
+def take_stock(
+  db: Session, lines: Iterable[tuple[str, int]], levels: dict[str, list[list[int]]] | None = None,
+) -> list[tuple[str, int, int]]:
+  """Take stock for (product id, quantity) lines, skipping untracked
+  products. Returns what was taken as (product id, shard, quantity).
+
+  `levels` are shard levels read earlier for these products; see
+  `take_stock_batch`. Raises OutOfStock if a tracked product is short, after
+  putting back what this call took, so the caller's transaction can carry on
+  without it.
+  """
+  lines = list(lines)
+  if levels is None:
+    levels = _shard_levels(db, (product_id for product_id, _ in lines))
+  taken: list[tuple[str, int, int]] = []
+  try:
+    for product_id, quantity in lines:
+      if product_id not in levels:
+        continue
+      missing = _take_from_shards(db, product_id, quantity, levels[product_id], taken)
+      if missing:  # the levels read earlier may be stale; retry once with fresh ones
+        levels[product_id] = _shard_levels(db, [product_id]).get(product_id, [])
+        missing = _take_from_shards(db, product_id, missing, levels[product_id], taken)
+      if missing:
+        raise OutOfStock(product_id)
+  except OutOfStock:
+    for product_id, shard, quantity in taken:
+      _give(db, product_id, shard, quantity)
+      for level in levels.get(product_id, ()):
+        if level[0] == shard:
+          level[1] += quantity
+    raise
+  return taken
+
+
+def _take_each(db: Session, carts: list[list[tuple[str, int]]]) -> list[list[tuple[str, int, int]] | OutOfStock]:
+  levels = _shard_levels(db, (product_id for lines in carts for product_id, _ in lines))
+  results: list[list[tuple[str, int, int]] | OutOfStock] = []
+  for lines in carts:
+    try:
+      results.append(take_stock(db, lines, levels))
+    except OutOfStock as e:
+      results.append(e)
+  return results
+
+
+def _allocate(need: dict[str, int], pools: dict[str, deque]) -> list[tuple[str, int, int]]:
+  """Hand `need` units per product out of the batch's shard takes."""
+  taken = []
+  for product_id, quantity in need.items():
+    pool = pools[product_id]
+    while quantity:
+      take = min(pool[0][1], quantity)
+      taken.append((product_id, pool[0][0], take))
+      quantity -= take
+      pool[0][1] -= take
+      if not pool[0][1]:
+        pool.popleft()
+  return taken
+
+
+def take_stock_batch(db: Session, carts: list[list[tuple[str, int]]]) -> list[list[tuple[str, int, int]] | OutOfStock]:
+  """`take_stock` for each cart in order, with a statement count that does
+  not grow with the number of carts.
+
+  Shard levels are read once. Carts are admitted in order against them (a
+  short cart gets its OutOfStock in its slot), then each product's admitted
+  total is taken with one UPDATE per shard it comes from and shared out. If
+  another checkout got to the stock first, that is undone and the carts are
+  taken one at a time instead.
+  """
+  product_ids = {product_id for lines in carts for product_id, _ in lines}
+  levels = _shard_levels(db, product_ids) if product_ids else {}
+  if not levels:
+    return [[] for _ in carts]
+
+  free = {product_id: sum(available for _, available in shards) for product_id, shards in levels.items()}
+  demand: dict[str, int] = {}
+  admitted: list[dict[str, int] | OutOfStock] = []
+  for lines in carts:
+    need: dict[str, int] = {}
+    for product_id, quantity in lines:
+      if product_id in levels:
+        need[product_id] = need.get(product_id, 0) + quantity
+    short = next((product_id for product_id, quantity in need.items() if quantity > free[product_id]), None)
+    if short is not None:
+      admitted.append(OutOfStock(short))
+      continue
+    for product_id, quantity in need.items():
+      free[product_id] -= quantity
+      demand[product_id] = demand.get(product_id, 0) + quantity
+    admitted.append(need)
+
+  taken: list[tuple[str, int, int]] = []
+  for product_id, quantity in demand.items():
+    if _take_from_shards(db, product_id, quantity, levels[product_id], taken):
+      for product_id, shard, quantity in taken:
+        _give(db, product_id, shard, quantity)
+      return _take_each(db, carts)
+
+  pools: dict[str, deque] = {}
+  for product_id, shard, quantity in taken:
+    pools.setdefault(product_id, deque()).append([shard, quantity])
+  return [need if isinstance(need, OutOfStock) else _allocate(need, pools) for need in admitted]
+
+
+def reservation_rows(order_id: str, taken: list[tuple[str, int, int]], status: str = "held") -> list[dict]:
+  """`StockReservationDB` rows recording stock an order took."""
+  now = datetime.utcnow()
+  expires_at = now + timedelta(minutes=RESERVATION_TTL_MINUTES)
+  return [
+    {
+      "order_id": order_id,
+      "product_id": product_id,
+      "shard": shard,
+      "quantity": quantity,
+      "status": status,
+      "expires_at": expires_at,
+      "created_at": now,
+    }
+    for product_id, shard, quantity in taken
+  ]
+
+
+def record_reservations(db: Session, rows: list[dict]) -> None:
+  if rows:
+    db.execute(insert(_reservations), rows)
+
+
+def reserve_stock(db: Session, order_id: str, lines: Iterable[tuple[str, int]], status: str = "held") -> int:
+  """Take stock for an order and record the reservation; returns the units
+  reserved. Raises OutOfStock as `take_stock` does."""
+  taken = take_stock(db, lines)
+  record_reservations(db, reservation_rows(order_id, taken, status))
+  return sum(quantity for _, _, quantity in taken)
+
+
+def _claim_held(db: Session, order_id: str, status: str) -> list[tuple[str, int, int]]:
+  """Move all of an order's held reservations to `status` atomically, so a
+  concurrent commit and release cannot split them."""
+  if db.get_bind().dialect.update_returning:
+    return [tuple(row) for row in db.execute(_CLAIM_HELD, {"order": order_id, "new_status": status})]
+  rows = db.execute(_LOCK_HELD, {"order": order_id}).all()
+  if rows:
+    db.execute(_SET_STATUS, {"ids": [row.id for row in rows], "new_status": status})
+  return [(row.product_id, row.shard, row.quantity) for row in rows]
+
+
+def commit_reservations(db: Session, order_id: str) -> bool:
+  """Keep a paid order's reserved stock for good.
+
+  If the hold already lapsed (timeout or a reported payment failure), the
+  stock is reserved again. Returns False if that fails for lack of stock.
+  """
+  if _claim_held(db, order_id, "committed"):
+    return True
+  statuses = set(db.scalars(
+    select(StockReservationDB.status).where(StockReservationDB.order_id == order_id).distinct()
+  ))
+  if statuses != {"released"}:  # nothing tracked, or committed already
+    return True
+  lines = db.execute(
+    select(OrderItemDB.product_id, OrderItemDB.quantity).where(OrderItemDB.order_id == order_id)
+  ).all()
+  try:
+    reserve_stock(db, order_id, lines, status="committed")
+  except OutOfStock:
+    return False
+  return True
+
+
+def release_reservations(db: Session, order_id: str) -> int:
+  """Put an order's held stock back; returns the units released."""
+  released = _claim_held(db, order_id, "released")
+  for product_id, shard, quantity in released:
+    _give(db, product_id, shard, quantity)
+  return sum(quantity for _, _, quantity in released)
+
+
+def expired_orders_query(now: datetime, limit: int = SWEEP_BATCH_SIZE) -> Select:
+  """Orders holding stock past their reservation's expiry."""
+  return (
+    select(StockReservationDB.order_id)
+    .where(StockReservationDB.status == "held", StockReservationDB.expires_at < now)
+    .distinct()
+    .limit(limit)
+  )
+
+
+class ReservationSweeper:
+  """Background thread that releases reservations nobody paid for in time.
+
+  Their orders, if still unpaid, get status "expired" but stay payable: a
+  late payment re-reserves the stock through `commit_reservations`, or marks
+  the order backordered if it has sold out.
+  """
+
+  def __init__(self, interval: float = RESERVATION_SWEEP_SECONDS, session_factory=SessionLocal):
+    self.interval = interval
+    self._session_factory = session_factory
+    self._stopping = threading.Event()
+    self._thread: threading.Thread | None = None
+
+  def start(self) -> None:
+    if self._thread:
+      return
+    self._stopping.clear()
+    self._thread = threading.Thread(target=self._run, name="stock-reservation-sweeper", daemon=True)
+    self._thread.start()
+
+  def stop(self, timeout: float = 10.0) -> None:
+    self._stopping.set()
+    if self._thread:
+      self._thread.join(timeout)
+    self._thread = None
+
+  def sweep(self, now: datetime | None = None) -> int:
+    """Release every expired reservation; returns the units released."""
+    released = 0
+    db = self._session_factory()
+    try:
+      while True:
+        order_ids = list(db.scalars(expired_orders_query(now or datetime.utcnow())))
+        if not order_ids:
+          return released
+        for order_id in order_ids:
+          released += release_reservations(db, order_id)
+        db.execute(
+          update(OrderDB)
+          .where(OrderDB.id.in_(order_ids), OrderDB.payment_status != "paid")
+          .values(status="expired")
+          .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+      db.close()
+
+  def _run(self) -> None:
+    while not self._stopping.wait(self.interval):
+      try:
+        released = self.sweep()
+        if released:
+          print(f"Released {released} units of expired stock reservations")
+      except Exception as e:
+        print(f"Stock reservation sweeper error: {e}")
+
+
+reservation_sweeper = ReservationSweeper()
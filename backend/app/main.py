@@ -1,32 +1,81 @@
 from __future__ import annotations
+import hashlib
+import json
+import time
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi import FastAPI, HTTPException, Header, Query, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-
-from .database import engine, get_db, Base
-from .crud import init_db, list_products, get_product_by_id, get_categories, get_brands, create_order, list_orders
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import async_engine, get_db, get_async_db, pool_status
+from .catalog import catalog
+from .pricing import pricing
+from .inventory import (
+  OutOfStock,
+  record_reservations,
+  release_reservations,
+  reservation_rows,
+  reservation_sweeper,
+  reserve_stock,
+  stock_levels,
+  take_stock_batch,
+)
+from .metrics import MetricsMiddleware, registry
+from .response_cache import cache_key, response_cache
+from .product_cache import product_cache
+from .crud import init_db
+from .ids import new_order_id
+from .idempotency import MAX_KEY_LENGTH, IdempotencyKeyReused, commit_with_response, find_response, request_fingerprint
+from .schema import DB_AUTO_MIGRATE, upgrade_schema
+from .async_crud import (
+  get_brands,
+  create_order,
+  create_orders_bulk,
+  list_orders,
+)
 from .schemas import (
   Product,
   Brand,
-  Order,
   OrderCreateRequest,
   OrderCreateResponse,
+  OrdersResponse,
+  BulkOrderCreateRequest,
+  BulkOrderCreateResponse,
   ProductsResponse,
   RazorpayOrderRequest,
   RazorpayOrderResponse,
   PaymentVerificationRequest,
+  PaymentFailureRequest,
+  StockLevel,
 )
-from .models import ProductDB, BrandDB, OrderDB
-from .razorpay_utils import create_razorpay_order, verify_payment_signature, RAZORPAY_KEY_ID
-from .email_service import send_order_confirmation_email, send_payment_success_email, send_account_created_email, send_login_notification_email
+from .models import OrderDB
+from .serializers import brand_dict, dumps, encode_product, order_dict, product_row, products_page
+from .razorpay_utils import verify_payment_signature, verify_webhook_signature, RAZORPAY_KEY_ID
+from .razorpay_gateway import GatewayUnavailable, razorpay_gateway
+from .payments import link_gateway_order, mark_paid, payment_event_consumer, payment_reconciler, record_event
+from .outbox import enqueue_email, outbox_workers
 
 app = FastAPI(title="GTR Motors API", version="0.1.0")
 
-# Create tables on startup
-Base.metadata.create_all(bind=engine)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+DEFAULT_ORDERS_PAGE_SIZE = 50
+
+# Map old product IDs to new prod_X format
+LEGACY_PRODUCT_IDS = {
+  'turbocharger': 'prod_1',
+  'brake-kit': 'prod_2',
+  'suspension': 'prod_3',
+  'exhaust': 'prod_4',
+  'racing-seat': 'prod_5',
+  'carbon-hood': 'prod_6',
+  'intercooler': 'prod_7',
+  'racing-wheel': 'prod_8',
+}
 
 app.add_middleware(
   CORSMiddleware,
@@ -35,11 +84,35 @@ app.add_middleware(
   allow_methods=["*"],
   allow_headers=["*"],
 )
+# Outermost, so its timings cover the whole middleware stack.
+app.add_middleware(MetricsMiddleware)
 
 
-@app.on_event("startup")
-def startup_event():
-  """Initialize database with seed data on startup."""
+def _gauges() -> list[tuple]:
+  pools = pool_status()
+  cache = product_cache.stats()
+  return [
+    ("db_pool_checked_out", "gauge", "Connections currently checked out of the pool.",
+     [({"engine": name}, status.get("checkedout", 0)) for name, status in pools.items()]),
+    ("product_cache_lookups_total", "counter", "Product cache lookups by result.",
+     [({"result": result}, cache[result]) for result in ("hits", "negative_hits", "misses", "coalesced")]),
+    ("product_cache_entries", "gauge", "Products currently cached.", [({}, cache["entries"])]),
+  ]
+
+
+registry.add_collector(_gauges)
+
+
+# Milliseconds spent in each startup phase, reported by /health.
+startup_timings: dict[str, float] = {}
+_preloaded = False
+# Whether this process runs the background jobs (email outbox, reservation
+# sweeper, payment event consumer and reconciler). serve.py turns it off in
+# all workers but one.
+background_jobs = True
+
+
+def _seed_database() -> None:
   db = next(get_db())
   try:
     init_db(db)
@@ -47,177 +120,284 @@ def startup_event():
     db.close()
 
 
+def _run_phases(phases) -> None:
+  for name, phase in phases:
+    start = time.perf_counter()
+    phase()
+    startup_timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def preload() -> None:
+  """Migrate and seed the database and load the catalog and price book.
+
+  serve.py calls this once in the parent process, so forked workers start
+  with the catalog already in (shared) memory and skip these phases.
+  """
+  global _preloaded
+  _run_phases([
+    *([("migrate", upgrade_schema)] if DB_AUTO_MIGRATE else []),
+    ("seed", _seed_database),
+    ("catalog", catalog.snapshot),
+    ("pricing", pricing.book),
+  ])
+  _preloaded = True
+
+
+@app.on_event("startup")
+def startup_event():
+  """Migrate and seed the database and warm the catalog on startup."""
+  if not _preloaded:
+    startup_timings.clear()
+    preload()
+  if background_jobs:
+    _run_phases([
+      ("outbox", outbox_workers.start),
+      ("reservations", reservation_sweeper.start),
+      ("payment_events", payment_event_consumer.start),
+      ("reconciler", payment_reconciler.start),
+    ])
+  startup_timings["total"] = round(sum(ms for name, ms in startup_timings.items() if name != "total"), 1)
+  print("Startup: " + ", ".join(f"{name} {ms:g}ms" for name, ms in startup_timings.items()))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+  await run_in_threadpool(outbox_workers.stop)
+  await run_in_threadpool(reservation_sweeper.stop)
+  await run_in_threadpool(payment_event_consumer.stop)
+  await run_in_threadpool(payment_reconciler.stop)
+  await razorpay_gateway.aclose()
+  await async_engine.dispose()
+
+
 @app.get("/health")
-def health() -> dict:
-  return {"status": "ok", "uptimeSeconds": round(datetime.now().timestamp())}
+async def health() -> dict:
+  return {
+    "status": "ok",
+    "uptimeSeconds": round(datetime.now().timestamp()),
+    "database": pool_status(),
+    "productCache": product_cache.stats(),
+    "startupMs": startup_timings,
+  }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+  """Request latency, SQL and external call histograms in Prometheus text format."""
+  return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/products", response_model=ProductsResponse)
-def list_products_endpoint(
+async def list_products_endpoint(
+  request: Request,
   q: Optional[str] = Query(default=None, description="Full-text search"),
   brand: Optional[str] = Query(default=None),
   category: Optional[str] = Query(default=None),
   minPrice: Optional[float] = Query(default=None, ge=0),
   maxPrice: Optional[float] = Query(default=None, ge=0),
   sort: Optional[str] = Query(default=None, description="price-asc|price-desc|rating-desc"),
-  db: Session = Depends(get_db),
+  limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+  offset: int = Query(default=0, ge=0),
+  cursor: Optional[str] = Query(default=None, description="nextCursor from the previous page"),
+  facets: bool = Query(default=False, description="Include brand/category/price facet counts"),
 ):
-  result = list_products(db, q=q, brand=brand, category=category, min_price=minPrice, max_price=maxPrice)
-
-  products_list: List[Product] = [
-    Product(
-      id=p.id,
-      name=p.name,
-      description=p.description,
-      price=p.price,
-      brand=p.brand,
-      category=p.category,
-      imageUrl=p.imageUrl,
-      imageHint=p.imageHint,
-      rating=p.rating,
-      reviewCount=p.reviewCount,
-      discount=p.discount,
+  async def render() -> bytes:
+    snapshot = await catalog.refresh()
+    try:
+      page = catalog.query(
+        q=q, brand=brand, category=category, min_price=minPrice, max_price=maxPrice, sort=sort,
+        limit=limit, offset=offset, cursor=cursor, snapshot=snapshot, facets=facets,
+      )
+    except ValueError as e:
+      raise HTTPException(status_code=400, detail=str(e))
+    return products_page(
+      (page.snapshot.encoded(pos) for pos in page.positions), page.total, page.next_cursor, page.facets,
     )
-    for p in result
-  ]
-
-  if sort == "price-asc":
-    products_list.sort(key=lambda p: p.price)
-  elif sort == "price-desc":
-    products_list.sort(key=lambda p: p.price, reverse=True)
-  elif sort == "rating-desc":
-    products_list.sort(key=lambda p: p.rating, reverse=True)
 
-  return {"items": products_list, "total": len(products_list)}
+  key = cache_key("/products", {
+    "q": q, "brand": brand, "category": category, "minPrice": minPrice, "maxPrice": maxPrice,
+    "sort": sort, "limit": limit, "offset": offset, "cursor": cursor, "facets": facets or None,
+  })
+  return await response_cache.respond(request, key, render)
 
 
 @app.get("/products/{product_id}", response_model=Product)
-def get_product(product_id: str, db: Session = Depends(get_db)):
-  product = get_product_by_id(db, product_id)
-  if not product:
+async def get_product(product_id: str, request: Request):
+  async def render() -> bytes:
+    row = await product_cache.get(product_id)
+    if not row:
+      raise HTTPException(status_code=404, detail="Product not found")
+    return encode_product(row)
+
+  return await response_cache.respond(request, cache_key(f"/products/{product_id}"), render)
+
+
+@app.get("/products/{product_id}/stock", response_model=StockLevel)
+async def get_product_stock(product_id: str, db: AsyncSession = Depends(get_async_db)):
+  """Units available to order; `available` is null for untracked products.
+  Not cached, since it changes with every checkout."""
+  if not await product_cache.get(product_id):
     raise HTTPException(status_code=404, detail="Product not found")
-  return Product(
-    id=product.id,
-    name=product.name,
-    description=product.description,
-    price=product.price,
-    brand=product.brand,
-    category=product.category,
-    imageUrl=product.imageUrl,
-    imageHint=product.imageHint,
-    rating=product.rating,
-    reviewCount=product.reviewCount,
-    discount=product.discount,
-  )
+  levels = await db.run_sync(stock_levels, [product_id])
+  return {"productId": product_id, "tracked": product_id in levels, "available": levels.get(product_id)}
 
 
 @app.get("/brands", response_model=List[Brand])
-def list_brands(db: Session = Depends(get_db)):
-  brands_db = get_brands(db)
-  return [
-    Brand(id=b.id, name=b.name, logoUrl=b.logoUrl, logoHint=b.logoHint)
-    for b in brands_db
-  ]
+async def list_brands(request: Request, db: AsyncSession = Depends(get_async_db)):
+  async def render() -> bytes:
+    return dumps([brand_dict(b) for b in await get_brands(db)])
+
+  return await response_cache.respond(request, cache_key("/brands"), render)
 
 
 @app.get("/categories", response_model=List[str])
-def list_categories(db: Session = Depends(get_db)):
-  return get_categories(db)
-
-
-@app.get("/orders", response_model=List[Order])
-def list_orders_endpoint(db: Session = Depends(get_db)):
-  """This returns order metadata. For full order details with items, use POST."""
-  orders_db = list_orders(db)
-  result = []
-  for order in orders_db:
-    items = []
-    for product in order.products:
-      items.append({
-        "product": Product(
-          id=product.id,
-          name=product.name,
-          description=product.description,
-          price=product.price,
-          brand=product.brand,
-          category=product.category,
-          imageUrl=product.imageUrl,
-          imageHint=product.imageHint,
-          rating=product.rating,
-          reviewCount=product.reviewCount,
-          discount=product.discount,
-        ),
-        "quantity": 1  # Note: schema association_table stores quantity; adjust if needed
-      })
-    result.append(Order(
-      id=order.id,
-      date=order.date,
-      status=order.status,
-      total=order.total,
-      items=items,
-    ))
-  return result
+async def list_categories(request: Request):
+  async def render() -> bytes:
+    return dumps((await catalog.refresh()).categories)
+
+  return await response_cache.respond(request, cache_key("/categories"), render)
+
+
+@app.get("/orders", response_model=OrdersResponse)
+async def list_orders_endpoint(
+  status: Optional[str] = Query(default=None),
+  paymentStatus: Optional[str] = Query(default=None, description="pending|paid|failed"),
+  dateFrom: Optional[str] = Query(default=None, description="YYYY-MM-DD, inclusive"),
+  dateTo: Optional[str] = Query(default=None, description="YYYY-MM-DD, inclusive"),
+  limit: int = Query(default=DEFAULT_ORDERS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+  cursor: Optional[str] = Query(default=None, description="nextCursor from the previous page"),
+  db: AsyncSession = Depends(get_async_db),
+):
+  """List orders newest first with their line items."""
+  orders_db = await list_orders(
+    db, status=status, payment_status=paymentStatus, date_from=dateFrom, date_to=dateTo,
+    before=cursor, limit=limit + 1,
+  )
+  next_cursor = orders_db[limit - 1].id if len(orders_db) > limit else None
+  items = [
+    order_dict(order, [(product_row(item.product), item.quantity) for item in order.order_items])
+    for order in orders_db[:limit]
+  ]
+  return {"items": items, "nextCursor": next_cursor}
+
+
+async def _replay(db: AsyncSession, key: str | None, route: str, payload) -> tuple[str | None, Response | None]:
+  """Fingerprint an Idempotency-Key request and find its earlier response."""
+  if not key:
+    return None, None
+  fingerprint = request_fingerprint(route, payload)
+  try:
+    return fingerprint, await find_response(db, key, fingerprint)
+  except IdempotencyKeyReused as e:
+    raise HTTPException(status_code=422, detail=str(e))
 
 
 @app.post("/orders", response_model=OrderCreateResponse, status_code=201)
-def create_order_endpoint(payload: OrderCreateRequest, db: Session = Depends(get_db)):
-  # Map old product IDs to new prod_X format
-  product_id_map = {
-    'turbocharger': 'prod_1',
-    'brake-kit': 'prod_2',
-    'suspension': 'prod_3',
-    'exhaust': 'prod_4',
-    'racing-seat': 'prod_5',
-    'carbon-hood': 'prod_6',
-    'intercooler': 'prod_7',
-    'racing-wheel': 'prod_8',
-  }
-  
-  product_ids = []
-  total = 0.0
+async def create_order_endpoint(
+  payload: OrderCreateRequest,
+  db: AsyncSession = Depends(get_async_db),
+  idempotency_key: Optional[str] = Header(None, max_length=MAX_KEY_LENGTH),
+):
+  """Create an order, reserving stock for tracked products (409 if short).
+  A retry with the same Idempotency-Key header and body gets the original
+  response back instead of a second order."""
+  fingerprint, replay = await _replay(db, idempotency_key, "POST /orders", payload)
+  if replay is not None:
+    return replay
+
+  # Convert old product IDs to the prod_X format
+  lines = [(LEGACY_PRODUCT_IDS.get(item.productId, item.productId), item.quantity) for item in payload.items]
+  book = await pricing.current()
+  try:
+    quote = book.quote(lines)
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
 
-  for item in payload.items:
-    # Convert old ID to new ID if needed
-    product_id = product_id_map.get(item.productId, item.productId)
-    
-    product = get_product_by_id(db, product_id)
-    if not product:
-      raise HTTPException(status_code=400, detail=f"Unknown product: {item.productId}")
-    product_ids.append((product_id, item.quantity))
-    total += product.price * item.quantity
-
-  order_id = f"ORD-{int(datetime.utcnow().timestamp() * 1000)}"
-  order_db = create_order(db, order_id, datetime.utcnow().strftime("%Y-%m-%d"), round(total, 2), product_ids)
-
-  items = []
-  for product_id, qty in product_ids:
-    product = get_product_by_id(db, product_id)
-    items.append({
-      "product": Product(
-        id=product.id,
-        name=product.name,
-        description=product.description,
-        price=product.price,
-        brand=product.brand,
-        category=product.category,
-        imageUrl=product.imageUrl,
-        imageHint=product.imageHint,
-        rating=product.rating,
-        reviewCount=product.reviewCount,
-        discount=product.discount,
-      ),
-      "quantity": qty,
-    })
-
-  new_order = Order(
-    id=order_db.id,
-    date=order_db.date,
-    status=order_db.status,
-    total=order_db.total,
-    items=items,
+  order_db = await create_order(
+    db, new_order_id(), datetime.utcnow().strftime("%Y-%m-%d"), quote.total, quote.lines, quote.price_book,
+    commit=False,
   )
+  try:
+    await db.run_sync(reserve_stock, order_db.id, quote.lines)
+  except OutOfStock as e:
+    raise HTTPException(status_code=409, detail=str(e))
+
+  items = [(book.snapshot.get(product_id), qty) for product_id, qty in quote.lines]
+  body = {"order": order_dict(order_db, items)}
+  if idempotency_key:
+    return await commit_with_response(
+      db, idempotency_key, fingerprint, 201, OrderCreateResponse.model_validate(body),
+    )
+  await db.commit()
+  return body
+
+
+@app.post("/orders/bulk", response_model=BulkOrderCreateResponse)
+async def create_orders_bulk_endpoint(
+  payload: BulkOrderCreateRequest,
+  db: AsyncSession = Depends(get_async_db),
+  idempotency_key: Optional[str] = Header(None, max_length=MAX_KEY_LENGTH),
+):
+  """Validate, price and insert a batch of orders in one transaction.
+
+  Invalid orders, and orders a tracked product is out of stock for, are
+  reported in their result slot and skipped; the rest are written together. Idempotency-Key works as for POST /orders.
+  """
+  fingerprint, replay = await _replay(db, idempotency_key, "POST /orders/bulk", payload)
+  if replay is not None:
+    return replay
+
+  carts = [
+    [(LEGACY_PRODUCT_IDS.get(item.productId, item.productId), item.quantity) for item in order.items]
+    for order in payload.orders
+  ]
+  book = await pricing.current()  # one price book version for the whole batch
 
-  return {"order": new_order}
+  quotes, errors = {}, {}
+  for index, lines in enumerate(carts):
+    try:
+      quotes[index] = book.quote(lines)
+    except ValueError as e:
+      errors[index] = str(e)
+  # Stock for the whole batch in one call, with one shard level query
+  stock = dict(zip(quotes, await db.run_sync(take_stock_batch, [quote.lines for quote in quotes.values()])))
+
+  date = datetime.utcnow().strftime("%Y-%m-%d")
+  order_rows, item_rows, reservations, results = [], [], [], []
+  for index in range(len(carts)):
+    taken = stock.get(index)
+    if isinstance(taken, OutOfStock):
+      errors[index] = str(taken)
+    if index in errors:
+      results.append({"index": index, "error": errors[index]})
+      continue
+    quote = quotes[index]
+
+    row = {
+      "id": new_order_id(),
+      "date": date,
+      "status": "Processing",
+      "total": quote.total,
+      "payment_status": "pending",
+      "price_book_version": quote.price_book,
+    }
+    order_rows.append(row)
+    item_rows.extend(
+      {"order_id": row["id"], "product_id": product_id, "quantity": qty} for product_id, qty in quote.lines
+    )
+    reservations.extend(reservation_rows(row["id"], taken))
+    items = [(book.snapshot.get(product_id), qty) for product_id, qty in quote.lines]
+    results.append({"index": index, "order": order_dict(OrderDB(**row), items)})
+
+  await create_orders_bulk(db, order_rows, item_rows, commit=False)
+  await db.run_sync(record_reservations, reservations)
+  body = {"created": len(order_rows), "failed": len(results) - len(order_rows), "results": results}
+  if idempotency_key:
+    return await commit_with_response(
+      db, idempotency_key, fingerprint, 200, BulkOrderCreateResponse.model_validate(body),
+    )
+  await db.commit()
+  return body
 
 
 # ===== Payment Routes =====
@@ -225,36 +405,45 @@ def create_order_endpoint(payload: OrderCreateRequest, db: Session = Depends(get
 @app.post("/payments/create-order", response_model=RazorpayOrderResponse)
 async def create_payment_order(
     request: RazorpayOrderRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a Razorpay order for payment processing.
-    Amount should be in rupees.
+    Amount should be in rupees. If the receipt is one of our order ids, the
+    Razorpay order is linked to it for webhooks and reconciliation.
     """
     try:
-        razorpay_order = create_razorpay_order(
+        razorpay_order = await razorpay_gateway.create_order(
             amount=request.amount,
             currency=request.currency,
             receipt=request.receipt
         )
-        
-        return RazorpayOrderResponse(
-            id=razorpay_order["id"],
-            amount=razorpay_order["amount"],
-            currency=razorpay_order["currency"],
-            key_id=RAZORPAY_KEY_ID
-        )
+    except GatewayUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Payment gateway unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create Razorpay order: {str(e)}")
+    
+    if request.receipt:
+        await db.run_sync(link_gateway_order, request.receipt, razorpay_order["id"], razorpay_order["amount"])
+        await db.commit()
+    
+    return RazorpayOrderResponse(
+        id=razorpay_order["id"],
+        amount=razorpay_order["amount"],
+        currency=razorpay_order["currency"],
+        key_id=RAZORPAY_KEY_ID
+    )
 
 
 @app.post("/payments/verify")
 async def verify_payment(
     verification: PaymentVerificationRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Verify Razorpay payment signature and update order status.
+    The order's reserved stock becomes permanent. The payment webhook may
+    have marked the order paid already; shipping details are still saved.
     """
     # Verify signature
     is_valid = verify_payment_signature(
@@ -267,15 +456,17 @@ async def verify_payment(
         raise HTTPException(status_code=400, detail="Invalid payment signature")
     
     # Update order with payment details
-    order = db.query(OrderDB).filter(OrderDB.id == verification.order_id).first()
+    order = await db.get(OrderDB, verification.order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    order.payment_status = "paid"
-    order.razorpay_order_id = verification.razorpay_order_id
-    order.razorpay_payment_id = verification.razorpay_payment_id
+    # A repeated verify finds the email already sent
+    send_email = order.payment_status != "paid" or order.customer_email is None
+    if order.payment_status != "paid":
+        await db.run_sync(
+            mark_paid, order, verification.razorpay_order_id, verification.razorpay_payment_id
+        )
     order.razorpay_signature = verification.razorpay_signature
-    order.status = "confirmed"
     
     # Save shipping details if provided
     if verification.shipping_details:
@@ -287,21 +478,20 @@ async def verify_payment(
         order.shipping_state = verification.shipping_details.state
         order.shipping_zip = verification.shipping_details.zip
     
-    db.commit()
-    db.refresh(order)
+    # Queue the payment confirmation email in the same transaction
+    if order.customer_email and send_email:
+        enqueue_email(
+            db,
+            "payment_success",
+            order.customer_email,
+            customer_name=order.customer_name or "Customer",
+            order_id=order.id,
+            payment_id=verification.razorpay_payment_id,
+            amount=order.total,
+        )
     
-    # Send payment confirmation email
-    if order.customer_email:
-        try:
-            send_payment_success_email(
-                to_email=order.customer_email,
-                customer_name=order.customer_name or "Customer",
-                order_id=order.id,
-                payment_id=verification.razorpay_payment_id,
-                amount=order.total
-            )
-        except Exception as e:
-            print(f"Failed to send payment confirmation email: {e}")
+    await db.commit()
+    outbox_workers.notify()
     
     return {
         "success": True,
@@ -311,46 +501,109 @@ async def verify_payment(
     }
 
 
-# Email notification endpoints
-@app.post("/api/email/send-account-created")
-def send_account_created(email_data: dict):
-    """Send welcome email when account is created"""
-    try:
-        to_email = email_data.get("to_email")
-        customer_name = email_data.get("customer_name", "Customer")
-        
-        if not to_email:
-            raise HTTPException(status_code=400, detail="to_email is required")
-        
-        send_account_created_email(to_email, customer_name)
-        
-        return {
-            "success": True,
-            "message": "Account creation email sent successfully"
-        }
-    except Exception as e:
-        print(f"Error sending account created email: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+@app.post("/payments/failure")
+async def report_payment_failure(
+    report: PaymentFailureRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Record a failed payment and release the order's reserved stock.
+    The customer may still retry; /payments/verify reserves the stock again
+    if it is still available.
+    """
+    order = await db.get(OrderDB, report.order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if order.payment_status == "paid":
+        raise HTTPException(status_code=409, detail="Order is already paid")
+
+    order.payment_status = "failed"
+    released = await db.run_sync(release_reservations, order.id)
+    await db.commit()
+    print(f"Payment failed for order {order.id}: {report.reason or 'no reason given'}; released {released} units")
 
+    return {
+        "success": True,
+        "order_id": order.id,
+        "payment_status": order.payment_status,
+        "released": released
+    }
 
-@app.post("/api/email/send-login-notification")
-def send_login_notification(email_data: dict):
-    """Send login notification email"""
+
+@app.post("/payments/webhook")
+async def razorpay_webhook(
+    request: Request,
+    x_razorpay_signature: Optional[str] = Header(None),
+    x_razorpay_event_id: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Receive a Razorpay webhook. The signed body is stored as received and
+    acknowledged straight away; the payment event consumer applies it to
+    the order. Redeliveries of a stored event are acknowledged again.
+    """
+    body = await request.body()
+    if not x_razorpay_signature or not verify_webhook_signature(body, x_razorpay_signature):
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
     try:
-        to_email = email_data.get("to_email")
-        customer_name = email_data.get("customer_name", "Customer")
-        device_info = email_data.get("device_info", "Web Browser")
-        
-        if not to_email:
-            raise HTTPException(status_code=400, detail="to_email is required")
-        
-        send_login_notification_email(to_email, customer_name, device_info=device_info)
-        
-        return {
-            "success": True,
-            "message": "Login notification email sent successfully"
-        }
-    except Exception as e:
-        print(f"Error sending login notification email: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        text = body.decode()
+        event = json.loads(text)["event"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Malformed webhook payload")
+    if not isinstance(event, str):
+        raise HTTPException(status_code=400, detail="Malformed webhook payload")
+    
+    # Razorpay always sends an event id; a body hash still dedupes without one
+    event_id = x_razorpay_event_id or f"sha256:{hashlib.sha256(body).hexdigest()}"
+    stored = await record_event(db, event_id, event, text)
+    if stored:
+        payment_event_consumer.notify()
+    
+    return {"status": "ok", "duplicate": not stored}
+
+
+# Email notification endpoints
+@app.post("/api/email/send-account-created", status_code=202)
+async def send_account_created(email_data: dict, db: AsyncSession = Depends(get_async_db)):
+    """Queue welcome email when account is created"""
+    to_email = email_data.get("to_email")
+    customer_name = email_data.get("customer_name", "Customer")
+    
+    if not to_email:
+        raise HTTPException(status_code=400, detail="to_email is required")
+    
+    enqueue_email(db, "account_created", to_email, customer_name=customer_name)
+    await db.commit()
+    outbox_workers.notify()
+    
+    return {
+        "success": True,
+        "message": "Account creation email queued"
+    }
+
 
+@app.post("/api/email/send-login-notification", status_code=202)
+async def send_login_notification(email_data: dict, db: AsyncSession = Depends(get_async_db)):
+    """Queue login notification email"""
+    to_email = email_data.get("to_email")
+    customer_name = email_data.get("customer_name", "Customer")
+    device_info = email_data.get("device_info", "Web Browser")
+    
+    if not to_email:
+        raise HTTPException(status_code=400, detail="to_email is required")
+    
+    enqueue_email(
+        db,
+        "login_notification",
+        to_email,
+        customer_name=customer_name,
+        login_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        device_info=device_info,
+    )
+    await db.commit()
+    outbox_workers.notify()
+    
+    return {
+        "success": True,
+        "message": "Login notification email queued"
+    }
@@ -0,0 +1,247 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+# Server-Timing exposes internal timings to clients; turn it off where that matters.
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "1") == "1"
+# Requests issuing more queries than this are logged, to surface N+1 patterns.
+METRICS_QUERY_COUNT_WARNING = int(os.getenv("METRICS_QUERY_COUNT_WARNING", "25"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+  pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+  if extra:
+    pairs.append(extra)
+  return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+  return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+  return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+  """Cumulative-bucket histogram with labels, rendered in Prometheus text format."""
+
+  def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+    self.name = name
+    self.help = help
+    self.labels = labels
+    self.buckets = buckets
+    self._lock = threading.Lock()
+    # label values -> [per-bucket counts..., +Inf count, sum]
+    self._series: dict[tuple, list[float]] = {}
+
+  def observe(self, value: float, *labels) -> None:
+    with self._lock:
+      series = self._series.get(labels)
+      if series is None:
+        series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+      for i, bound in enumerate(self.buckets):
+        if value <= bound:
+          series[i] += 1
+          break
+      else:
+        series[len(self.buckets)] += 1
+      series[-1] += value
+
+  def render(self) -> Iterable[str]:
+    yield f"# HELP {self.name} {self.help}"
+    yield f"# TYPE {self.name} histogram"
+    with self._lock:
+      series = sorted((labels, list(values)) for labels, values in self._series.items())
+    for labels, values in series:
+      cumulative = 0
+      for bound, count in zip(self.buckets + (float("inf"),), values):
+        cumulative += count
+        le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+        yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+      yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_number(values[-1])}"
+      yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+  """Histograms plus collectors that read gauges and counters at scrape time.
+
+  A collector returns `(name, type, help, [(labels dict, value), ...])`.
+  """
+
+  def __init__(self):
+    self.histograms: list[Histogram] = []
+    self.collectors: list[Callable[[], list[tuple]]] = []
+
+  def histogram(self, *args, **kwargs) -> Histogram:
+    histogram = Histogram(*args, **kwargs)
+    self.histograms.append(histogram)
+    return histogram
+
+  def add_collector(self, collector: Callable[[], list[tuple]]) -> None:
+    self.collectors.append(collector)
+
+  def render(self) -> str:
+    lines = []
+    for histogram in self.histograms:
+      lines.extend(histogram.render())
+    for collector in self.collectors:
+      for name, kind, help, samples in collector():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+          lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+http_request_duration = registry.histogram(
+  "http_request_duration_seconds", "Time to handle a request, by route template.",
+  ("method", "route", "status"),
+)
+db_queries_per_request = registry.histogram(
+  "db_queries_per_request", "SQL statements executed while handling a request.",
+  ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+db_time_per_request = registry.histogram(
+  "db_time_per_request_seconds", "Time spent in SQL while handling a request.", ("method", "route"),
+)
+db_query_duration = registry.histogram(
+  "db_query_duration_seconds", "Time per SQL statement, requests and background work alike.", ("engine",),
+)
+external_call_duration = registry.histogram(
+  "external_call_duration_seconds", "Time per call to an external service.", ("service", "operation", "outcome"),
+)
+
+
+class RequestTimings:
+  """Per-request totals by component ("db", "razorpay", "ses")."""
+
+  def __init__(self):
+    self.totals: dict[str, list[float]] = {}
+
+  def add(self, component: str, seconds: float) -> None:
+    total = self.totals.get(component)
+    if total is None:
+      self.totals[component] = [1, seconds]
+    else:
+      total[0] += 1
+      total[1] += seconds
+
+  def count(self, component: str) -> int:
+    return int(self.totals.get(component, (0, 0.0))[0])
+
+  def seconds(self, component: str) -> float:
+    return self.totals.get(component, (0, 0.0))[1]
+
+  def server_timing(self, total_seconds: float) -> str:
+    entries = []
+    for component, (count, seconds) in self.totals.items():
+      unit = ("query", "queries") if component == "db" else ("call", "calls")
+      entries.append(f'{component};dur={seconds * 1000:.2f};desc="{int(count)} {unit[count != 1]}"')
+    entries.append(f"app;dur={total_seconds * 1000:.2f}")
+    return ", ".join(entries)
+
+
+# Set by `MetricsMiddleware` for the duration of a request. It is inherited
+# by tasks and threadpool calls the request starts, so work done on its
+# behalf is attributed to it; background workers see None.
+current_timings: ContextVar[RequestTimings | None] = ContextVar("current_timings", default=None)
+
+
+def record(component: str, seconds: float) -> None:
+  timings = current_timings.get()
+  if timings is not None:
+    timings.add(component, seconds)
+
+
+@contextmanager
+def timed(service: str, operation: str):
+  """Time a call to an external service, for /metrics and Server-Timing."""
+  start = time.perf_counter()
+  outcome = "error"
+  try:
+    yield
+    outcome = "ok"
+  finally:
+    elapsed = time.perf_counter() - start
+    external_call_duration.observe(elapsed, service, operation, outcome)
+    record(service, elapsed)
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+  """Time every statement `engine` executes and count it against the current request."""
+
+  def before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+  def after(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+    db_query_duration.observe(elapsed, name)
+    record("db", elapsed)
+
+  def failed(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("metrics_query_start"):
+      after(connection, None, None, None, None, None)
+
+  event.listen(engine, "before_cursor_execute", before)
+  event.listen(engine, "after_cursor_execute", after)
+  event.listen(engine, "handle_error", failed)
+
+
+class MetricsMiddleware:
+  """ASGI middleware recording per-route latency and SQL counts.
+
+  Routes are labelled by their template (`/products/{product_id}`) so label
+  cardinality stays bounded; requests that match no route share one label.
+  Adds a Server-Timing header breaking the request down into SQL, Razorpay
+  and SES time.
+  """
+
+  def __init__(self, app, server_timing: bool = METRICS_SERVER_TIMING):
+    self.app = app
+    self.server_timing = server_timing
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    timings = RequestTimings()
+    token = current_timings.set(timings)
+    start = time.perf_counter()
+    status = 500
+
+    async def send_with_timing(message):
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = message["status"]
+        if self.server_timing:
+          MutableHeaders(scope=message).append("Server-Timing", timings.server_timing(time.perf_counter() - start))
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_with_timing)
+    finally:
+      elapsed = time.perf_counter() - start
+      current_timings.reset(token)
+      route = scope.get("route")
+      path = getattr(route, "path", None) or "unmatched"
+      method = scope["method"]
+      http_request_duration.observe(elapsed, method, path, status)
+      db_queries_per_request.observe(timings.count("db"), method, path)
+      db_time_per_request.observe(timings.seconds("db"), method, path)
+      if timings.count("db") > METRICS_QUERY_COUNT_WARNING:
+        print(f"Warning: {method} {scope['path']} ran {timings.count('db')} SQL queries")
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, Text
+from sqlalchemy import CheckConstraint, Column, Integer, String, Float, ForeignKey, Index, Table, Text, DateTime, func
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -11,8 +11,8 @@ class ProductDB(Base):
   name = Column(String, index=True, nullable=False)
   description = Column(Text, nullable=False)
   price = Column(Float, nullable=False)
-  brand = Column(String, index=True, nullable=False)
-  category = Column(String, index=True, nullable=False)
+  brand = Column(String, nullable=False)
+  category = Column(String, nullable=False)
   imageUrl = Column(String, nullable=False)
   imageHint = Column(String, nullable=False)
   rating = Column(Float, nullable=False)
@@ -21,6 +21,13 @@ class ProductDB(Base):
 
   order_items = relationship("OrderItemDB", back_populates="product")
 
+  # Brand/category filters are case-insensitive equality, often with a price
+  # range; see migrations/versions/0002_query_indexes.py and 0008.
+  __table_args__ = (
+    Index("ix_products_lower_category_price", func.lower(category), price),
+    Index("ix_products_lower_brand_price", func.lower(brand), price),
+  )
+
 
 class BrandDB(Base):
   __tablename__ = "brands"
@@ -50,9 +57,11 @@ class OrderDB(Base):
   status = Column(String, nullable=False)
   total = Column(Float, nullable=False)
   payment_status = Column(String, default="pending")  # pending, paid, failed
-  razorpay_order_id = Column(String, nullable=True)
+  razorpay_order_id = Column(String, nullable=True, index=True)
   razorpay_payment_id = Column(String, nullable=True)
   razorpay_signature = Column(String, nullable=True)
+  payment_amount_paise = Column(Integer, nullable=True)  # amount of the linked Razorpay order, shipping included
+  price_book_version = Column(String, nullable=True)  # PriceBook.digest of the prices the total used
   
   # Shipping details
   customer_name = Column(String, nullable=True)
@@ -64,3 +73,94 @@ class OrderDB(Base):
   shipping_zip = Column(String, nullable=True)
 
   order_items = relationship("OrderItemDB", back_populates="order")
+
+  __table_args__ = (
+    Index("ix_orders_payment_status_date", payment_status, date),
+  )
+
+
+class EmailOutboxDB(Base):
+  __tablename__ = "email_outbox"
+
+  id = Column(Integer, primary_key=True, autoincrement=True)
+  kind = Column(String, nullable=False)  # key into outbox.EMAIL_KINDS
+  to_email = Column(String, nullable=False)
+  payload = Column(Text, nullable=False)  # JSON keyword arguments for the sender
+  status = Column(String, nullable=False, default="pending", index=True)  # pending, sending, sent, failed
+  attempts = Column(Integer, nullable=False, default=0)
+  next_attempt_at = Column(DateTime, nullable=False, index=True)
+  claimed_by = Column(String, nullable=True, index=True)
+  locked_until = Column(DateTime, nullable=True)
+  last_error = Column(Text, nullable=True)
+  message_id = Column(String, nullable=True)
+  created_at = Column(DateTime, nullable=False)
+  sent_at = Column(DateTime, nullable=True)
+
+
+class IdempotencyKeyDB(Base):
+  __tablename__ = "idempotency_keys"
+
+  key = Column(String, primary_key=True)  # client-chosen Idempotency-Key header
+  fingerprint = Column(String, nullable=False)  # hash of the request it was first used with
+  status_code = Column(Integer, nullable=False)
+  response = Column(Text, nullable=False)  # JSON body sent the first time
+  created_at = Column(DateTime, nullable=False, index=True)
+
+
+class StockShardDB(Base):
+  """One slice of a product's available stock; see `inventory`.
+
+  Products without rows here are not stock-tracked.
+  """
+  __tablename__ = "stock_shards"
+
+  product_id = Column(String, ForeignKey("products.id"), primary_key=True)
+  shard = Column(Integer, primary_key=True)
+  available = Column(Integer, nullable=False)
+
+  __table_args__ = (
+    CheckConstraint("available >= 0", name="ck_stock_shards_available"),
+  )
+
+
+class StockReservationDB(Base):
+  __tablename__ = "stock_reservations"
+
+  id = Column(Integer, primary_key=True, autoincrement=True)
+  order_id = Column(String, ForeignKey("orders.id"), nullable=False, index=True)
+  product_id = Column(String, nullable=False)
+  shard = Column(Integer, nullable=False)  # the stock_shards row the units came from
+  quantity = Column(Integer, nullable=False)
+  status = Column(String, nullable=False, default="held")  # held, committed, released
+  expires_at = Column(DateTime, nullable=False)
+  created_at = Column(DateTime, nullable=False)
+
+  # The sweeper looks up held reservations past their expiry.
+  __table_args__ = (
+    Index("ix_stock_reservations_status_expires_at", status, expires_at),
+  )
+
+
+class PaymentEventDB(Base):
+  """A Razorpay webhook delivery, stored as received; see `payments`.
+
+  Rows are only ever added: the consumer records what applying an event did
+  but never touches the signed body.
+  """
+  __tablename__ = "payment_events"
+
+  id = Column(Integer, primary_key=True, autoincrement=True)  # arrival order
+  event_id = Column(String, nullable=False, unique=True)  # X-Razorpay-Event-Id; redeliveries reuse it
+  event = Column(String, nullable=False)  # e.g. payment.captured
+  body = Column(Text, nullable=False)  # raw request body, exactly as signed
+  received_at = Column(DateTime, nullable=False)
+  status = Column(String, nullable=False, default="received")  # received, applied, ignored, failed
+  claimed_by = Column(String, nullable=True)
+  locked_until = Column(DateTime, nullable=True)
+  outcome = Column(Text, nullable=True)  # what applying it did, or the error
+  processed_at = Column(DateTime, nullable=True)
+
+  # The consumer claims unprocessed events in arrival order.
+  __table_args__ = (
+    Index("ix_payment_events_status_id", status, id),
+  )
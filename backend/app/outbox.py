@@ -0,0 +1,222 @@
+from __future__ import annotations
+import json
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .email_batching import EMAIL_BULK_SEND, SES_MAX_DESTINATIONS, batching_sender
+from .email_service import (
+  send_order_confirmation_email,
+  send_payment_success_email,
+  send_account_created_email,
+  send_login_notification_email,
+)
+from .models import EmailOutboxDB
+
+# Outbox kinds and the functions that render and send them. Each sender takes
+# `to_email` plus the JSON payload stored with the message as keyword arguments.
+EMAIL_KINDS = {
+  "order_confirmation": send_order_confirmation_email,
+  "payment_success": send_payment_success_email,
+  "account_created": send_account_created_email,
+  "login_notification": send_login_notification_email,
+}
+
+OUTBOX_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", "4"))
+OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", str(SES_MAX_DESTINATIONS)))
+OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_LEASE_SECONDS = 60
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+
+
+def enqueue_email(db: Session, kind: str, to_email: str, **params) -> EmailOutboxDB:
+  """Stage an email in the outbox as part of the caller's transaction.
+
+  Nothing is sent until the caller commits; call `outbox_workers.notify()`
+  afterwards to wake a worker instead of waiting for the next poll.
+  """
+  if kind not in EMAIL_KINDS:
+    raise ValueError(f"Unknown email kind: {kind}")
+  now = datetime.utcnow()
+  message = EmailOutboxDB(
+    kind=kind,
+    to_email=to_email,
+    payload=json.dumps(params),
+    status="pending",
+    attempts=0,
+    next_attempt_at=now,
+    created_at=now,
+  )
+  db.add(message)
+  return message
+
+
+def backoff_delay(attempts: int) -> float:
+  """Exponential backoff with full jitter, in seconds."""
+  return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempts))
+
+
+def claim_batch(db: Session, worker_id: str, limit: int) -> list[EmailOutboxDB]:
+  """Lease up to `limit` due messages to `worker_id`.
+
+  Claiming is a single conditional UPDATE, so concurrent workers (in this or
+  another process) never receive the same message. Leases left behind by a
+  crashed worker expire after OUTBOX_LEASE_SECONDS.
+  """
+  now = datetime.utcnow()
+  due = (
+    select(EmailOutboxDB.id)
+    .where(or_(
+      (EmailOutboxDB.status == "pending") & (EmailOutboxDB.next_attempt_at <= now),
+      (EmailOutboxDB.status == "sending") & (EmailOutboxDB.locked_until < now),
+    ))
+    .order_by(EmailOutboxDB.id)
+    .limit(limit)
+  )
+  claimed = db.execute(
+    update(EmailOutboxDB)
+    .where(EmailOutboxDB.id.in_(due.scalar_subquery()))
+    .values(
+      status="sending",
+      claimed_by=worker_id,
+      locked_until=now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+    )
+    .execution_options(synchronize_session=False)
+  )
+  db.commit()
+  if not claimed.rowcount:
+    return []
+  return (
+    db.query(EmailOutboxDB)
+    .filter(EmailOutboxDB.claimed_by == worker_id, EmailOutboxDB.status == "sending")
+    .all()
+  )
+
+
+def record_result(message: EmailOutboxDB, response) -> None:
+  """Apply a sender response (or raised exception) to an outbox row."""
+  now = datetime.utcnow()
+  message.attempts += 1
+  message.claimed_by = None
+  message.locked_until = None
+  if isinstance(response, Exception):
+    response, error = None, str(response)
+  else:
+    error = response.get("error") if isinstance(response, dict) else None
+
+  if error is None:
+    message.status = "sent"
+    message.sent_at = now
+    message.message_id = response.get("MessageId") if isinstance(response, dict) else None
+    message.last_error = None
+  elif message.attempts >= OUTBOX_MAX_ATTEMPTS:
+    message.status = "failed"
+    message.last_error = error
+  else:
+    message.status = "pending"
+    message.next_attempt_at = now + timedelta(seconds=backoff_delay(message.attempts))
+    message.last_error = error
+
+
+def deliver(message: EmailOutboxDB) -> None:
+  """Render and send one message, recording the outcome on the row."""
+  try:
+    response = EMAIL_KINDS[message.kind](message.to_email, **json.loads(message.payload))
+  except Exception as e:
+    response = e
+  record_result(message, response)
+
+
+def deliver_batch(messages: list[EmailOutboxDB]) -> None:
+  """Send messages through SES templated bulk sends, recording each outcome."""
+  try:
+    responses = batching_sender.send([
+      (message.kind, message.to_email, json.loads(message.payload)) for message in messages
+    ])
+  except Exception as e:
+    responses = [e] * len(messages)
+  for message, response in zip(messages, responses):
+    record_result(message, response)
+
+
+class OutboxWorkerPool:
+  """Background threads that drain the email outbox."""
+
+  def __init__(
+    self,
+    size: int = OUTBOX_WORKERS,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+    poll_seconds: float = OUTBOX_POLL_SECONDS,
+    bulk_send: bool = EMAIL_BULK_SEND,
+    session_factory=SessionLocal,
+  ):
+    self.size = size
+    self.batch_size = batch_size
+    self.bulk_send = bulk_send
+    self.poll_seconds = poll_seconds
+    self._session_factory = session_factory
+    self._wakeup = threading.Event()
+    self._stopping = threading.Event()
+    self._threads: list[threading.Thread] = []
+
+  def start(self) -> None:
+    if self._threads:
+      return
+    self._stopping.clear()
+    for i in range(self.size):
+      thread = threading.Thread(target=self._run, name=f"email-outbox-{i}", daemon=True)
+      thread.start()
+      self._threads.append(thread)
+
+  def stop(self, timeout: float = 10.0) -> None:
+    self._stopping.set()
+    self._wakeup.set()
+    for thread in self._threads:
+      thread.join(timeout)
+    self._threads = []
+
+  def notify(self) -> None:
+    """Wake idle workers after new messages were committed."""
+    self._wakeup.set()
+
+  def drain(self) -> int:
+    """Deliver every message that is currently due; returns how many were tried."""
+    worker_id = uuid.uuid4().hex
+    handled = 0
+    db = self._session_factory()
+    try:
+      while True:
+        batch = claim_batch(db, worker_id, self.batch_size)
+        if not batch:
+          return handled
+        if self.bulk_send:
+          deliver_batch(batch)
+        else:
+          for message in batch:
+            deliver(message)
+        db.commit()
+        handled += len(batch)
+    finally:
+      db.close()
+
+  def _run(self) -> None:
+    while not self._stopping.is_set():
+      try:
+        handled = self.drain()
+      except Exception as e:
+        print(f"Email outbox worker error: {e}")
+        handled = 0
+      if not handled:
+        self._wakeup.wait(self.poll_seconds)
+        self._wakeup.clear()
+
+
+outbox_workers = OutboxWorkerPool()
@@ -0,0 +1,372 @@
+from __future__ import annotations
+import asyncio
+import calendar
+import json
+import os
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import Select, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .inventory import commit_reservations, release_reservations
+from .models import OrderDB, PaymentEventDB
+from .pricing import to_paise
+from .razorpay_gateway import RazorpayGateway
+
+PAYMENT_EVENT_BATCH_SIZE = int(os.getenv("PAYMENT_EVENT_BATCH_SIZE", "100"))
+PAYMENT_EVENT_POLL_SECONDS = float(os.getenv("PAYMENT_EVENT_POLL_SECONDS", "2"))
+PAYMENT_EVENT_LEASE_SECONDS = 60
+PAYMENT_RECONCILE_SECONDS = float(os.getenv("PAYMENT_RECONCILE_SECONDS", "300"))
+PAYMENT_RECONCILE_LOOKBACK_DAYS = int(os.getenv("PAYMENT_RECONCILE_LOOKBACK_DAYS", "3"))
+
+# Webhook events that can change an order; others are stored and ignored.
+HANDLED_EVENTS = ("payment.captured", "payment.failed", "order.paid")
+
+# Payment state reaches an order three ways: the browser's /payments/verify,
+# Razorpay webhooks (stored by the endpoint, applied by `PaymentEventConsumer`)
+# and `PaymentReconciler`, which lists recent payments from the gateway in
+# case both of those were lost. All of them go through `apply_payment`, so
+# whichever arrives second finds nothing left to do.
+
+
+def link_gateway_order(db: Session, order_id: str, razorpay_order_id: str, amount_paise: int) -> bool:
+  """Record the Razorpay order created to pay for an unpaid order, and its
+  amount, so its webhooks and the reconciler can find and check it. False if
+  there is no such order."""
+  return db.execute(
+    update(OrderDB)
+    .where(OrderDB.id == order_id, OrderDB.payment_status != "paid")
+    .values(razorpay_order_id=razorpay_order_id, payment_amount_paise=amount_paise)
+    .execution_options(synchronize_session=False)
+  ).rowcount == 1
+
+
+def mark_paid(db: Session, order: OrderDB, razorpay_order_id: str, razorpay_payment_id: str) -> bool:
+  """Mark an order paid and keep its reserved stock. Returns False (and
+  marks it backordered) if the stock hold lapsed and the stock sold out."""
+  order.payment_status = "paid"
+  order.razorpay_order_id = razorpay_order_id
+  order.razorpay_payment_id = razorpay_payment_id
+  in_stock = commit_reservations(db, order.id)
+  order.status = "confirmed" if in_stock else "backordered"
+  if not in_stock:
+    print(f"Order {order.id} was paid after its stock reservation lapsed; stock ran out, marked backordered")
+  return in_stock
+
+
+def apply_payment(db: Session, order: OrderDB, payment: dict) -> tuple[bool, str]:
+  """Bring an order up to date with a Razorpay payment entity.
+
+  Returns whether the order changed and a note saying how. A capture is
+  only applied for the amount of the Razorpay order linked to the order
+  (which includes shipping), or the order total if none was recorded.
+  """
+  status = payment.get("status")
+  if status == "captured":
+    if order.payment_status == "paid":
+      return False, f"order {order.id} already paid"
+    expected = order.payment_amount_paise
+    if expected is None:
+      expected = to_paise(order.total)
+    if payment.get("amount") != expected:
+      return False, f"amount {payment.get('amount')} does not match {expected} expected for order {order.id}"
+    in_stock = mark_paid(db, order, payment["order_id"], payment["id"])
+    return True, f"order {order.id} paid" + ("" if in_stock else ", backordered")
+  if status == "failed":
+    if order.payment_status != "pending":
+      return False, f"order {order.id} is {order.payment_status}"
+    order.payment_status = "failed"
+    released = release_reservations(db, order.id)
+    return True, f"order {order.id} payment failed, released {released} units"
+  return False, f"payment {payment.get('id')} is {status}"
+
+
+# ----- Webhook events -----
+
+async def record_event(db: AsyncSession, event_id: str, event: str, body: str) -> bool:
+  """Store a verified webhook delivery and commit; returns False if an event
+  with this id was stored before (Razorpay redelivers until acknowledged)."""
+  db.add(PaymentEventDB(event_id=event_id, event=event, body=body, received_at=datetime.utcnow(), status="received"))
+  try:
+    await db.commit()
+  except IntegrityError:
+    await db.rollback()
+    return False
+  return True
+
+
+def due_events_query(now: datetime, limit: int) -> Select:
+  """Unprocessed events nobody holds a lease on, in arrival order."""
+  return (
+    select(PaymentEventDB.id)
+    .where(
+      PaymentEventDB.status == "received",
+      or_(PaymentEventDB.locked_until.is_(None), PaymentEventDB.locked_until < now),
+    )
+    .order_by(PaymentEventDB.id)
+    .limit(limit)
+  )
+
+
+def event_orders_query(gateway_ids: Iterable[str], receipts: Iterable[str]) -> Select:
+  """Orders with one of `gateway_ids` as Razorpay order id, or one of
+  `receipts` (our order ids) as id."""
+  return select(OrderDB).where(or_(OrderDB.razorpay_order_id.in_(gateway_ids), OrderDB.id.in_(receipts)))
+
+
+def claim_events(db: Session, worker_id: str, limit: int) -> list[PaymentEventDB]:
+  """Lease up to `limit` unprocessed events to `worker_id` with one
+  conditional UPDATE, as `outbox.claim_batch` does for emails."""
+  now = datetime.utcnow()
+  claimed = db.execute(
+    update(PaymentEventDB)
+    .where(PaymentEventDB.id.in_(due_events_query(now, limit).scalar_subquery()))
+    .values(claimed_by=worker_id, locked_until=now + timedelta(seconds=PAYMENT_EVENT_LEASE_SECONDS))
+    .execution_options(synchronize_session=False)
+  )
+  db.commit()
+  if not claimed.rowcount:
+    return []
+  return list(db.scalars(
+    select(PaymentEventDB)
+    .where(PaymentEventDB.claimed_by == worker_id, PaymentEventDB.status == "received")
+    .order_by(PaymentEventDB.id)
+  ))
+
+
+def _entities(body: str) -> tuple[dict | None, dict | None]:
+  """The payment and order entities carried by a webhook body."""
+  try:
+    payload = json.loads(body).get("payload") or {}
+    return (payload.get("payment") or {}).get("entity"), (payload.get("order") or {}).get("entity")
+  except (ValueError, AttributeError):
+    return None, None
+
+
+def _finish(event: PaymentEventDB, status: str, outcome: str) -> None:
+  event.status = status
+  event.outcome = outcome
+  event.processed_at = datetime.utcnow()
+  event.claimed_by = None
+  event.locked_until = None
+
+
+def apply_events(db: Session, events: list[PaymentEventDB]) -> None:
+  """Apply claimed events in arrival order, loading all their orders in one
+  query. Orders are matched by Razorpay order id, or for order.paid events
+  by the receipt, which checkout sets to our order id."""
+  entities = [_entities(event.body) for event in events]
+  gateway_ids = {payment.get("order_id") for payment, _ in entities if payment}
+  receipts = {order.get("receipt") for _, order in entities if order}
+  orders = list(db.scalars(event_orders_query(gateway_ids, receipts)))
+  by_gateway_id = {order.razorpay_order_id: order for order in orders if order.razorpay_order_id}
+  by_id = {order.id: order for order in orders}
+
+  for event, (payment, gateway_order) in zip(events, entities):
+    if event.event not in HANDLED_EVENTS:
+      _finish(event, "ignored", f"{event.event} not handled")
+      continue
+    if not payment or not payment.get("id"):
+      _finish(event, "ignored", "no payment in payload")
+      continue
+    order = by_gateway_id.get(payment.get("order_id"))
+    if order is None and gateway_order:
+      order = by_id.get(gateway_order.get("receipt"))
+    if order is None:
+      _finish(event, "ignored", f"no order for {payment.get('order_id')}")
+      continue
+    applied, outcome = apply_payment(db, order, payment)
+    by_gateway_id[order.razorpay_order_id] = order
+    _finish(event, "applied" if applied else "ignored", outcome)
+
+
+class PaymentEventConsumer:
+  """Background thread that applies stored webhook events to orders.
+
+  Each batch is applied in one transaction. If it fails, its events are
+  retried one at a time so a single bad event is marked failed on its own.
+  """
+
+  def __init__(
+    self,
+    batch_size: int = PAYMENT_EVENT_BATCH_SIZE,
+    poll_seconds: float = PAYMENT_EVENT_POLL_SECONDS,
+    session_factory=SessionLocal,
+  ):
+    self.batch_size = batch_size
+    self.poll_seconds = poll_seconds
+    self._session_factory = session_factory
+    self._wakeup = threading.Event()
+    self._stopping = threading.Event()
+    self._thread: threading.Thread | None = None
+
+  def start(self) -> None:
+    if self._thread:
+      return
+    self._stopping.clear()
+    self._thread = threading.Thread(target=self._run, name="payment-events", daemon=True)
+    self._thread.start()
+
+  def stop(self, timeout: float = 10.0) -> None:
+    self._stopping.set()
+    self._wakeup.set()
+    if self._thread:
+      self._thread.join(timeout)
+    self._thread = None
+
+  def notify(self) -> None:
+    """Wake the consumer after an event was stored."""
+    self._wakeup.set()
+
+  def drain(self) -> int:
+    """Apply every event received so far; returns how many were processed."""
+    worker_id = uuid.uuid4().hex
+    handled = 0
+    db = self._session_factory()
+    try:
+      while True:
+        batch = claim_events(db, worker_id, self.batch_size)
+        if not batch:
+          return handled
+        ids = [event.id for event in batch]
+        try:
+          apply_events(db, batch)
+          db.commit()
+        except Exception as e:
+          db.rollback()
+          print(f"Payment event batch failed, applying one at a time: {e}")
+          for event_id in ids:
+            self._apply_alone(db, event_id)
+        handled += len(ids)
+    finally:
+      db.close()
+
+  def _apply_alone(self, db: Session, event_id: int) -> None:
+    event = db.get(PaymentEventDB, event_id)
+    try:
+      apply_events(db, [event])
+      db.commit()
+    except Exception as e:
+      db.rollback()
+      _finish(event, "failed", str(e))
+      db.commit()
+
+  def _run(self) -> None:
+    while not self._stopping.is_set():
+      try:
+        handled = self.drain()
+      except Exception as e:
+        print(f"Payment event consumer error: {e}")
+        handled = 0
+      if not handled:
+        self._wakeup.wait(self.poll_seconds)
+        self._wakeup.clear()
+
+
+# ----- Reconciliation -----
+
+UNPAID_STATUSES = ("pending", "failed")  # a failed payment may since have been retried
+
+
+def unpaid_orders_query(since: str) -> Select:
+  """(Razorpay order id, date) of the orders from `since` (YYYY-MM-DD) on
+  that have a Razorpay order but are not paid."""
+  return select(OrderDB.razorpay_order_id, OrderDB.date).where(
+    OrderDB.payment_status.in_(UNPAID_STATUSES),
+    OrderDB.date >= since,
+    OrderDB.razorpay_order_id.is_not(None),
+  )
+
+
+class PaymentReconciler:
+  """Background thread that catches payments whose webhook and browser
+  callback were both lost.
+
+  Every `interval` seconds it lists all payments made since the oldest
+  unpaid order (a page of 100 per gateway call, not one call per order) and
+  applies the captured ones. Orders older than `lookback_days` are left alone.
+  """
+
+  def __init__(
+    self,
+    interval: float = PAYMENT_RECONCILE_SECONDS,
+    lookback_days: int = PAYMENT_RECONCILE_LOOKBACK_DAYS,
+    gateway_factory=RazorpayGateway,
+    session_factory=SessionLocal,
+  ):
+    self.interval = interval
+    self.lookback_days = lookback_days
+    self._gateway_factory = gateway_factory
+    self._session_factory = session_factory
+    self._stopping = threading.Event()
+    self._thread: threading.Thread | None = None
+
+  def start(self) -> None:
+    if self._thread:
+      return
+    self._stopping.clear()
+    self._thread = threading.Thread(target=self._run, name="payment-reconciler", daemon=True)
+    self._thread.start()
+
+  def stop(self, timeout: float = 10.0) -> None:
+    self._stopping.set()
+    if self._thread:
+      self._thread.join(timeout)
+    self._thread = None
+
+  async def _captured_payments(self, since: int) -> list[dict]:
+    # The thread runs its own event loop, so it needs its own HTTP client.
+    gateway = self._gateway_factory()
+    try:
+      return [payment for payment in await gateway.list_payments(since) if payment.get("status") == "captured"]
+    finally:
+      await gateway.aclose()
+
+  def reconcile(self, today: date | None = None) -> int:
+    """Apply captured payments to unpaid orders; returns how many were paid."""
+    since = ((today or datetime.utcnow().date()) - timedelta(days=self.lookback_days)).isoformat()
+    db = self._session_factory()
+    try:
+      unpaid = dict(db.execute(unpaid_orders_query(since)).all())
+      db.rollback()  # hand the connection back while the gateway is called
+      if not unpaid:
+        return 0
+      oldest = min(unpaid.values())
+      payments = {
+        payment["order_id"]: payment
+        for payment in asyncio.run(self._captured_payments(calendar.timegm(date.fromisoformat(oldest).timetuple())))
+        if payment.get("order_id") in unpaid
+      }
+      if not payments:
+        return 0
+
+      # Load the matched orders in one query, as they are now
+      paid = 0
+      for order in db.scalars(
+        select(OrderDB).where(OrderDB.razorpay_order_id.in_(payments), OrderDB.payment_status.in_(UNPAID_STATUSES))
+      ):
+        applied, _ = apply_payment(db, order, payments[order.razorpay_order_id])
+        paid += applied
+      db.commit()
+      return paid
+    finally:
+      db.close()
+
+  def _run(self) -> None:
+    while not self._stopping.wait(self.interval):
+      try:
+        paid = self.reconcile()
+        if paid:
+          print(f"Payment reconciler marked {paid} orders paid")
+      except Exception as e:
+        print(f"Payment reconciler error: {e}")
+
+
+payment_event_consumer = PaymentEventConsumer()
+payment_reconciler = PaymentReconciler()
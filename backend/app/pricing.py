@@ -0,0 +1,114 @@
+from __future__ import annotations
+import hashlib
+import threading
+from array import array
+from dataclasses import dataclass
+from operator import mul
+from typing import Iterable
+
+from starlette.concurrency import run_in_threadpool
+
+from .catalog import Catalog, CatalogSnapshot, catalog
+
+
+def to_paise(rupees: float) -> int:
+  return round(rupees * 100)
+
+
+def list_price_paise(price_paise: int, discount: int) -> int:
+  """Pre-discount price for a product sold at `price_paise`.
+
+  Product prices are already discounted; `discount` is the percentage off
+  the list price that the storefront shows struck through.
+  """
+  if not 0 < discount < 100:
+    return price_paise
+  return round(price_paise * 100 / (100 - discount))
+
+
+@dataclass(frozen=True)
+class Quote:
+  price_book: str  # `PriceBook.digest` of the prices the cart was priced at
+  lines: list[tuple[str, int]]  # merged (product id, quantity)
+  unit_paise: list[int]
+  total_paise: int
+  savings_paise: int  # off the list prices
+
+  @property
+  def total(self) -> float:
+    return self.total_paise / 100
+
+
+class PriceBook:
+  """Integer-paise prices for one catalog snapshot, in its row order.
+
+  `version` is the catalog's, which only says whether the book is current in
+  this process: it restarts at 0. `digest` hashes the product ids and prices,
+  so it is what orders record; it names the same prices in every process and
+  after restarts.
+  """
+
+  def __init__(self, snapshot: CatalogSnapshot):
+    self.version = snapshot.version
+    self.snapshot = snapshot
+    self.unit = array("q", (to_paise(price) for price in snapshot.price))
+    self.list = array("q", (list_price_paise(unit, discount) for unit, discount in zip(self.unit, snapshot.discount)))
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update("\0".join(snapshot.ids).encode())
+    digest.update(self.unit.tobytes())
+    digest.update(self.list.tobytes())
+    self.digest = digest.hexdigest()
+
+  def quote(self, lines: Iterable[tuple[str, int]]) -> Quote:
+    """Merge duplicate product lines and price the cart.
+
+    Raises ValueError naming the first unknown product id.
+    """
+    merged: dict[str, int] = {}
+    for product_id, quantity in lines:
+      merged[product_id] = merged.get(product_id, 0) + quantity
+    try:
+      positions = list(map(self.snapshot.positions.__getitem__, merged))
+    except KeyError as e:
+      raise ValueError(f"Unknown product: {e.args[0]}") from None
+
+    quantities = merged.values()
+    unit = list(map(self.unit.__getitem__, positions))
+    total = sum(map(mul, unit, quantities))
+    list_total = sum(map(mul, map(self.list.__getitem__, positions), quantities))
+    return Quote(self.digest, list(merged.items()), unit, total, list_total - total)
+
+
+class Pricing:
+  """The price book for the current catalog version, rebuilt when it changes.
+
+  The version is the catalog's, which every worker shares (see
+  `Catalog.attach_bus`), so any worker prices a cart the same way.
+  """
+
+  def __init__(self, catalog: Catalog):
+    self._catalog = catalog
+    self._book: PriceBook | None = None
+    self._lock = threading.Lock()
+
+  def book(self, snapshot: CatalogSnapshot | None = None) -> PriceBook:
+    snapshot = snapshot or self._catalog.snapshot()
+    book = self._book
+    if book is not None and book.version == snapshot.version:
+      return book
+    with self._lock:
+      book = self._book
+      if book is None or book.version != snapshot.version:
+        book = self._book = PriceBook(snapshot)
+      return book
+
+  async def current(self) -> PriceBook:
+    """`book()` for the event loop; a rebuild runs on a worker thread."""
+    snapshot = await self._catalog.refresh()
+    book = self._book
+    if book is not None and book.version == snapshot.version:
+      return book
+    return await run_in_threadpool(self.book, snapshot)
+
+
+pricing = Pricing(catalog)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable
+
+from .async_crud import get_product_row
+from .catalog import catalog
+from .database import AsyncSessionLocal
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "4096"))
+PRODUCT_CACHE_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "300"))
+PRODUCT_CACHE_NEGATIVE_SIZE = int(os.getenv("PRODUCT_CACHE_NEGATIVE_SIZE", "1024"))
+PRODUCT_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_NEGATIVE_TTL_SECONDS", "30"))
+
+
+async def load_product_row(product_id: str) -> tuple | None:
+  # Loads run detached from the request that started them (see
+  # `ProductCache.get`), so they use their own session.
+  async with AsyncSessionLocal() as db:
+    return await get_product_row(db, product_id)
+
+
+class _LRU:
+  """Size-bounded LRU of (expires_at, value) entries."""
+
+  def __init__(self, max_entries: int):
+    self.max_entries = max_entries
+    self.entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+  def get(self, key: str, now: float):
+    entry = self.entries.get(key)
+    if entry is None:
+      return None
+    if entry[0] <= now:
+      del self.entries[key]
+      return None
+    self.entries.move_to_end(key)
+    return entry
+
+  def put(self, key: str, value, expires_at: float) -> None:
+    self.entries[key] = (expires_at, value)
+    self.entries.move_to_end(key)
+    while len(self.entries) > self.max_entries:
+      self.entries.popitem(last=False)
+
+
+class ProductCache:
+  """Read-through cache of product rows keyed by id.
+
+  Found products and misses live in separate LRUs, each with its own size
+  and TTL, so a crawler walking nonexistent ids cannot evict real products.
+  Concurrent misses on one id share a single load. Commits that touch
+  products drop the affected entries through the catalog's invalidation
+  hook; the TTL bounds staleness for writes made outside this process.
+  """
+
+  def __init__(
+    self,
+    max_entries: int = PRODUCT_CACHE_SIZE,
+    ttl: float = PRODUCT_CACHE_TTL_SECONDS,
+    negative_max_entries: int = PRODUCT_CACHE_NEGATIVE_SIZE,
+    negative_ttl: float = PRODUCT_CACHE_NEGATIVE_TTL_SECONDS,
+    loader: Callable[[str], Awaitable[tuple | None]] = load_product_row,
+  ):
+    self.ttl = ttl
+    self.negative_ttl = negative_ttl
+    self._loader = loader
+    self._found = _LRU(max_entries)
+    self._missing = _LRU(negative_max_entries)
+    # Invalidations arrive from whichever thread committed, so the LRUs are
+    # guarded by a lock; in-flight loads are only touched on the event loop.
+    self._lock = threading.Lock()
+    self._generation = 0
+    self._inflight: dict[str, asyncio.Task] = {}
+    self.counts = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0}
+
+  def _lookup(self, product_id: str):
+    now = time.monotonic()
+    with self._lock:
+      entry = self._found.get(product_id, now)
+      if entry is not None:
+        self.counts["hits"] += 1
+        return entry
+      entry = self._missing.get(product_id, now)
+      if entry is not None:
+        self.counts["negative_hits"] += 1
+      return entry
+
+  async def get(self, product_id: str) -> tuple | None:
+    """Return the product row for `product_id`, or None if it does not exist."""
+    catalog.sync()  # picks up invalidations from other workers
+    entry = self._lookup(product_id)
+    if entry is not None:
+      return entry[1]
+
+    task = self._inflight.get(product_id)
+    if task is None:
+      self.counts["misses"] += 1
+      task = self._inflight[product_id] = asyncio.ensure_future(self._load(product_id))
+    else:
+      self.counts["coalesced"] += 1
+    # Shielded, so a caller that goes away does not cancel the load for the
+    # others waiting on it.
+    return await asyncio.shield(task)
+
+  async def _load(self, product_id: str) -> tuple | None:
+    generation = self._generation
+    try:
+      row = await self._loader(product_id)
+    finally:
+      self._inflight.pop(product_id, None)
+    with self._lock:
+      # A row loaded across an invalidation may predate the write; serve it
+      # to the waiting callers but do not keep it.
+      if generation == self._generation:
+        if row is None:
+          self._missing.put(product_id, None, time.monotonic() + self.negative_ttl)
+        else:
+          self._found.put(product_id, row, time.monotonic() + self.ttl)
+    return row
+
+  def invalidate(self, product_ids: Iterable[str] | None = None) -> None:
+    """Drop `product_ids`, or everything when None."""
+    with self._lock:
+      self._generation += 1
+      if product_ids is None:
+        self._found.entries.clear()
+        self._missing.entries.clear()
+        return
+      for product_id in product_ids:
+        self._found.entries.pop(product_id, None)
+        self._missing.entries.pop(product_id, None)
+
+  def stats(self) -> dict:
+    with self._lock:
+      return {**self.counts, "entries": len(self._found.entries), "negativeEntries": len(self._missing.entries)}
+
+
+product_cache = ProductCache()
+catalog.add_invalidation_listener(product_cache.invalidate)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+import asyncio
+import os
+import random
+import time
+import uuid
+
+import httpx
+
+from .metrics import timed
+from .razorpay_utils import RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET
+
+RAZORPAY_API_BASE = os.getenv("RAZORPAY_API_BASE", "https://api.razorpay.com")
+RAZORPAY_TIMEOUT_SECONDS = float(os.getenv("RAZORPAY_TIMEOUT_SECONDS", "10"))
+RAZORPAY_CONNECT_TIMEOUT_SECONDS = float(os.getenv("RAZORPAY_CONNECT_TIMEOUT_SECONDS", "3"))
+RAZORPAY_MAX_RETRIES = int(os.getenv("RAZORPAY_MAX_RETRIES", "2"))
+RAZORPAY_MAX_CONNECTIONS = int(os.getenv("RAZORPAY_MAX_CONNECTIONS", "50"))
+RAZORPAY_BREAKER_THRESHOLD = int(os.getenv("RAZORPAY_BREAKER_THRESHOLD", "5"))
+RAZORPAY_BREAKER_RESET_SECONDS = float(os.getenv("RAZORPAY_BREAKER_RESET_SECONDS", "30"))
+RETRY_BASE_SECONDS = 0.2
+RETRY_MAX_SECONDS = 2.0
+
+
+class GatewayError(Exception):
+  """Razorpay rejected the request; retrying it would not help."""
+
+  def __init__(self, message: str, status_code: int | None = None):
+    super().__init__(message)
+    self.status_code = status_code
+
+
+class GatewayUnavailable(GatewayError):
+  """Razorpay could not be reached, kept failing, or the breaker is open."""
+
+
+class _RetryableError(Exception):
+  def __init__(self, message: str, retry_after: float | None = None):
+    super().__init__(message)
+    self.retry_after = retry_after
+
+
+class CircuitBreaker:
+  """Consecutive-failure circuit breaker.
+
+  After `threshold` failures in a row the circuit opens and calls fail fast
+  for `reset_seconds`. Then a single trial call is let through: success
+  closes the circuit, failure opens it again.
+  """
+
+  def __init__(self, threshold: int = RAZORPAY_BREAKER_THRESHOLD, reset_seconds: float = RAZORPAY_BREAKER_RESET_SECONDS):
+    self.threshold = threshold
+    self.reset_seconds = reset_seconds
+    self.failures = 0
+    self.opened_at: float | None = None
+    self._trial_started: float | None = None
+
+  @property
+  def state(self) -> str:
+    if self.opened_at is None:
+      return "closed"
+    if time.monotonic() - self.opened_at >= self.reset_seconds:
+      return "half-open"
+    return "open"
+
+  def allow(self) -> bool:
+    state = self.state
+    if state == "closed":
+      return True
+    if state == "half-open":
+      # One trial at a time; a trial that never reported back (e.g. it was
+      # cancelled) stops blocking others after another reset period.
+      now = time.monotonic()
+      if self._trial_started is None or now - self._trial_started >= self.reset_seconds:
+        self._trial_started = now
+        return True
+    return False
+
+  def record_success(self) -> None:
+    self.failures = 0
+    self.opened_at = None
+    self._trial_started = None
+
+  def record_failure(self) -> None:
+    self.failures += 1
+    self._trial_started = None
+    if self.opened_at is not None or self.failures >= self.threshold:
+      self.opened_at = time.monotonic()
+
+
+def new_receipt() -> str:
+  """A receipt id unique enough to deduplicate retried order creation."""
+  return f"rcpt_{uuid.uuid4().hex[:24]}"
+
+
+class RazorpayGateway:
+  """Async Razorpay REST client.
+
+  One `httpx.AsyncClient` is shared for the process, so calls reuse
+  keep-alive connections. Every call has connect/read timeouts. Transport
+  errors, 429s and 5xx responses are retried with jittered backoff, and each
+  such failure counts towards the circuit breaker. Order creation is keyed by
+  its receipt: before a retry, the gateway checks whether the previous
+  attempt created the order after all.
+  """
+
+  def __init__(
+    self,
+    base_url: str = RAZORPAY_API_BASE,
+    key_id: str = RAZORPAY_KEY_ID,
+    key_secret: str = RAZORPAY_KEY_SECRET,
+    timeout: float = RAZORPAY_TIMEOUT_SECONDS,
+    connect_timeout: float = RAZORPAY_CONNECT_TIMEOUT_SECONDS,
+    max_retries: int = RAZORPAY_MAX_RETRIES,
+    max_connections: int = RAZORPAY_MAX_CONNECTIONS,
+    breaker: CircuitBreaker | None = None,
+    transport: httpx.AsyncBaseTransport | None = None,
+  ):
+    self.base_url = base_url
+    self.max_retries = max_retries
+    self.breaker = breaker or CircuitBreaker()
+    self._client_options = dict(
+      base_url=base_url,
+      auth=(key_id, key_secret),
+      timeout=httpx.Timeout(timeout, connect=connect_timeout),
+      limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+      transport=transport,
+    )
+    self._client: httpx.AsyncClient | None = None
+
+  def _get_client(self) -> httpx.AsyncClient:
+    if self._client is None or self._client.is_closed:
+      self._client = httpx.AsyncClient(**self._client_options)
+    return self._client
+
+  async def aclose(self) -> None:
+    if self._client is not None:
+      await self._client.aclose()
+      self._client = None
+
+  async def _send(self, operation: str, method: str, path: str, **kwargs) -> dict:
+    """Make one HTTP call, timed as `operation`; raise _RetryableError for
+    failures worth retrying."""
+    with timed("razorpay", operation):
+      try:
+        response = await self._get_client().request(method, path, **kwargs)
+      except httpx.TransportError as e:
+        raise _RetryableError(f"{type(e).__name__}: {e}") from e
+
+      if response.status_code == 429 or response.status_code >= 500:
+        retry_after = response.headers.get("retry-after")
+        raise _RetryableError(
+          f"Razorpay returned {response.status_code}",
+          retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+      if response.is_error:
+        try:
+          description = response.json()["error"]["description"]
+        except (ValueError, KeyError, TypeError):
+          description = response.text
+        raise GatewayError(f"Razorpay returned {response.status_code}: {description}", response.status_code)
+      return response.json()
+
+  async def _call(self, attempt) -> dict:
+    """Run `attempt(n)` until it succeeds, fails permanently, or runs out of
+    retries or breaker budget."""
+    for n in range(self.max_retries + 1):
+      if not self.breaker.allow():
+        raise GatewayUnavailable("Razorpay circuit breaker is open")
+      try:
+        result = await attempt(n)
+      except _RetryableError as e:
+        self.breaker.record_failure()
+        error = e
+      except GatewayError:
+        self.breaker.record_success()  # Razorpay answered; the request was bad
+        raise
+      else:
+        self.breaker.record_success()
+        return result
+
+      if n < self.max_retries:
+        delay = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** n))
+        await asyncio.sleep(max(delay, error.retry_after or 0))
+    raise GatewayUnavailable(f"Razorpay request failed after {self.max_retries + 1} attempts: {error}")
+
+  async def _order_for_receipt(self, receipt: str) -> dict | None:
+    items = (await self._send("find_order", "GET", "/v1/orders", params={"receipt": receipt})).get("items")
+    return items[0] if items else None
+
+  async def find_order_by_receipt(self, receipt: str) -> dict | None:
+    return await self._call(lambda n: self._order_for_receipt(receipt))
+
+  async def create_order(self, amount: float, currency: str = "INR", receipt: str | None = None) -> dict:
+    """Create a Razorpay order; `amount` is in rupees.
+
+    Attempts after the first look the receipt up before posting again, so a
+    request that timed out after Razorpay created the order does not create
+    a second one.
+    """
+    payload = {
+      "amount": int(round(amount * 100)),
+      "currency": currency,
+      "receipt": receipt or new_receipt(),
+      "payment_capture": 1,
+    }
+
+    async def attempt(n: int) -> dict:
+      if n:
+        # The previous attempt may have created the order before failing.
+        existing = await self._order_for_receipt(payload["receipt"])
+        if existing is not None:
+          return existing
+      return await self._send("create_order", "POST", "/v1/orders", json=payload)
+
+    return await self._call(attempt)
+
+  async def fetch_payment(self, payment_id: str) -> dict:
+    return await self._call(lambda n: self._send("fetch_payment", "GET", f"/v1/payments/{payment_id}"))
+
+  async def list_payments(self, since: int, until: int | None = None, page_size: int = 100) -> list[dict]:
+    """Every payment created between `since` and `until` (Unix seconds),
+    fetched `page_size` at a time (Razorpay's maximum is 100).
+
+    `until` defaults to now and is fixed for the whole listing, so payments
+    made meanwhile cannot shift the pages.
+    """
+    params = {"from": since, "to": int(time.time()) if until is None else until, "count": page_size}
+    payments: list[dict] = []
+    while True:
+      skip = len(payments)
+      page = await self._call(
+        lambda n: self._send("list_payments", "GET", "/v1/payments", params={**params, "skip": skip})
+      )
+      items = page.get("items") or []
+      payments.extend(items)
+      if len(items) < page_size:
+        return payments
+
+
+razorpay_gateway = RazorpayGateway()
@@ -1,5 +1,4 @@
 import os
-import razorpay
 import hmac
 import hashlib
 from dotenv import load_dotenv
@@ -8,11 +7,25 @@ load_dotenv()
 
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID", "")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET", "")
+# Set per webhook in the Razorpay dashboard; webhooks are rejected without it
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET", "")
 
 if not RAZORPAY_KEY_ID or not RAZORPAY_KEY_SECRET:
     print("Warning: Razorpay credentials not found in environment variables")
 
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+_razorpay_client = None
+
+
+def get_razorpay_client():
+    """
+    The official Razorpay SDK client, created on first use.
+    Importing the SDK pulls in `requests`, so it stays out of startup.
+    """
+    global _razorpay_client
+    if _razorpay_client is None:
+        import razorpay
+        _razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+    return _razorpay_client
 
 
 def create_razorpay_order(amount: float, currency: str = "INR", receipt: str = None):
@@ -29,7 +42,7 @@ def create_razorpay_order(amount: float, currency: str = "INR", receipt: str = N
         "payment_capture": 1  # Auto capture payment
     }
     
-    order = razorpay_client.order.create(data=order_data)
+    order = get_razorpay_client().order.create(data=order_data)
     return order
 
 
@@ -50,10 +63,30 @@ def verify_payment_signature(razorpay_order_id: str, razorpay_payment_id: str, r
         return False
 
 
+def verify_webhook_signature(body: bytes, razorpay_signature: str) -> bool:
+    """
+    Verify the X-Razorpay-Signature header of a webhook against its raw body.
+    """
+    if not RAZORPAY_WEBHOOK_SECRET:
+        print("Webhook rejected: RAZORPAY_WEBHOOK_SECRET is not set")
+        return False
+    try:
+        generated_signature = hmac.new(
+            RAZORPAY_WEBHOOK_SECRET.encode(),
+            body,
+            hashlib.sha256
+        ).hexdigest()
+        
+        return hmac.compare_digest(generated_signature, razorpay_signature)
+    except Exception as e:
+        print(f"Webhook signature verification failed: {e}")
+        return False
+
+
 def get_payment_details(payment_id: str):
     """Fetch payment details from Razorpay."""
     try:
-        return razorpay_client.payment.fetch(payment_id)
+        return get_razorpay_client().payment.fetch(payment_id)
     except Exception as e:
         print(f"Failed to fetch payment: {e}")
         return None
@@ -0,0 +1,117 @@
+from __future__ import annotations
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+
+from .catalog import catalog
+from .serializers import json_response
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+
+
+def cache_key(path: str, params: dict | None = None) -> str:
+  """Normalize a route and its parsed query parameters into a cache key."""
+  items = sorted((name, value) for name, value in (params or {}).items() if value is not None)
+  return path + "?" + "&".join(f"{name}={value!r}" for name, value in items)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+  """Whether If-None-Match names `etag`, or is `*` (any existing resource)."""
+  if header.strip() == "*":
+    return True
+  for candidate in header.split(","):
+    candidate = candidate.strip()
+    if candidate.startswith("W/"):
+      candidate = candidate[2:]
+    if candidate == etag:
+      return True
+  return False
+
+
+def _not_modified_since(header: str, modified_at: float) -> bool:
+  try:
+    since = parsedate_to_datetime(header).timestamp()
+  except (TypeError, ValueError):
+    return False
+  return int(modified_at) <= since
+
+
+def body_etag(body: bytes) -> str:
+  """Strong ETag for an encoded body: equal tags mean equal bytes, whichever
+  process or host rendered them."""
+  return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+class ResponseCache:
+  """LRU of encoded catalog responses tagged with the catalog version.
+
+  ETags are a hash of the encoded body, computed once per cached entry, so a
+  revalidation is answered from the cached body's tag without a DB lookup or
+  serialization while the entry is fresh. The catalog version is only a
+  local counter (it restarts at 0 with the process), so it decides which
+  entries are stale but never goes into a tag. A 304 is only sent once the
+  body is found (from cache, or rendered; a missing resource raises 404).
+  Entries from an older catalog version are misses.
+  """
+
+  def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+    self.max_entries = max_entries
+    self._lock = threading.Lock()
+    self._entries: OrderedDict[str, tuple[int, bytes, str]] = OrderedDict()
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+
+  def _get(self, key: str, version: int) -> tuple[bytes, str] | None:
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None or entry[0] != version:
+        return None
+      self._entries.move_to_end(key)
+      return entry[1], entry[2]
+
+  def _put(self, key: str, version: int, body: bytes, etag: str) -> None:
+    with self._lock:
+      self._entries[key] = (version, body, etag)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  async def _body(self, key: str, version: int, render: Callable[[], Awaitable[bytes]]) -> tuple[bytes, str]:
+    entry = self._get(key, version)
+    if entry is None:
+      body = await render()
+      entry = body, body_etag(body)
+      self._put(key, version, *entry)
+    return entry
+
+  async def respond(self, request: Request, key: str, render: Callable[[], Awaitable[bytes]]) -> Response:
+    """Serve `key` from cache, awaiting `render()` for the body on a miss."""
+    version = catalog.version
+    modified_at = catalog.modified_at
+    body, etag = await self._body(key, version, render)
+    headers = {
+      "ETag": etag,
+      "Last-Modified": formatdate(modified_at, usegmt=True),
+      "Cache-Control": "no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+      if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    else:
+      if_modified_since = request.headers.get("if-modified-since")
+      if if_modified_since is not None and _not_modified_since(if_modified_since, modified_at):
+        return Response(status_code=304, headers=headers)
+
+    return json_response(body, headers=headers)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+import glob
+import os
+import re
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from .database import engine
+
+# Migrate the database to the latest revision on startup. Turn off where
+# deploys run `alembic upgrade head` themselves.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(BACKEND_DIR, "migrations")
+_REVISION_FIELD = re.compile(r"^(revision|down_revision)\b[^=]*=\s*(?:[\"'](\w+)[\"']|None)", re.M)
+
+
+def head_revisions() -> set[str]:
+  """Revisions no other migration builds on, read from the version files.
+
+  Parsing the files directly keeps the up-to-date check free of Alembic,
+  whose import costs more than the rest of startup.
+  """
+  revisions, parents = set(), set()
+  for path in glob.glob(os.path.join(MIGRATIONS_DIR, "versions", "*.py")):
+    with open(path) as f:
+      fields = dict((name, value or None) for name, value in _REVISION_FIELD.findall(f.read()))
+    if fields.get("revision"):
+      revisions.add(fields["revision"])
+      parents.add(fields.get("down_revision"))
+  return revisions - parents
+
+
+def current_revisions(bind: Engine = engine) -> set[str]:
+  with bind.connect() as connection:
+    if not inspect(connection).has_table("alembic_version"):
+      return set()
+    return set(connection.exec_driver_sql("SELECT version_num FROM alembic_version").scalars())
+
+
+def upgrade_schema(bind: Engine = engine) -> bool:
+  """Migrate `bind` to the latest revision; returns whether anything ran.
+
+  Databases created by `create_all` before migrations existed are upgraded
+  in place: the baseline migration only creates what is missing.
+  """
+  if current_revisions(bind) == head_revisions():
+    return False
+
+  from alembic import command
+  from alembic.config import Config
+
+  config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+  config.set_main_option("script_location", MIGRATIONS_DIR)
+  config.attributes["configure_logger"] = False
+  with bind.begin() as connection:
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+  return True
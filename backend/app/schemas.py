@@ -36,6 +36,7 @@ class Order(BaseModel):
   items: List[CartItem]
   payment_status: Optional[str] = "pending"
   razorpay_order_id: Optional[str] = None
+  price_book_version: Optional[str] = None
 
 
 class OrderItemInput(BaseModel):
@@ -56,15 +57,55 @@ class OrderCreateRequest(BaseModel):
   shippingAddress: Optional[ShippingAddress] = None
 
 
+class FacetCount(BaseModel):
+  value: str
+  count: int
+
+
+class PriceBucketCount(BaseModel):
+  min: float
+  max: Optional[float] = None  # None for the open-ended top bucket
+  count: int
+
+
+class Facets(BaseModel):
+  brands: List[FacetCount]
+  categories: List[FacetCount]
+  price: List[PriceBucketCount]
+
+
 class ProductsResponse(BaseModel):
   items: List[Product]
   total: int
+  nextCursor: Optional[str] = None
+  facets: Optional[Facets] = None
+
+
+class OrdersResponse(BaseModel):
+  items: List[Order]
+  nextCursor: Optional[str] = None
 
 
 class OrderCreateResponse(BaseModel):
   order: Order
 
 
+class BulkOrderCreateRequest(BaseModel):
+  orders: List[OrderCreateRequest] = Field(..., min_length=1, max_length=5000)
+
+
+class BulkOrderResult(BaseModel):
+  index: int
+  order: Optional[Order] = None
+  error: Optional[str] = None
+
+
+class BulkOrderCreateResponse(BaseModel):
+  created: int
+  failed: int
+  results: List[BulkOrderResult]
+
+
 class RazorpayOrderRequest(BaseModel):
   amount: float
   currency: str = "INR"
@@ -88,9 +129,22 @@ class ShippingDetails(BaseModel):
   zip: str
 
 
+class PaymentFailureRequest(BaseModel):
+  order_id: str
+  razorpay_order_id: Optional[str] = None
+  razorpay_payment_id: Optional[str] = None
+  reason: Optional[str] = None
+
+
 class PaymentVerificationRequest(BaseModel):
   razorpay_order_id: str
   razorpay_payment_id: str
   razorpay_signature: str
   order_id: str
   shipping_details: Optional[ShippingDetails] = None
+
+
+class StockLevel(BaseModel):
+  productId: str
+  tracked: bool
+  available: Optional[int] = None
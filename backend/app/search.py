@@ -0,0 +1,151 @@
+from __future__ import annotations
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Per-field term weights: a hit in the product name counts for more than one
+# buried in the description.
+FIELD_WEIGHTS = {
+  "name": 3.0,
+  "brand": 2.0,
+  "category": 2.0,
+  "description": 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSIONS = 64
+
+
+def stem(token: str) -> str:
+  """Light suffix-stripping stemmer, enough to fold plurals and verb forms."""
+  if len(token) <= 3 or token.isdigit():
+    return token
+  if token.endswith("ies") and len(token) > 4:
+    return token[:-3] + "y"
+  if token.endswith(("sses", "xes", "ches", "shes", "zes")):
+    return token[:-2]
+  if token.endswith("ing") and len(token) > 5:
+    return token[:-3]
+  if token.endswith("ed") and len(token) > 4:
+    return token[:-2]
+  if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+    return token[:-1]
+  return token
+
+
+def tokenize(text: str) -> list[str]:
+  return TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+  """Incrementally maintained inverted index with BM25 ranking.
+
+  Postings map a stemmed term to ``{doc_id: weighted term frequency}``. A
+  sorted term list supports prefix expansion of the last query token for
+  type-ahead. All public methods are thread-safe.
+  """
+
+  def __init__(self):
+    self._lock = threading.RLock()
+    self._postings: dict[str, dict[str, float]] = {}
+    self._terms: list[str] = []
+    self._doc_terms: dict[str, dict[str, float]] = {}
+    self._doc_len: dict[str, float] = {}
+    self._total_len = 0.0
+
+  def __len__(self) -> int:
+    return len(self._doc_len)
+
+  def add(self, doc_id: str, **fields: str) -> None:
+    term_freqs: dict[str, float] = defaultdict(float)
+    for field, text in fields.items():
+      weight = FIELD_WEIGHTS.get(field, 1.0)
+      for token in tokenize(text or ""):
+        term_freqs[stem(token)] += weight
+
+    with self._lock:
+      self._remove(doc_id)
+      for term, tf in term_freqs.items():
+        postings = self._postings.get(term)
+        if postings is None:
+          postings = self._postings[term] = {}
+          insort(self._terms, term)
+        postings[doc_id] = tf
+      length = sum(term_freqs.values())
+      self._doc_terms[doc_id] = dict(term_freqs)
+      self._doc_len[doc_id] = length
+      self._total_len += length
+
+  def remove(self, doc_id: str) -> None:
+    with self._lock:
+      self._remove(doc_id)
+
+  def _remove(self, doc_id: str) -> None:
+    term_freqs = self._doc_terms.pop(doc_id, None)
+    if term_freqs is None:
+      return
+    for term in term_freqs:
+      postings = self._postings[term]
+      del postings[doc_id]
+      if not postings:
+        del self._postings[term]
+        del self._terms[bisect_left(self._terms, term)]
+    self._total_len -= self._doc_len.pop(doc_id)
+
+  def _expand_prefix(self, prefix: str) -> list[str]:
+    start = bisect_left(self._terms, prefix)
+    expanded = []
+    for term in self._terms[start:start + MAX_PREFIX_EXPANSIONS]:
+      if not term.startswith(prefix):
+        break
+      expanded.append(term)
+    return expanded
+
+  def search(self, query: str, prefix: bool = True) -> list[tuple[str, float]]:
+    """Return ``(doc_id, score)`` pairs matching every query token, best first.
+
+    With ``prefix`` set, the last token also matches any indexed term it is a
+    prefix of, so partially typed words still hit.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+      return []
+
+    with self._lock:
+      doc_count = len(self._doc_len)
+      if not doc_count:
+        return []
+      avg_len = self._total_len / doc_count
+
+      # Each query token becomes a group of alternative terms; a document must
+      # match at least one term from every group.
+      groups = []
+      for i, token in enumerate(tokens):
+        terms = {stem(token)}
+        if prefix and i == len(tokens) - 1:
+          terms.update(self._expand_prefix(token))
+        group = [(term, self._postings[term]) for term in terms if term in self._postings]
+        if not group:
+          return []
+        groups.append(group)
+
+      group_docs = [set().union(*(postings.keys() for _, postings in group)) for group in groups]
+      group_docs.sort(key=len)
+      candidates = group_docs[0].intersection(*group_docs[1:])
+
+      scores: dict[str, float] = defaultdict(float)
+      for group in groups:
+        for term, postings in group:
+          df = len(postings)
+          idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+          for doc_id in postings.keys() & candidates:
+            tf = postings[doc_id]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[doc_id] / avg_len)
+            scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
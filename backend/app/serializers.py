@@ -0,0 +1,76 @@
+from __future__ import annotations
+import json
+from typing import Any, Iterable
+
+from fastapi import Response
+
+# Wire order of product fields; matches `schemas.Product` and the column
+# order of product row tuples.
+PRODUCT_FIELDS = (
+  "id",
+  "name",
+  "description",
+  "price",
+  "brand",
+  "category",
+  "imageUrl",
+  "imageHint",
+  "rating",
+  "reviewCount",
+  "discount",
+)
+BRAND_FIELDS = ("id", "name", "logoUrl", "logoHint")
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(obj: Any) -> bytes:
+  return _encoder.encode(obj).encode()
+
+
+def product_dict(row: tuple) -> dict:
+  return dict(zip(PRODUCT_FIELDS, row))
+
+
+def product_row(product) -> tuple:
+  """Flatten a `ProductDB` (or anything with product attributes) to a row tuple."""
+  return tuple(getattr(product, field) for field in PRODUCT_FIELDS)
+
+
+def encode_product(row: tuple) -> bytes:
+  return dumps(product_dict(row))
+
+
+def brand_dict(brand) -> dict:
+  return {field: getattr(brand, field) for field in BRAND_FIELDS}
+
+
+def products_page(
+  encoded_items: Iterable[bytes], total: int, next_cursor: str | None, facets: dict | None = None,
+) -> bytes:
+  """Assemble a `ProductsResponse` body from already encoded products."""
+  return b"".join((
+    b'{"items":[', b",".join(encoded_items), b'],"total":', str(total).encode(),
+    b',"nextCursor":', dumps(next_cursor),
+    b'' if facets is None else b',"facets":' + dumps(facets),
+    b"}",
+  ))
+
+
+def order_dict(order, items: Iterable[tuple[tuple, int]]) -> dict:
+  """Build an `Order` payload from an `OrderDB` and (product row, quantity) pairs."""
+  return {
+    "id": order.id,
+    "date": order.date,
+    "status": order.status,
+    "total": order.total,
+    "items": [{"product": product_dict(row), "quantity": quantity} for row, quantity in items],
+    "payment_status": order.payment_status,
+    "razorpay_order_id": order.razorpay_order_id,
+    "price_book_version": order.price_book_version,
+  }
+
+
+def json_response(body: bytes, status_code: int = 200, headers: dict | None = None) -> Response:
+  """Send pre-encoded JSON as-is, bypassing response_model validation."""
+  return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
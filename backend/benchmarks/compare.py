@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Compare two load benchmark result files
+Usage: python -m benchmarks.compare BASE.json HEAD.json [--threshold 10]
+
+Prints throughput and latency per scenario endpoint with the change from BASE
+to HEAD, and exits 1 if any endpoint regressed by more than --threshold
+percent (lower rps, higher p95/p99) or its error rate rose by over a point.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import sys
+
+# (metric, True if higher is better)
+METRICS = [("rps", True), ("p50Ms", False), ("p95Ms", False), ("p99Ms", False)]
+GATED = {"rps", "p95Ms", "p99Ms"}
+ERROR_RATE_SLACK = 0.01  # absolute increase in failed requests tolerated as noise
+
+
+def load(path: str) -> dict:
+  with open(path) as f:
+    return json.load(f)
+
+
+def endpoints(results: dict) -> dict[str, dict]:
+  return {
+    f"{name} {label}": stats
+    for name, scenario in results["scenarios"].items()
+    for label, stats in scenario["endpoints"].items()
+  }
+
+
+def error_rate(stats: dict) -> float:
+  return stats["errors"] / stats["requests"] if stats["requests"] else 0.0
+
+
+def change(base: float, head: float) -> float:
+  return (head - base) / base * 100 if base else 0.0
+
+
+def describe(results: dict) -> str:
+  meta = results["meta"]
+  commit = (meta.get("commit") or "unknown") + ("+dirty" if meta.get("dirty") else "")
+  args = meta.get("args", {})
+  return f"{commit} ({meta.get('timestamp')}, {args.get('products', '?'):,} products, concurrency {args.get('concurrency')})"
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("base")
+  parser.add_argument("head")
+  parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+  args = parser.parse_args()
+
+  base, head = load(args.base), load(args.head)
+  print(f"base: {describe(base)}")
+  print(f"head: {describe(head)}")
+  base_endpoints, head_endpoints = endpoints(base), endpoints(head)
+
+  regressions = []
+  print(f"\n{'endpoint':<40} " + " ".join(f"{metric:>25}" for metric, _ in METRICS))
+  for key in sorted(base_endpoints.keys() & head_endpoints.keys()):
+    old, new = base_endpoints[key], head_endpoints[key]
+    cells = []
+    for metric, higher_is_better in METRICS:
+      delta = change(old[metric], new[metric])
+      worse = -delta if higher_is_better else delta
+      flag = "!" if metric in GATED and worse > args.threshold else " "
+      if flag == "!":
+        regressions.append(f"{key}: {metric} {old[metric]} -> {new[metric]} ({delta:+.1f}%)")
+      cells.append(f"{old[metric]:>8.1f} {new[metric]:>8.1f} {delta:+5.0f}%{flag}")
+    if error_rate(new) - error_rate(old) > ERROR_RATE_SLACK:
+      regressions.append(f"{key}: error rate {error_rate(old):.1%} -> {error_rate(new):.1%}")
+    print(f"{key:<40} " + " ".join(cells))
+
+  for key in sorted(base_endpoints.keys() ^ head_endpoints.keys()):
+    print(f"{key:<40} only in {'base' if key in base_endpoints else 'head'}")
+
+  if regressions:
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}%:")
+    for regression in regressions:
+      print(f"  {regression}")
+    return 1
+  print(f"\nno regressions beyond {args.threshold:g}%")
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
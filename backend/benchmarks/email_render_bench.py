@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Email rendering micro-benchmark
+Usage: python -m benchmarks.email_render_bench [--seconds 1.0] [--minify]
+
+Run from the backend directory. Reports renders per second for every email
+kind, including an order confirmation with 200 line items.
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+
+
+def order_items(count: int) -> list[dict]:
+  return [
+    {"name": f"Performance Part {i}", "quantity": i % 4 + 1, "price": 1499.0 + i * 37.5}
+    for i in range(count)
+  ]
+
+
+CASES = {
+  "order_confirmation (3 items)": ("order_confirmation", {
+    "customer_name": "Asha Rao", "order_id": "ORD-1700000000000", "order_total": 5247.5,
+    "items": order_items(3),
+  }),
+  "order_confirmation (200 items)": ("order_confirmation", {
+    "customer_name": "Asha Rao", "order_id": "ORD-1700000000000", "order_total": 1046250.0,
+    "items": order_items(200),
+  }),
+  "payment_success": ("payment_success", {
+    "customer_name": "Asha Rao", "order_id": "ORD-1700000000000", "payment_id": "pay_NVqmgL1X0Z",
+    "amount": 5247.5,
+  }),
+  "account_created": ("account_created", {"customer_name": "Asha Rao"}),
+  "login_notification": ("login_notification", {
+    "customer_name": "Asha Rao", "login_time": "2026-01-01 10:00:00", "device_info": "Firefox",
+  }),
+}
+
+
+def bench(kind: str, kwargs: dict, seconds: float) -> tuple[float, int]:
+  """Render `kind` repeatedly for about `seconds`; returns (renders/sec, HTML bytes)."""
+  from app.email_service import EMAIL_TEMPLATES
+
+  data_fn, render_fn = EMAIL_TEMPLATES[kind]
+  html_size = len(render_fn(**data_fn("asha@example.com", **kwargs))[1].encode())
+  renders, start = 0, time.perf_counter()
+  deadline = start + seconds
+  while True:
+    for _ in range(100):
+      render_fn(**data_fn("asha@example.com", **kwargs))
+    renders += 100
+    now = time.perf_counter()
+    if now >= deadline:
+      return renders / (now - start), html_size
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--seconds", type=float, default=1.0, help="time spent per template")
+  parser.add_argument("--minify", action="store_true", help="compile HTML templates minified")
+  args = parser.parse_args()
+
+  os.environ["EMAIL_MINIFY_HTML"] = "1" if args.minify else "0"
+  sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+  print(f"{'template':<32} {'renders/sec':>12} {'us/render':>10} {'html bytes':>11}")
+  for label, (kind, kwargs) in CASES.items():
+    rate, size = bench(kind, kwargs, args.seconds)
+    print(f"{label:<32} {rate:>12,.0f} {1e6 / rate:>10.1f} {size:>11,}")
+
+
+if __name__ == "__main__":
+  main()
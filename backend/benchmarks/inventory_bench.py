@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Stock reservation concurrency benchmark and oversell check
+Usage: python -m benchmarks.inventory_bench [--stock 20000] [--shards 8] [--processes 4] [--threads 4]
+
+Run from the backend directory. Seeds a scratch database, gives one hot
+product --stock units split over --shards rows, then has --processes x
+--threads workers each run checkout transactions (an order row plus a stock
+reservation for 1-3 units, the way POST /orders does) until the product sells
+out. --release-rate of the orders then report a failed payment, which puts
+their stock back for others to take. Afterwards the books must balance:
+units held or committed plus units still available equal --stock, no shard is
+negative, and every unit was sold (no order was refused while stock
+remained). Exits 1 otherwise.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.seed import seed  # noqa: E402
+
+HOT_PRODUCT = "prod_1"
+
+
+def worker(args, counts, seed_value: int) -> None:
+  """Check out the hot product until it sells out; runs in a forked process."""
+  from sqlalchemy import insert
+  from sqlalchemy.exc import OperationalError
+
+  from app.database import SessionLocal
+  from app.ids import new_order_id
+  from app.inventory import OutOfStock, release_reservations, reserve_stock
+  from app.models import OrderDB
+
+  today = date.today().isoformat()
+  local = {"orders": 0, "units": 0, "released": 0, "sold_out": 0, "errors": 0}
+  lock = threading.Lock()
+
+  def run(thread: int) -> None:
+    rng = random.Random(seed_value * 1000 + thread)
+    stats = dict.fromkeys(local, 0)
+    db = SessionLocal()
+    try:
+      while True:
+        order_id = new_order_id()
+        quantity = rng.randint(1, 3)
+        try:
+          db.execute(insert(OrderDB), {"id": order_id, "date": today, "status": "Processing", "total": 0})
+          reserve_stock(db, order_id, [(HOT_PRODUCT, quantity)])
+          db.commit()
+        except OutOfStock:
+          db.rollback()
+          stats["sold_out"] += 1
+          if quantity == 1:
+            break  # not even one unit left
+          continue
+        except OperationalError:
+          db.rollback()
+          stats["errors"] += 1
+          continue
+        stats["orders"] += 1
+        stats["units"] += quantity
+        if rng.random() < args.release_rate:
+          stats["released"] += release_reservations(db, order_id)
+          db.commit()
+    finally:
+      db.close()
+      with lock:
+        for key, value in stats.items():
+          local[key] += value
+
+  threads = [threading.Thread(target=run, args=(i,)) for i in range(args.threads)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  counts.put(local)
+
+
+def audit(stock: int) -> dict:
+  from sqlalchemy import func, select
+
+  from app.database import SessionLocal
+  from app.models import StockReservationDB, StockShardDB
+
+  with SessionLocal() as db:
+    shards = list(db.scalars(select(StockShardDB.available).where(StockShardDB.product_id == HOT_PRODUCT)))
+    reserved = dict(db.execute(
+      select(StockReservationDB.status, func.sum(StockReservationDB.quantity))
+      .where(StockReservationDB.product_id == HOT_PRODUCT)
+      .group_by(StockReservationDB.status)
+    ).all())
+  held = int(reserved.get("held") or 0) + int(reserved.get("committed") or 0)
+  return {
+    "available": sum(shards),
+    "negativeShards": sum(1 for available in shards if available < 0),
+    "reservedUnits": held,
+    "releasedUnits": int(reserved.get("released") or 0),
+    "oversold": max(0, held - stock),
+    "balanced": held + sum(shards) == stock,
+  }
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--stock", type=int, default=20_000, help="units of the hot product")
+  parser.add_argument("--shards", type=int, default=8, help="stock rows the units are split over")
+  parser.add_argument("--processes", type=int, default=4)
+  parser.add_argument("--threads", type=int, default=4, help="threads per process")
+  parser.add_argument("--release-rate", type=float, default=0.1, help="share of orders whose payment fails")
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--output", help="write results JSON here")
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory(prefix="gtr-inventory-") as tmp:
+    url = f"sqlite:///{tmp}/inventory.db"
+    os.environ["DATABASE_URL"] = url  # before anything imports app.database
+    seed(url, 100, 0, args.seed)
+    from app.database import SessionLocal, engine
+    from app.inventory import set_stock
+
+    with SessionLocal() as db:
+      set_stock(db, HOT_PRODUCT, args.stock, args.shards)
+      db.commit()
+    engine.dispose()  # workers open their own connections
+
+    context = multiprocessing.get_context("fork")
+    counts = context.Queue()
+    processes = [
+      context.Process(target=worker, args=(args, counts, args.seed + i)) for i in range(args.processes)
+    ]
+    print(
+      f"{args.processes} processes x {args.threads} threads reserving {args.stock:,} units "
+      f"over {args.shards} shards...", flush=True,
+    )
+    start = time.perf_counter()
+    for process in processes:
+      process.start()
+    totals: dict[str, int] = {}
+    for _ in processes:
+      for key, value in counts.get().items():
+        totals[key] = totals.get(key, 0) + value
+    for process in processes:
+      process.join()
+    seconds = time.perf_counter() - start
+    books = audit(args.stock)
+
+  results = {
+    "args": {key: value for key, value in vars(args).items() if key != "output"},
+    "seconds": round(seconds, 2),
+    "reservationsPerSecond": round(totals["orders"] / seconds, 1),
+    **totals,
+    **books,
+  }
+  print(
+    f"{totals['orders']:,} reservations ({totals['units']:,} units, {totals['released']:,} released) "
+    f"in {seconds:.2f}s: {results['reservationsPerSecond']:,.0f}/s; "
+    f"{totals['sold_out']:,} refused as sold out, {totals['errors']:,} database errors"
+  )
+  failures = []
+  if not books["balanced"]:
+    failures.append(f"reserved {books['reservedUnits']} + available {books['available']} != stock {args.stock}")
+  if books["oversold"]:
+    failures.append(f"oversold by {books['oversold']} units")
+  if books["negativeShards"]:
+    failures.append(f"{books['negativeShards']} shards below zero")
+  if books["available"]:
+    failures.append(f"{books['available']} units left unsold")
+  results["failures"] = failures
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(results, f, indent=2)
+  for failure in failures:
+    print(f"FAIL {failure}")
+  if not failures:
+    print(f"ok   {books['reservedUnits']:,} units reserved of {args.stock:,}, none oversold")
+  return 1 if failures else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
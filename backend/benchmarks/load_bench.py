@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+HTTP load benchmark for the API
+Usage: python -m benchmarks.load_bench [--products 10k] [--seconds 10] [--concurrency 16] [--output results.json]
+
+Run from the backend directory. Seeds a synthetic catalog (see
+benchmarks/seed.py) into a scratch SQLite database, starts the Razorpay stub
+and the API under serve.py with the fake SES client, then runs each scenario
+for --seconds with --concurrency closed-loop clients:
+
+  browse    GET /products with a mix of q/brand/category/price/sort filters
+  detail    GET /products/{id}, including a few unknown ids
+  orders    POST /orders with 1-4 line items and an Idempotency-Key, retrying 5%
+  checkout  POST /orders, /payments/create-order and /payments/verify
+
+Throughput and p50/p95/p99 latency per endpoint are printed and written as
+JSON; compare two runs with `python -m benchmarks.compare`. Pass --base-url
+and --stub-url to drive servers you started yourself instead.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from .seed import FITMENTS, VARIANTS, parse_count, seed
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KEY_ID = "rzp_test_bench"
+KEY_SECRET = "bench_secret"
+SEARCH_TERMS = ["turbo", "brake", "exhaust", "led", "carbon", "cooling", "suspension", "filter"]
+SORTS = [None, "price-asc", "price-desc", "rating-desc"]
+PRICE_RANGES = [(None, None), (None, 500), (200, 1000), (1000, None), (100, 300)]
+
+
+class Recorder:
+  """Latency samples and failures per endpoint label."""
+
+  def __init__(self):
+    self.samples: dict[str, list[float]] = {}
+    self.errors: dict[str, dict[str, int]] = {}
+
+  async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, expect=(200,), **kwargs):
+    start = time.perf_counter()
+    try:
+      response = await client.request(method, url, **kwargs)
+      status = str(response.status_code)
+    except httpx.HTTPError as e:
+      response, status = None, type(e).__name__
+    self.samples.setdefault(label, []).append(time.perf_counter() - start)
+    if response is None or response.status_code not in expect:
+      errors = self.errors.setdefault(label, {})
+      errors[status] = errors.get(status, 0) + 1
+      return None
+    return response
+
+  def summary(self, seconds: float) -> dict:
+    return {label: stats(samples, self.errors.get(label, {}), seconds) for label, samples in self.samples.items()}
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+  """Nearest-rank percentile of an already sorted list."""
+  return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def stats(samples: list[float], errors: dict[str, int], seconds: float) -> dict:
+  ordered = sorted(samples)
+  ms = lambda value: round(value * 1000, 3)  # noqa: E731
+  return {
+    "requests": len(ordered),
+    "errors": sum(errors.values()),
+    "errorStatuses": errors,
+    "rps": round(len(ordered) / seconds, 1),
+    "meanMs": ms(sum(ordered) / len(ordered)),
+    "p50Ms": ms(percentile(ordered, 0.50)),
+    "p95Ms": ms(percentile(ordered, 0.95)),
+    "p99Ms": ms(percentile(ordered, 0.99)),
+    "maxMs": ms(ordered[-1]),
+  }
+
+
+# ===== Scenarios =====
+# Each scenario makes one iteration's worth of requests for one client.
+
+async def browse(ctx: "Context", rng: random.Random) -> None:
+  params = {}
+  if rng.random() < 0.3:
+    params["q"] = rng.choice(SEARCH_TERMS + VARIANTS + FITMENTS).lower()
+  if rng.random() < 0.4:
+    params["brand"] = rng.choice(ctx.brands)
+  if rng.random() < 0.4:
+    params["category"] = rng.choice(ctx.categories)
+  min_price, max_price = rng.choice(PRICE_RANGES)
+  if min_price is not None:
+    params["minPrice"] = min_price
+  if max_price is not None:
+    params["maxPrice"] = max_price
+  sort = rng.choice(SORTS)
+  if sort:
+    params["sort"] = sort
+  if rng.random() < 0.2:
+    params["offset"] = rng.choice([100, 200, 500])
+  if rng.random() < 0.2:
+    params["facets"] = "true"
+  params["limit"] = rng.choice([20, 50, 100])
+  await ctx.recorder.request(ctx.api, "GET /products", "GET", "/products", params=params)
+
+
+async def detail(ctx: "Context", rng: random.Random) -> None:
+  if rng.random() < 0.05:
+    await ctx.recorder.request(
+      ctx.api, "GET /products/{id}", "GET", f"/products/prod_missing_{rng.randrange(10 ** 6)}", expect=(404,),
+    )
+  else:
+    await ctx.recorder.request(ctx.api, "GET /products/{id}", "GET", f"/products/prod_{rng.randint(1, ctx.products)}")
+
+
+async def place_order(ctx: "Context", rng: random.Random) -> dict | None:
+  picks = rng.sample(range(1, ctx.products + 1), min(ctx.products, rng.randint(1, 4)))
+  body = {
+    "items": [{"productId": f"prod_{pick}", "quantity": rng.randint(1, 3)} for pick in picks],
+    "customerEmail": f"bench{rng.randrange(1000)}@example.com",
+  }
+  headers = {"Idempotency-Key": f"bench-{rng.getrandbits(64):016x}"}
+  response = await ctx.recorder.request(
+    ctx.api, "POST /orders", "POST", "/orders", expect=(201,), json=body, headers=headers,
+  )
+  if response is not None and rng.random() < 0.05:
+    # A client retrying after a lost response; answered from the stored one.
+    await ctx.recorder.request(
+      ctx.api, "POST /orders (retry)", "POST", "/orders", expect=(201,), json=body, headers=headers,
+    )
+  return response.json()["order"] if response is not None else None
+
+
+async def orders(ctx: "Context", rng: random.Random) -> None:
+  await place_order(ctx, rng)
+
+
+async def checkout(ctx: "Context", rng: random.Random) -> None:
+  order = await place_order(ctx, rng)
+  if order is None:
+    return
+  response = await ctx.recorder.request(
+    ctx.api, "POST /payments/create-order", "POST", "/payments/create-order",
+    json={"amount": order["total"], "receipt": order["id"]},
+  )
+  if response is None:
+    return
+  # The customer paying through Razorpay checkout; not part of the API.
+  payment = (await ctx.stub.post("/stub/payments", json={"order_id": response.json()["id"]})).json()
+  await ctx.recorder.request(ctx.api, "POST /payments/verify", "POST", "/payments/verify", json={
+    "razorpay_order_id": response.json()["id"],
+    "razorpay_payment_id": payment["payment"]["id"],
+    "razorpay_signature": payment["razorpay_signature"],
+    "order_id": order["id"],
+    "shipping_details": {
+      "name": "Bench Customer", "email": f"bench{rng.randrange(1000)}@example.com", "phone": "9999999999",
+      "address": "1 Test Street", "city": "Pune", "state": "MH", "zip": "411001",
+    },
+  })
+
+
+SCENARIOS = {"browse": browse, "detail": detail, "orders": orders, "checkout": checkout}
+
+
+class Context:
+  def __init__(self, api: httpx.AsyncClient, stub: httpx.AsyncClient | None, products: int, brands, categories):
+    self.api = api
+    self.stub = stub
+    self.products = products
+    self.brands = brands
+    self.categories = categories
+    self.recorder = Recorder()
+
+
+async def run_scenario(name: str, args, base_url: str, stub_url: str | None) -> dict:
+  limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+  async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as api, \
+      httpx.AsyncClient(base_url=stub_url or base_url, limits=limits, timeout=30) as stub:
+    catalog = (await api.get("/products", params={"limit": 1, "facets": "true"})).json()
+    ctx = Context(
+      api, stub if stub_url else None, catalog["total"],
+      [facet["value"] for facet in catalog["facets"]["brands"]],
+      [facet["value"] for facet in catalog["facets"]["categories"]],
+    )
+    step = SCENARIOS[name]
+
+    async def client(index: int, deadline: float) -> None:
+      rng = random.Random(f"{args.seed}:{name}:{index}")
+      while time.perf_counter() < deadline:
+        await step(ctx, rng)
+
+    if args.warmup:
+      await asyncio.gather(*(client(i, time.perf_counter() + args.warmup) for i in range(args.concurrency)))
+      ctx.recorder = Recorder()
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i, start + args.seconds) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+  return {"seconds": round(elapsed, 2), "concurrency": args.concurrency, "endpoints": ctx.recorder.summary(elapsed)}
+
+
+# ===== Servers =====
+
+def free_port() -> int:
+  with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    return sock.getsockname()[1]
+
+
+def start_server(app: str, port: int, env: dict) -> subprocess.Popen:
+  return subprocess.Popen(
+    [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning", "--no-access-log"],
+    cwd=BACKEND_DIR, env={**os.environ, **env},
+  )
+
+
+def start_api(port: int, env: dict, workers: int) -> subprocess.Popen:
+  """Start the API the way production runs it: preforked by serve.py."""
+  return subprocess.Popen(
+    [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+     "--log-level", "warning"],
+    cwd=BACKEND_DIR, env={**os.environ, **env},
+  )
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 600) -> None:
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    if process.poll() is not None:
+      raise RuntimeError(f"server for {url} exited with {process.returncode}")
+    try:
+      httpx.get(url, timeout=1)
+      return
+    except httpx.HTTPError:
+      time.sleep(0.2)
+  raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def stop(process: subprocess.Popen) -> None:
+  process.terminate()
+  try:
+    process.wait(timeout=30)
+  except subprocess.TimeoutExpired:
+    process.kill()
+
+
+def git_revision() -> dict:
+  def git(*args) -> str:
+    return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+
+  return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+def print_results(results: dict) -> None:
+  print(f"{'scenario':<10} {'endpoint':<28} {'req':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+  for name, scenario in results["scenarios"].items():
+    for label, s in scenario["endpoints"].items():
+      print(
+        f"{name:<10} {label:<28} {s['requests']:>7} {s['errors']:>5} {s['rps']:>8.1f} "
+        f"{s['p50Ms']:>8.2f} {s['p95Ms']:>8.2f} {s['p99Ms']:>8.2f}"
+      )
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--products", type=parse_count, default=parse_count("10k"), help="catalog size: 10, 10k, 1m")
+  parser.add_argument("--orders", type=parse_count, default=parse_count("5k"), help="seeded order history")
+  parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ",".join(SCENARIOS))
+  parser.add_argument("--seconds", type=float, default=10.0, help="measured time per scenario")
+  parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured time per scenario")
+  parser.add_argument("--concurrency", type=int, default=16)
+  parser.add_argument("--workers", type=int, default=1, help="API worker processes (serve.py --workers)")
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--db", help="reuse this seeded SQLite file instead of a scratch one")
+  parser.add_argument("--base-url", help="benchmark an already running API")
+  parser.add_argument("--stub-url", help="Razorpay stub used by that API (needed for checkout)")
+  parser.add_argument("--output", help="write results JSON here")
+  args = parser.parse_args()
+
+  scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+  unknown = set(scenarios) - set(SCENARIOS)
+  if unknown:
+    parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+  if args.base_url and "checkout" in scenarios and not args.stub_url:
+    parser.error("--stub-url is required for the checkout scenario with --base-url")
+
+  results = {
+    "meta": {
+      **git_revision(),
+      "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+      "cpus": os.cpu_count(),
+      "args": {key: value for key, value in vars(args).items() if key != "output"},
+    },
+    "scenarios": {},
+  }
+  processes = []
+  with tempfile.TemporaryDirectory(prefix="gtr-bench-") as tmp:
+    try:
+      base_url, stub_url = args.base_url, args.stub_url
+      if not base_url:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+        if not os.path.exists(db_path):
+          print(f"seeding {args.products:,} products and {args.orders:,} orders...", flush=True)
+          results["seed"] = seed(f"sqlite:///{os.path.abspath(db_path)}", args.products, args.orders, args.seed)
+        stub_port, api_port = free_port(), free_port()
+        stub_url, base_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{api_port}"
+        processes.append(start_server("stubs.razorpay_stub:app", stub_port, {"RAZORPAY_KEY_SECRET": KEY_SECRET}))
+        processes.append(start_api(api_port, {
+          "DATABASE_URL": f"sqlite:///{os.path.abspath(db_path)}",
+          "RAZORPAY_API_BASE": stub_url,
+          "RAZORPAY_KEY_ID": KEY_ID,
+          "RAZORPAY_KEY_SECRET": KEY_SECRET,
+          "EMAIL_BACKEND": "fake",
+        }, args.workers))
+        wait_until_up(f"{stub_url}/stub/stats", processes[0])
+        started = time.perf_counter()
+        wait_until_up(f"{base_url}/health", processes[1])
+        results["meta"]["startupSeconds"] = round(time.perf_counter() - started, 2)
+
+      for name in scenarios:
+        print(f"running {name} for {args.seconds:g}s at concurrency {args.concurrency}...", flush=True)
+        results["scenarios"][name] = asyncio.run(run_scenario(name, args, base_url, stub_url))
+    finally:
+      for process in reversed(processes):
+        stop(process)
+
+  print_results(results)
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(results, f, indent=2)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+End-to-end check of payment webhooks and reconciliation
+Usage: python -m benchmarks.payment_check
+
+Run from the backend directory. Seeds a scratch database and starts the
+Razorpay stub, set to send webhooks, and the API under serve.py. Then it pays
+for orders the way src/app/checkout/page.tsx does: POST /orders, then
+/payments/create-order for the cart total plus shipping with the order id as
+the receipt, then a payment in the stub, but never /payments/verify. Each
+order must reach the expected state through webhooks alone, or through the
+reconciler once the stub drops the webhooks. Exits 1 otherwise.
+"""
+
+from __future__ import annotations
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.load_bench import KEY_ID, KEY_SECRET, free_port, start_api, start_server, stop, wait_until_up  # noqa: E402
+from benchmarks.seed import seed  # noqa: E402
+
+WEBHOOK_SECRET = "check_webhook_secret"
+SHIPPING_PAISE = 15 * 100  # added by the checkout page
+RECONCILE_SECONDS = 2
+
+
+def checkout(api: httpx.Client, stub: httpx.Client, status: str = "captured") -> str:
+  """Place an order and pay for it like the checkout page; returns the order id."""
+  order = api.post("/orders", json={"items": [{"productId": "prod_1", "quantity": 2}]}).json()["order"]
+  gateway_order = api.post("/payments/create-order", json={
+    "amount": (round(order["total"] * 100) + SHIPPING_PAISE) / 100,
+    "receipt": order["id"],
+  }).json()
+  stub.post("/stub/payments", json={"order_id": gateway_order["id"], "status": status}).raise_for_status()
+  return order["id"]
+
+
+def wait_for(api: httpx.Client, order_ids: list[str], expected: tuple[str, str], timeout: float) -> dict:
+  """Poll until every order has (payment_status, status) == expected; returns the last states seen."""
+  deadline = time.monotonic() + timeout
+  while True:
+    orders = {order["id"]: order for order in api.get("/orders", params={"limit": 500}).json()["items"]}
+    states = {order_id: (orders[order_id]["payment_status"], orders[order_id]["status"]) for order_id in order_ids}
+    if all(state == expected for state in states.values()) or time.monotonic() > deadline:
+      return states
+
+
+def main() -> int:
+  failures = 0
+
+  def check(name: str, states: dict, expected: tuple[str, str]) -> None:
+    nonlocal failures
+    wrong = {order_id: state for order_id, state in states.items() if state != expected}
+    failures += bool(wrong)
+    print(f"{'FAIL' if wrong else 'ok  '} {name}: {len(states) - len(wrong)}/{len(states)} {'/'.join(expected)}")
+    for order_id, state in wrong.items():
+      print(f"       {order_id} is {'/'.join(map(str, state))}")
+
+  with tempfile.TemporaryDirectory(prefix="gtr-payments-") as tmp:
+    url = f"sqlite:///{tmp}/payments.db"
+    seed(url, 100, 0, 0)
+    stub_port, api_port = free_port(), free_port()
+    stub_url, base_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{api_port}"
+    processes = [start_server("stubs.razorpay_stub:app", stub_port, {
+      "RAZORPAY_KEY_SECRET": KEY_SECRET,
+      "RAZORPAY_WEBHOOK_SECRET": WEBHOOK_SECRET,
+      "RAZORPAY_STUB_WEBHOOK_URL": f"{base_url}/payments/webhook",
+    })]
+    try:
+      processes.append(start_api(api_port, {
+        "DATABASE_URL": url,
+        "RAZORPAY_API_BASE": stub_url,
+        "RAZORPAY_KEY_ID": KEY_ID,
+        "RAZORPAY_KEY_SECRET": KEY_SECRET,
+        "RAZORPAY_WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "PAYMENT_EVENT_POLL_SECONDS": "0.2",
+        "PAYMENT_RECONCILE_SECONDS": str(RECONCILE_SECONDS),
+        "EMAIL_BACKEND": "fake",
+      }, 2))
+      wait_until_up(f"{stub_url}/stub/stats", processes[0])
+      wait_until_up(f"{base_url}/health", processes[1])
+
+      with httpx.Client(base_url=base_url, timeout=30) as api, httpx.Client(base_url=stub_url, timeout=30) as stub:
+        paid = [checkout(api, stub) for _ in range(5)]
+        check("captured, applied from webhooks", wait_for(api, paid, ("paid", "confirmed"), 10), ("paid", "confirmed"))
+        failed = [checkout(api, stub, "failed") for _ in range(2)]
+        check("failed, applied from webhooks", wait_for(api, failed, ("failed", "Processing"), 10), ("failed", "Processing"))
+
+        stub.post("/stub/faults", json={"webhook_drop_rate": 1}).raise_for_status()
+        lost = [checkout(api, stub) for _ in range(5)]
+        check(
+          "captured, webhooks lost, reconciled",
+          wait_for(api, lost, ("paid", "confirmed"), RECONCILE_SECONDS * 5), ("paid", "confirmed"),
+        )
+        webhooks = stub.get("/stub/stats").json()["webhooks"]
+        print(f"     stub webhooks: {webhooks}")
+        if webhooks["failed"]:
+          failures += 1
+          print(f"FAIL {webhooks['failed']} webhooks were rejected by the API")
+    finally:
+      for process in reversed(processes):
+        stop(process)
+
+  return 1 if failures else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Synthetic catalog and order seeding for benchmarks
+Usage: python -m benchmarks.seed --db /tmp/bench.db [--products 10k] [--orders 5k]
+
+Run from the backend directory. Products are variations of the seed catalog
+in app/data.py (same brands, categories, price range and image fields), with
+ids prod_1..prod_N so the first eight line up with the real ones. Orders
+spread over the last 180 days with a realistic payment status mix. Output is
+deterministic for a given --seed.
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CHUNK_SIZE = 10_000
+VARIANTS = ["Sport", "Track", "Street", "Pro", "Elite", "Stage 2", "Carbon", "Lite", "GT", "Rally", "Touring", "RS"]
+FITMENTS = ["Nissan GT-R", "Supra", "WRX", "Civic Type R", "Golf R", "M3", "Mustang", "Evo X", "RX-7", "370Z"]
+PAYMENT_STATUSES = [("paid", 0.7), ("pending", 0.2), ("failed", 0.1)]
+
+
+def parse_count(value: str) -> int:
+  """Parse 10, 10k or 1m style counts."""
+  value = value.strip().lower()
+  scale = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+  return int(float(value[:-1] if scale > 1 else value) * scale)
+
+
+def synthetic_products(count: int, seed: int = 0):
+  """Yield product rows modelled on `app.data.products`."""
+  from app.data import products
+
+  rng = random.Random(seed)
+  for index in range(count):
+    base = products[index % len(products)]
+    if index < len(products):
+      yield base.model_dump()
+      continue
+    variant, fitment = rng.choice(VARIANTS), rng.choice(FITMENTS)
+    yield {
+      "id": f"prod_{index + 1}",
+      "name": f"{base.name} {variant} for {fitment}",
+      "description": f"{base.description}. {variant} spec, fits {fitment}.",
+      "price": round(base.price * rng.uniform(0.4, 1.8), 2),
+      "brand": base.brand,
+      "category": base.category,
+      "imageUrl": base.imageUrl,
+      "imageHint": base.imageHint,
+      "rating": round(min(5.0, max(1.0, rng.gauss(base.rating, 0.3))), 1),
+      "reviewCount": rng.randint(0, base.reviewCount * 3),
+      "discount": rng.choice([0, 0, 5, 8, 10, 12, 15, 20]),
+    }
+
+
+def synthetic_orders(count: int, prices: list[float], seed: int = 0):
+  """Yield (order row, item rows) for `count` orders over the given products."""
+  rng = random.Random(seed + 1)
+  today = date.today()
+  statuses, weights = zip(*PAYMENT_STATUSES)
+  for index in range(count):
+    lines = [
+      (product, rng.randint(1, 3))
+      for product in rng.sample(range(len(prices)), min(len(prices), rng.randint(1, 4)))
+    ]
+    payment_status = rng.choices(statuses, weights)[0]
+    order_id = f"ORD-SEED-{index + 1:08d}"
+    order = {
+      "id": order_id,
+      "date": (today - timedelta(days=rng.randrange(180))).isoformat(),
+      "status": "confirmed" if payment_status == "paid" else "Processing",
+      "total": round(sum(prices[product] * qty for product, qty in lines), 2),
+      "payment_status": payment_status,
+      "razorpay_order_id": f"order_seed{index + 1:08d}" if payment_status != "pending" else None,
+      "customer_email": f"customer{index % 5000}@example.com",
+    }
+    items = [
+      {"order_id": order_id, "product_id": f"prod_{product + 1}", "quantity": qty}
+      for product, qty in lines
+    ]
+    yield order, items
+
+
+def _chunks(rows, size: int = CHUNK_SIZE):
+  chunk = []
+  for row in rows:
+    chunk.append(row)
+    if len(chunk) == size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+
+def seed(database_url: str, products: int, orders: int, seed: int = 0) -> dict:
+  """Migrate a new database at `database_url` and fill it; returns row counts and timing."""
+  from sqlalchemy import create_engine, insert
+
+  from app.data import brands
+  from app.models import BrandDB, OrderDB, OrderItemDB, ProductDB
+  from app.schema import upgrade_schema
+
+  start = time.perf_counter()
+  engine = create_engine(database_url)
+  upgrade_schema(engine)
+  prices = []
+  with engine.begin() as connection:
+    connection.execute(insert(BrandDB), [brand.model_dump() for brand in brands])
+    for chunk in _chunks(synthetic_products(products, seed)):
+      connection.execute(insert(ProductDB), chunk)
+      prices.extend(row["price"] for row in chunk)
+    for chunk in _chunks(synthetic_orders(orders, prices, seed), CHUNK_SIZE // 4):
+      connection.execute(insert(OrderDB), [order for order, _ in chunk])
+      connection.execute(insert(OrderItemDB), [item for _, items in chunk for item in items])
+  engine.dispose()
+  return {"products": products, "orders": orders, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--db", required=True, help="SQLite file to create; must not exist")
+  parser.add_argument("--products", type=parse_count, default=parse_count("10k"), help="e.g. 10, 10k, 1m")
+  parser.add_argument("--orders", type=parse_count, default=parse_count("5k"))
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args()
+
+  if os.path.exists(args.db):
+    parser.error(f"{args.db} already exists")
+  result = seed(f"sqlite:///{os.path.abspath(args.db)}", args.products, args.orders, args.seed)
+  print(f"seeded {result['products']:,} products and {result['orders']:,} orders in {result['seconds']}s")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Cold start profile and budget check
+Usage: python -m benchmarks.startup_profile [--runs 5] [--budget-ms 1500] [--output startup.json]
+
+Run from the backend directory. Starts fresh interpreters that import
+app.main and run its startup hook, against a new database (migrations and
+seeding) and against one that is already migrated (what a scaled-out worker
+sees). Prints the median and worst time per phase plus the slowest imports,
+and exits 1 if the warm start goes over --budget-ms or loads a module that
+should only be imported on first use.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded on first use only; a warm start that imports one of these regressed.
+LAZY_MODULES = ["boto3", "botocore", "razorpay", "requests", "alembic"]
+
+CHILD = f"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main as main
+imported = time.perf_counter()
+main.startup_event()
+timings = {{"import": round((imported - start) * 1000, 1), **main.startup_timings}}
+timings["total"] = round(timings["import"] + main.startup_timings["total"], 1)
+loaded = [name for name in {LAZY_MODULES!r} if name in sys.modules]
+asyncio.run(main.shutdown_event())
+print(json.dumps({{"timings": timings, "loaded": loaded}}))
+"""
+
+
+def run_child(database_url: str, *python_args: str) -> subprocess.CompletedProcess:
+  return subprocess.run(
+    [sys.executable, *python_args, "-c", CHILD], cwd=BACKEND_DIR, capture_output=True, text=True,
+    env={**os.environ, "DATABASE_URL": database_url},
+  )
+
+
+def measure(database_url: str) -> dict:
+  result = run_child(database_url)
+  if result.returncode:
+    raise RuntimeError(f"startup failed:\n{result.stderr}")
+  return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(database_url: str, count: int) -> list[tuple[str, int]]:
+  """Modules imported directly by a top-level import (`app.main`'s own
+  imports, mostly), by cumulative time from `-X importtime`."""
+  totals: dict[str, int] = {}
+  for line in run_child(database_url, "-X", "importtime").stderr.splitlines():
+    if not line.startswith("import time:") or "|" not in line:
+      continue
+    _, cumulative, name = line[len("import time:"):].split("|")
+    if not cumulative.strip().isdigit():
+      continue
+    name = name.rstrip()
+    depth = (len(name) - len(name.lstrip())) // 2
+    if depth == 1:
+      totals[name.strip()] = max(totals.get(name.strip(), 0), int(cumulative))
+  return sorted(totals.items(), key=lambda item: -item[1])[:count]
+
+
+def summarize(samples: list[dict]) -> dict:
+  phases = list(samples[0]["timings"])
+  return {
+    phase: {
+      "medianMs": round(statistics.median(sample["timings"].get(phase, 0) for sample in samples), 1),
+      "maxMs": round(max(sample["timings"].get(phase, 0) for sample in samples), 1),
+    }
+    for phase in phases
+  }
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--runs", type=int, default=5, help="interpreters started per case")
+  parser.add_argument("--budget-ms", type=float, default=1500.0, help="allowed median warm start, import included")
+  parser.add_argument("--imports", type=int, default=12, help="slowest imports to list")
+  parser.add_argument("--output", help="write results JSON here")
+  args = parser.parse_args()
+
+  results = {"budgetMs": args.budget_ms, "cases": {}}
+  with tempfile.TemporaryDirectory(prefix="gtr-startup-") as tmp:
+    cases = {"fresh database": [], "migrated database": []}
+    for run in range(args.runs):
+      url = f"sqlite:///{tmp}/fresh-{run}.db"
+      cases["fresh database"].append(measure(url))
+      cases["migrated database"].append(measure(url))
+    imports = slowest_imports(f"sqlite:///{tmp}/fresh-0.db", args.imports)
+
+  for case, samples in cases.items():
+    summary = summarize(samples)
+    loaded = sorted({name for sample in samples for name in sample["loaded"]})
+    results["cases"][case] = {"phases": summary, "lazyModulesLoaded": loaded}
+    print(f"{case} ({args.runs} runs)")
+    for phase, timing in summary.items():
+      print(f"  {phase:<10} median {timing['medianMs']:>8.1f} ms   max {timing['maxMs']:>8.1f} ms")
+    if loaded:
+      print(f"  loaded at startup: {', '.join(loaded)}")
+  results["slowestImports"] = [{"module": name, "ms": round(us / 1000, 1)} for name, us in imports]
+  print("slowest imports (cumulative)")
+  for name, us in imports:
+    print(f"  {name:<40} {us / 1000:>8.1f} ms")
+
+  warm = results["cases"]["migrated database"]
+  failures = []
+  if warm["phases"]["total"]["medianMs"] > args.budget_ms:
+    failures.append(f"warm start {warm['phases']['total']['medianMs']} ms is over the {args.budget_ms:g} ms budget")
+  if warm["lazyModulesLoaded"]:
+    failures.append(f"warm start imported {', '.join(warm['lazyModulesLoaded'])}")
+  results["failures"] = failures
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(results, f, indent=2)
+  for failure in failures:
+    print(f"FAIL {failure}")
+  if not failures:
+    print(f"ok   warm start within {args.budget_ms:g} ms")
+  return 1 if failures else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,60 @@
+from __future__ import annotations
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import DATABASE_URL, create_db_engine
+from app.models import Base
+
+config = context.config
+# Programmatic callers (see migrations/explain_checks.py) set
+# configure_logger=False to keep their own logging setup.
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+  fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def database_url() -> str:
+  return config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+
+def run_migrations_offline() -> None:
+  url = database_url()
+  context.configure(
+    url=url,
+    target_metadata=target_metadata,
+    literal_binds=True,
+    render_as_batch=url.startswith("sqlite"),
+  )
+  with context.begin_transaction():
+    context.run_migrations()
+
+
+def _run(connection) -> None:
+  context.configure(
+    connection=connection,
+    target_metadata=target_metadata,
+    render_as_batch=connection.dialect.name == "sqlite",
+  )
+  with context.begin_transaction():
+    context.run_migrations()
+
+
+def run_migrations_online() -> None:
+  connection = config.attributes.get("connection")
+  if connection is not None:
+    _run(connection)
+    return
+  engine = create_db_engine(database_url())
+  try:
+    with engine.connect() as connection:
+      _run(connection)
+  finally:
+    engine.dispose()
+
+
+if context.is_offline_mode():
+  run_migrations_offline()
+else:
+  run_migrations_online()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Query plan regression checks for the indexes added in migrations
+Usage: python -m migrations.explain_checks   (from the backend directory)
+
+Migrates a scratch SQLite database to head, runs EXPLAIN QUERY PLAN on each
+query pattern an index exists for, and fails if the planner stops using that
+index. Also fails if the migrated schema's indexes drift from the models'.
+"""
+
+from __future__ import annotations
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.crud import orders_query, products_query  # noqa: E402
+from app.inventory import expired_orders_query  # noqa: E402
+from app.models import Base  # noqa: E402
+from app.payments import due_events_query, event_orders_query, unpaid_orders_query  # noqa: E402
+
+# (index, description, statement) for every index added for a query pattern;
+# each statement comes from the query builder the app itself runs.
+CHECKS = [
+  (
+    "ix_products_lower_brand_price",
+    "brand filter with price range",
+    lambda: products_query(brand="BrakeMax", min_price=100, max_price=500),
+  ),
+  (
+    "ix_products_lower_category_price",
+    "category filter with price floor",
+    lambda: products_query(category="braking", min_price=100),
+  ),
+  (
+    "ix_orders_payment_status_date",
+    "orders by payment status and date range",
+    lambda: orders_query(payment_status="paid", date_from="2026-01-01", date_to="2026-01-31"),
+  ),
+  (
+    "ix_orders_razorpay_order_id",
+    "webhook event orders by Razorpay order id or receipt",
+    lambda: event_orders_query(["order_abc123"], ["ord_abc123"]),
+  ),
+  (
+    "ix_stock_reservations_status_expires_at",
+    "expired stock reservations",
+    lambda: expired_orders_query(datetime(2026, 1, 1)),
+  ),
+  (
+    "ix_payment_events_status_id",
+    "unprocessed webhook events in arrival order",
+    lambda: due_events_query(datetime(2026, 1, 1), 100),
+  ),
+  (
+    "ix_orders_payment_status_date",
+    "unpaid orders for payment reconciliation",
+    lambda: unpaid_orders_query("2026-01-01"),
+  ),
+]
+
+
+def query_plan(connection, statement) -> list[str]:
+  sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+  return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def index_names(engine) -> set[str]:
+  # Read sqlite_master directly: reflection skips expression indexes.
+  with engine.connect() as connection:
+    return set(connection.exec_driver_sql(
+      "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    ).scalars())
+
+
+def main() -> int:
+  failures = 0
+  with tempfile.TemporaryDirectory() as tmp:
+    migrated = create_engine(f"sqlite:///{tmp}/migrated.db")
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.attributes["configure_logger"] = False
+    with migrated.begin() as connection:
+      config.attributes["connection"] = connection
+      command.upgrade(config, "head")
+
+    with migrated.connect() as connection:
+      for index, description, build in CHECKS:
+        plan = query_plan(connection, build())
+        used = any(f"INDEX {index} " in step + " " for step in plan)
+        failures += not used
+        print(f"{'ok  ' if used else 'FAIL'} {index}: {description}")
+        for step in plan:
+          print(f"       {step}")
+
+    declared = create_engine(f"sqlite:///{tmp}/declared.db")
+    Base.metadata.create_all(declared)
+    drift = index_names(migrated) ^ index_names(declared)
+    if drift:
+      failures += 1
+      print(f"FAIL migrations and models disagree on indexes: {sorted(drift)}")
+    else:
+      print("ok   migrated indexes match the models")
+    migrated.dispose()
+    declared.dispose()
+
+  return 1 if failures else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,119 @@
+"""Baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Matches the tables `Base.metadata.create_all` has been creating. Tables that
+already exist are left alone, so databases created before migrations were
+introduced can simply be upgraded.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+  if "products" not in existing:
+    op.create_table(
+      "products",
+      sa.Column("id", sa.String(), nullable=False),
+      sa.Column("name", sa.String(), nullable=False),
+      sa.Column("description", sa.Text(), nullable=False),
+      sa.Column("price", sa.Float(), nullable=False),
+      sa.Column("brand", sa.String(), nullable=False),
+      sa.Column("category", sa.String(), nullable=False),
+      sa.Column("imageUrl", sa.String(), nullable=False),
+      sa.Column("imageHint", sa.String(), nullable=False),
+      sa.Column("rating", sa.Float(), nullable=False),
+      sa.Column("reviewCount", sa.Integer(), nullable=True),
+      sa.Column("discount", sa.Integer(), nullable=True),
+      sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_products_id", "products", ["id"])
+    op.create_index("ix_products_name", "products", ["name"])
+    op.create_index("ix_products_brand", "products", ["brand"])
+    op.create_index("ix_products_category", "products", ["category"])
+
+  if "brands" not in existing:
+    op.create_table(
+      "brands",
+      sa.Column("id", sa.String(), nullable=False),
+      sa.Column("name", sa.String(), nullable=False),
+      sa.Column("logoUrl", sa.String(), nullable=False),
+      sa.Column("logoHint", sa.String(), nullable=False),
+      sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_brands_id", "brands", ["id"])
+    op.create_index("ix_brands_name", "brands", ["name"], unique=True)
+
+  if "orders" not in existing:
+    op.create_table(
+      "orders",
+      sa.Column("id", sa.String(), nullable=False),
+      sa.Column("date", sa.String(), nullable=False),
+      sa.Column("status", sa.String(), nullable=False),
+      sa.Column("total", sa.Float(), nullable=False),
+      sa.Column("payment_status", sa.String(), nullable=True),
+      sa.Column("razorpay_order_id", sa.String(), nullable=True),
+      sa.Column("razorpay_payment_id", sa.String(), nullable=True),
+      sa.Column("razorpay_signature", sa.String(), nullable=True),
+      sa.Column("customer_name", sa.String(), nullable=True),
+      sa.Column("customer_email", sa.String(), nullable=True),
+      sa.Column("customer_phone", sa.String(), nullable=True),
+      sa.Column("shipping_address", sa.String(), nullable=True),
+      sa.Column("shipping_city", sa.String(), nullable=True),
+      sa.Column("shipping_state", sa.String(), nullable=True),
+      sa.Column("shipping_zip", sa.String(), nullable=True),
+      sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_orders_id", "orders", ["id"])
+
+  if "order_items" not in existing:
+    op.create_table(
+      "order_items",
+      sa.Column("order_id", sa.String(), nullable=False),
+      sa.Column("product_id", sa.String(), nullable=False),
+      sa.Column("quantity", sa.Integer(), nullable=False),
+      sa.ForeignKeyConstraint(["order_id"], ["orders.id"]),
+      sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+      sa.PrimaryKeyConstraint("order_id", "product_id"),
+    )
+
+  if "email_outbox" not in existing:
+    op.create_table(
+      "email_outbox",
+      sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+      sa.Column("kind", sa.String(), nullable=False),
+      sa.Column("to_email", sa.String(), nullable=False),
+      sa.Column("payload", sa.Text(), nullable=False),
+      sa.Column("status", sa.String(), nullable=False),
+      sa.Column("attempts", sa.Integer(), nullable=False),
+      sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+      sa.Column("claimed_by", sa.String(), nullable=True),
+      sa.Column("locked_until", sa.DateTime(), nullable=True),
+      sa.Column("last_error", sa.Text(), nullable=True),
+      sa.Column("message_id", sa.String(), nullable=True),
+      sa.Column("created_at", sa.DateTime(), nullable=False),
+      sa.Column("sent_at", sa.DateTime(), nullable=True),
+      sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_email_outbox_status", "email_outbox", ["status"])
+    op.create_index("ix_email_outbox_next_attempt_at", "email_outbox", ["next_attempt_at"])
+    op.create_index("ix_email_outbox_claimed_by", "email_outbox", ["claimed_by"])
+
+
+def downgrade() -> None:
+  op.drop_table("email_outbox")
+  op.drop_table("order_items")
+  op.drop_table("orders")
+  op.drop_table("brands")
+  op.drop_table("products")
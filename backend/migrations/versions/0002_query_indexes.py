@@ -0,0 +1,48 @@
+"""Indexes for the product filter and order lookup query patterns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Brand and category filters are case-insensitive equality matches, usually
+combined with a price range, so they get (lower(column), price) expression
+indexes alongside plain (column, price) ones; the latter also make the old
+single-column brand/category indexes redundant. Orders gain indexes for
+payment-status/date listing and for lookups by Razorpay order id.
+migrations/explain_checks.py verifies each index against its query.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.drop_index("ix_products_brand", table_name="products", if_exists=True)
+  op.drop_index("ix_products_category", table_name="products", if_exists=True)
+  op.create_index("ix_products_category_price", "products", ["category", "price"], if_not_exists=True)
+  op.create_index("ix_products_brand_price", "products", ["brand", "price"], if_not_exists=True)
+  op.create_index(
+    "ix_products_lower_category_price", "products", [sa.text("lower(category)"), "price"], if_not_exists=True,
+  )
+  op.create_index(
+    "ix_products_lower_brand_price", "products", [sa.text("lower(brand)"), "price"], if_not_exists=True,
+  )
+  op.create_index("ix_orders_payment_status_date", "orders", ["payment_status", "date"], if_not_exists=True)
+  op.create_index("ix_orders_razorpay_order_id", "orders", ["razorpay_order_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+  op.drop_index("ix_orders_razorpay_order_id", table_name="orders")
+  op.drop_index("ix_orders_payment_status_date", table_name="orders")
+  op.drop_index("ix_products_lower_brand_price", table_name="products")
+  op.drop_index("ix_products_lower_category_price", table_name="products")
+  op.drop_index("ix_products_brand_price", table_name="products")
+  op.drop_index("ix_products_category_price", table_name="products")
+  op.create_index("ix_products_category", "products", ["category"])
+  op.create_index("ix_products_brand", "products", ["brand"])
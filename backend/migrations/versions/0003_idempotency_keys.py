@@ -0,0 +1,36 @@
+"""Idempotency keys for order creation
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Stores the response to each POST /orders and /orders/bulk request sent with an
+Idempotency-Key header, so a retry gets the original order back instead of
+creating another. See app/idempotency.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.create_table(
+    "idempotency_keys",
+    sa.Column("key", sa.String(), nullable=False),
+    sa.Column("fingerprint", sa.String(), nullable=False),
+    sa.Column("status_code", sa.Integer(), nullable=False),
+    sa.Column("response", sa.Text(), nullable=False),
+    sa.Column("created_at", sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint("key"),
+  )
+  op.create_index("ix_idempotency_keys_created_at", "idempotency_keys", ["created_at"])
+
+
+def downgrade() -> None:
+  op.drop_table("idempotency_keys")
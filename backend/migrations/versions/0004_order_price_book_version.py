@@ -0,0 +1,28 @@
+"""Record the price book version each order was priced at
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Order totals come from the in-memory price book (app/pricing.py), which is
+rebuilt for every catalog version; the version is stored with the order so a
+total can be traced back to the prices it used. Existing orders keep NULL.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.add_column("orders", sa.Column("price_book_version", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+  with op.batch_alter_table("orders") as batch:
+    batch.drop_column("price_book_version")
@@ -0,0 +1,53 @@
+"""Sharded stock counters and stock reservations
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+A tracked product's available stock is split over several stock_shards rows,
+which are decremented with conditional UPDATEs (available >= n), so the CHECK
+constraint is a backstop rather than the mechanism. stock_reservations
+records what each order took, from which shard, and whether the hold is
+still pending payment. See app/inventory.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.create_table(
+    "stock_shards",
+    sa.Column("product_id", sa.String(), nullable=False),
+    sa.Column("shard", sa.Integer(), nullable=False),
+    sa.Column("available", sa.Integer(), nullable=False),
+    sa.CheckConstraint("available >= 0", name="ck_stock_shards_available"),
+    sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+    sa.PrimaryKeyConstraint("product_id", "shard"),
+  )
+  op.create_table(
+    "stock_reservations",
+    sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column("order_id", sa.String(), nullable=False),
+    sa.Column("product_id", sa.String(), nullable=False),
+    sa.Column("shard", sa.Integer(), nullable=False),
+    sa.Column("quantity", sa.Integer(), nullable=False),
+    sa.Column("status", sa.String(), nullable=False),
+    sa.Column("expires_at", sa.DateTime(), nullable=False),
+    sa.Column("created_at", sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(["order_id"], ["orders.id"]),
+    sa.PrimaryKeyConstraint("id"),
+  )
+  op.create_index("ix_stock_reservations_order_id", "stock_reservations", ["order_id"])
+  op.create_index("ix_stock_reservations_status_expires_at", "stock_reservations", ["status", "expires_at"])
+
+
+def downgrade() -> None:
+  op.drop_table("stock_reservations")
+  op.drop_table("stock_shards")
@@ -0,0 +1,43 @@
+"""Razorpay webhook events
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+POST /payments/webhook stores each signed delivery here and acknowledges it;
+a background consumer applies them to orders in arrival order. event_id is
+unique, so Razorpay's redeliveries of an event are stored once. See
+app/payments.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.create_table(
+    "payment_events",
+    sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column("event_id", sa.String(), nullable=False),
+    sa.Column("event", sa.String(), nullable=False),
+    sa.Column("body", sa.Text(), nullable=False),
+    sa.Column("received_at", sa.DateTime(), nullable=False),
+    sa.Column("status", sa.String(), nullable=False),
+    sa.Column("claimed_by", sa.String(), nullable=True),
+    sa.Column("locked_until", sa.DateTime(), nullable=True),
+    sa.Column("outcome", sa.Text(), nullable=True),
+    sa.Column("processed_at", sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint("id"),
+    sa.UniqueConstraint("event_id"),
+  )
+  op.create_index("ix_payment_events_status_id", "payment_events", ["status", "id"])
+
+
+def downgrade() -> None:
+  op.drop_table("payment_events")
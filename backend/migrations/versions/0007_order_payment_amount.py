@@ -0,0 +1,29 @@
+"""Record the amount each order's Razorpay order was created for
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Checkout charges shipping on top of the order total, so captures reported
+by webhooks or found by the reconciler are checked against the amount of the
+linked Razorpay order rather than the total. Existing orders keep NULL and
+are checked against their total.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.add_column("orders", sa.Column("payment_amount_paise", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+  with op.batch_alter_table("orders") as batch:
+    batch.drop_column("payment_amount_paise")
@@ -0,0 +1,28 @@
+"""Drop the plain (brand, price) and (category, price) product indexes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Every brand and category filter the app runs compares lower(column), which
+only the expression indexes from 0002 serve, so the plain indexes were
+never used and only slowed down product writes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.drop_index("ix_products_brand_price", table_name="products", if_exists=True)
+  op.drop_index("ix_products_category_price", table_name="products", if_exists=True)
+
+
+def downgrade() -> None:
+  op.create_index("ix_products_category_price", "products", ["category", "price"])
+  op.create_index("ix_products_brand_price", "products", ["brand", "price"])
@@ -0,0 +1,33 @@
+"""Record a hash of the prices each order was priced at
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+`orders.price_book_version` held the catalog version, a counter local to one
+process that restarts at 0, so the same number named different prices after
+a restart. It now holds `PriceBook.digest` (app/pricing.py), a hash of the
+product ids and prices, which names the same prices everywhere. The old
+counters identify nothing and are cleared.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.execute("UPDATE orders SET price_book_version = NULL")
+  with op.batch_alter_table("orders") as batch:
+    batch.alter_column("price_book_version", type_=sa.String(), existing_nullable=True)
+
+
+def downgrade() -> None:
+  op.execute("UPDATE orders SET price_book_version = NULL")
+  with op.batch_alter_table("orders") as batch:
+    batch.alter_column("price_book_version", type_=sa.Integer(), existing_nullable=True)
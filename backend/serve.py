@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Production server: preforked uvicorn workers sharing one preloaded app
+Usage: python serve.py [--host 0.0.0.0] [--port 4000] [--workers N]
+
+The parent process imports the app, migrates and seeds the database and
+loads the catalog, then forks the workers. They inherit the catalog
+copy-on-write and share the listening socket, so the kernel spreads
+connections across them. Product changes made by any worker reach the others
+through a shared `InvalidationBus`. POSIX only; use uvicorn directly for
+development (see start.sh).
+
+The bus is an anonymous shared mapping, so only processes forked from this
+parent see it. A write made by another process (an admin script calling
+`invalidate_catalog()`, say) does not reach running workers; send the parent
+HUP afterwards: it reloads the catalog, which invalidates it in every worker,
+before the rolling restart.
+
+One worker at a time also runs the background jobs (email outbox, stock
+reservation sweeper, payment event consumer and reconciler); the others only
+serve requests. Work they queue is picked up by that worker's next poll.
+
+Workers default to WEB_CONCURRENCY, else one per CPU this process may use.
+
+Signals to the parent:
+  TERM, INT  stop: workers finish in-flight requests, then exit
+  HUP        reload the catalog, then rolling restart: each worker is
+             replaced by a fresh fork in turn
+  TTIN, TTOU add or remove a worker
+Workers that die are replaced.
+"""
+
+from __future__ import annotations
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+
+def default_workers() -> int:
+  if os.getenv("WEB_CONCURRENCY"):
+    return int(os.environ["WEB_CONCURRENCY"])
+  try:
+    return len(os.sched_getaffinity(0))
+  except AttributeError:  # not available on macOS
+    return os.cpu_count() or 1
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+  family = socket.AF_INET6 if ":" in host else socket.AF_INET
+  sock = socket.socket(family, socket.SOCK_STREAM)
+  sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+  sock.bind((host, port))
+  sock.listen(backlog)
+  sock.set_inheritable(True)
+  return sock
+
+
+class Arbiter:
+  """Forks and supervises the workers."""
+
+  def __init__(self, app, sock: socket.socket, workers: int, args, reload=None):
+    self.app = app
+    self.reload = reload
+    self.sock = sock
+    self.target = workers
+    self.args = args
+    self.workers: dict[int, float] = {}  # pid -> start time
+    self.jobs_pid: int | None = None  # the worker running background jobs
+    self.retiring: set[int] = set()
+    self.stopping = False
+    self.restart_requested = False
+
+  def spawn(self, jobs: bool | None = None) -> int:
+    """Fork a worker; it runs the background jobs if `jobs`, by default if
+    no other worker does."""
+    jobs = self.jobs_pid is None if jobs is None else jobs
+    pid = os.fork()
+    if pid:
+      self.workers[pid] = time.monotonic()
+      if jobs:
+        self.jobs_pid = pid
+      return pid
+    self._run_worker(jobs)  # never returns
+
+  def _run_worker(self, jobs: bool) -> None:
+    import uvicorn
+
+    import app.main as main_module
+
+    main_module.background_jobs = jobs
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU, signal.SIGCHLD):
+      signal.signal(signum, signal.SIG_DFL)
+    config = uvicorn.Config(
+      self.app,
+      log_level=self.args.log_level,
+      access_log=self.args.access_log,
+      timeout_graceful_shutdown=self.args.graceful_timeout,
+      timeout_keep_alive=self.args.keep_alive,
+    )
+    status = 0
+    try:
+      uvicorn.Server(config).run(sockets=[self.sock])
+    except BaseException as e:
+      print(f"Worker {os.getpid()} crashed: {e!r}", file=sys.stderr)
+      status = 1
+    finally:
+      sys.stdout.flush()
+      sys.stderr.flush()
+      os._exit(status)
+
+  def run(self) -> None:
+    signal.signal(signal.SIGTERM, self._on_stop)
+    signal.signal(signal.SIGINT, self._on_stop)
+    signal.signal(signal.SIGHUP, self._on_restart)
+    signal.signal(signal.SIGTTIN, lambda *_: self._resize(1))
+    signal.signal(signal.SIGTTOU, lambda *_: self._resize(-1))
+    for _ in range(self.target):
+      self.spawn()
+    print(f"Serving on {self.args.host}:{self.args.port} with {self.target} workers (parent pid {os.getpid()})")
+
+    while not self.stopping:
+      self._reap()
+      if self.restart_requested:
+        self.restart_requested = False
+        if self.reload:
+          try:
+            self.reload()
+          except Exception as e:
+            print(f"Reload failed, restarting with the old catalog: {e!r}", file=sys.stderr)
+        self._rolling_restart()
+      self._maintain()
+      time.sleep(0.2)
+    self._shutdown()
+
+  def _on_stop(self, signum, frame) -> None:
+    self.stopping = True
+
+  def _on_restart(self, signum, frame) -> None:
+    self.restart_requested = True
+
+  def _resize(self, delta: int) -> None:
+    self.target = max(1, self.target + delta)
+
+  def _reap(self) -> None:
+    while True:
+      try:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+      except ChildProcessError:
+        return
+      if not pid:
+        return
+      started = self.workers.pop(pid, None)
+      if pid == self.jobs_pid:
+        self.jobs_pid = None
+      if pid in self.retiring:
+        self.retiring.discard(pid)
+      elif started is not None and not self.stopping:
+        print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; replacing it", file=sys.stderr)
+        if time.monotonic() - started < RESPAWN_BACKOFF_SECONDS:
+          time.sleep(RESPAWN_BACKOFF_SECONDS)  # don't spin on a worker that dies at startup
+
+  def _maintain(self) -> None:
+    active = [pid for pid in self.workers if pid not in self.retiring]
+    for _ in range(self.target - len(active)):
+      self.spawn()
+    # Scale down by retiring the oldest workers, sparing the jobs worker.
+    spare = sorted((pid for pid in active if pid != self.jobs_pid), key=self.workers.get)
+    for pid in spare[:max(0, len(active) - self.target)]:
+      self._retire(pid)
+
+  def _retire(self, pid: int) -> None:
+    self.retiring.add(pid)
+    try:
+      os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+      pass
+
+  def _rolling_restart(self) -> None:
+    """Replace workers one at a time, starting each replacement before
+    retiring the worker it replaces so capacity never drops."""
+    for pid in list(self.workers):
+      if self.stopping:
+        return
+      if pid in self.retiring:
+        continue
+      self.spawn(jobs=pid == self.jobs_pid)  # jobs overlap briefly; they all claim work atomically
+      time.sleep(self.args.restart_delay)
+      self._retire(pid)
+      self._reap()
+
+  def _shutdown(self) -> None:
+    for pid in list(self.workers):
+      self._retire(pid)
+    deadline = time.monotonic() + self.args.graceful_timeout + 5
+    while self.workers and time.monotonic() < deadline:
+      self._reap()
+      time.sleep(0.1)
+    for pid in list(self.workers):
+      print(f"Worker {pid} did not stop in time; killing it", file=sys.stderr)
+      try:
+        os.kill(pid, signal.SIGKILL)
+      except ProcessLookupError:
+        pass
+    self.sock.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+  parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "4000")))
+  parser.add_argument("--workers", type=int, default=default_workers())
+  parser.add_argument("--backlog", type=int, default=2048)
+  parser.add_argument("--graceful-timeout", type=int, default=30, help="seconds a stopping worker gets to finish requests")
+  parser.add_argument("--keep-alive", type=int, default=5, help="idle keep-alive timeout in seconds")
+  parser.add_argument("--restart-delay", type=float, default=1.0, help="pause between replacements on HUP")
+  parser.add_argument("--log-level", default="info")
+  parser.add_argument("--access-log", action="store_true")
+  args = parser.parse_args()
+
+  sys.path.insert(0, BACKEND_DIR)
+  sock = bind_socket(args.host, args.port, args.backlog)
+
+  import app.main as main_module
+  from app.catalog import catalog
+  from app.database import async_engine, engine
+  from app.invalidation_bus import InvalidationBus
+  from app.pricing import pricing
+
+  # Attach first, so the seed's invalidations go through the bus too and the
+  # preloaded snapshot's version is the bus generation the workers start at.
+  catalog.attach_bus(InvalidationBus())
+  main_module.preload()
+  print("Preloaded: " + ", ".join(f"{name} {ms:g}ms" for name, ms in main_module.startup_timings.items()))
+
+  def prepare_fork() -> None:
+    # Connections must not be shared across fork; workers open their own.
+    engine.dispose()
+    async_engine.sync_engine.dispose()
+    # Keep the preloaded objects out of the collector's reach, so collections
+    # in the workers do not write to (and so copy) the shared pages.
+    gc.collect()
+    gc.freeze()
+
+  def reload() -> None:
+    """Pick up writes made outside the workers: the invalidation goes
+    through the bus, and the fresh snapshot is inherited by new forks."""
+    catalog.invalidate()
+    pricing.book(catalog.snapshot())
+    prepare_fork()
+
+  prepare_fork()
+  Arbiter(main_module.app, sock, args.workers, args, reload).run()
+
+
+if __name__ == "__main__":
+  main()
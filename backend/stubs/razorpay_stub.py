@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Local Razorpay API stub
+Usage: uvicorn stubs.razorpay_stub:app --port 4010
+Then run the backend with RAZORPAY_API_BASE=http://localhost:4010
+
+Implements the order and payment endpoints the backend calls, keeping state
+in memory. Latency and failures can be injected with the env vars below or at
+runtime through POST /stub/faults:
+  RAZORPAY_STUB_LATENCY_MS         delay added to every API call
+  RAZORPAY_STUB_ERROR_RATE         fraction of calls answered 503 without effect
+  RAZORPAY_STUB_LOST_RESPONSE_RATE fraction of calls that take effect but answer 504
+
+With RAZORPAY_STUB_WEBHOOK_URL set (e.g. http://localhost:4000/payments/webhook),
+simulated payments are also reported there as webhooks signed with
+RAZORPAY_WEBHOOK_SECRET. RAZORPAY_STUB_WEBHOOK_DROP_RATE (or the
+webhook_drop_rate fault) loses that fraction of them, as the reconciler must
+cope with.
+"""
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import secrets
+import string
+import time
+from typing import Optional
+
+import httpx
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse
+
+KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET", "")
+WEBHOOK_URL = os.getenv("RAZORPAY_STUB_WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET", "")
+
+app = FastAPI(title="Razorpay stub")
+
+faults = {
+  "latency_ms": float(os.getenv("RAZORPAY_STUB_LATENCY_MS", "0")),
+  "error_rate": float(os.getenv("RAZORPAY_STUB_ERROR_RATE", "0")),
+  "lost_response_rate": float(os.getenv("RAZORPAY_STUB_LOST_RESPONSE_RATE", "0")),
+  "webhook_drop_rate": float(os.getenv("RAZORPAY_STUB_WEBHOOK_DROP_RATE", "0")),
+}
+orders: dict[str, dict] = {}
+payments: dict[str, dict] = {}
+calls = {"total": 0, "failed": 0, "lost": 0}
+webhooks = {"sent": 0, "dropped": 0, "failed": 0}
+_deliveries: set[asyncio.Task] = set()
+
+
+def _id(prefix: str) -> str:
+  return prefix + "_" + "".join(secrets.choice(string.ascii_letters + string.digits) for _ in range(14))
+
+
+def _error(status_code: int, description: str, code: str = "BAD_REQUEST_ERROR") -> JSONResponse:
+  return JSONResponse({"error": {"code": code, "description": description}}, status_code=status_code)
+
+
+def _collection(items: list[dict], count: int, skip: int) -> dict:
+  page = items[skip:skip + count]
+  return {"entity": "collection", "count": len(page), "items": page}
+
+
+async def _deliver(event: str, entities: dict) -> None:
+  body = json.dumps({
+    "entity": "event",
+    "event": event,
+    "contains": list(entities),
+    "payload": {name: {"entity": entity} for name, entity in entities.items()},
+    "created_at": int(time.time()),
+  }).encode()
+  headers = {
+    "Content-Type": "application/json",
+    "X-Razorpay-Event-Id": _id("evt"),
+    "X-Razorpay-Signature": hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest(),
+  }
+  try:
+    async with httpx.AsyncClient(timeout=5) as client:
+      response = await client.post(WEBHOOK_URL, content=body, headers=headers)
+    response.raise_for_status()
+    webhooks["sent"] += 1
+  except httpx.HTTPError:
+    webhooks["failed"] += 1
+
+
+def _send_webhook(event: str, **entities: dict) -> None:
+  """Report an event to RAZORPAY_STUB_WEBHOOK_URL after the response is sent."""
+  if not WEBHOOK_URL:
+    return
+  if random.random() < faults["webhook_drop_rate"]:
+    webhooks["dropped"] += 1
+    return
+  task = asyncio.create_task(_deliver(event, entities))
+  _deliveries.add(task)
+  task.add_done_callback(_deliveries.discard)
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+  if request.url.path.startswith("/stub"):
+    return await call_next(request)
+  calls["total"] += 1
+  if faults["latency_ms"]:
+    await asyncio.sleep(faults["latency_ms"] / 1000)
+  if random.random() < faults["error_rate"]:
+    calls["failed"] += 1
+    return _error(503, "Injected failure", "SERVER_ERROR")
+  response = await call_next(request)
+  if random.random() < faults["lost_response_rate"]:
+    calls["lost"] += 1
+    return _error(504, "Injected lost response", "GATEWAY_ERROR")
+  return response
+
+
+@app.post("/v1/orders")
+async def create_order(request: Request):
+  data = await request.json()
+  amount = data.get("amount")
+  if not isinstance(amount, int) or amount < 100:
+    return _error(400, "The amount must be atleast INR 1.00")
+  receipt = data.get("receipt")
+  if receipt is not None and len(receipt) > 40:
+    return _error(400, "receipt: the length must be no more than 40.")
+  order = {
+    "id": _id("order"),
+    "entity": "order",
+    "amount": amount,
+    "amount_paid": 0,
+    "amount_due": amount,
+    "currency": data.get("currency", "INR"),
+    "receipt": receipt,
+    "status": "created",
+    "attempts": 0,
+    "notes": data.get("notes") or [],
+    "created_at": int(time.time()),
+  }
+  orders[order["id"]] = order
+  return order
+
+
+@app.get("/v1/orders")
+def list_orders(receipt: Optional[str] = None, count: int = 10, skip: int = 0):
+  items = [order for order in reversed(orders.values()) if receipt is None or order["receipt"] == receipt]
+  return _collection(items, min(count, 100), skip)
+
+
+@app.get("/v1/orders/{order_id}")
+def fetch_order(order_id: str):
+  order = orders.get(order_id)
+  if order is None:
+    return _error(400, "The id provided does not exist")
+  return order
+
+
+@app.get("/v1/payments")
+def list_payments(
+  from_: Optional[int] = Query(default=None, alias="from"),
+  to: Optional[int] = None,
+  count: int = 10,
+  skip: int = 0,
+):
+  items = [
+    payment for payment in reversed(payments.values())
+    if (from_ is None or payment["created_at"] >= from_) and (to is None or payment["created_at"] <= to)
+  ]
+  return _collection(items, min(count, 100), skip)
+
+
+@app.get("/v1/payments/{payment_id}")
+def fetch_payment(payment_id: str):
+  payment = payments.get(payment_id)
+  if payment is None:
+    return _error(400, "The id provided does not exist")
+  return payment
+
+
+@app.post("/stub/payments")
+async def simulate_payment(request: Request):
+  """Pay an order as checkout would; returns the payment and the signature
+  the browser would post to /payments/verify."""
+  data = await request.json()
+  order = orders.get(data.get("order_id"))
+  if order is None:
+    return _error(400, "The id provided does not exist")
+  status = data.get("status", "captured")
+  payment = {
+    "id": _id("pay"),
+    "entity": "payment",
+    "amount": order["amount"],
+    "currency": order["currency"],
+    "status": status,
+    "order_id": order["id"],
+    "method": data.get("method", "upi"),
+    "captured": status == "captured",
+    "email": data.get("email"),
+    "created_at": int(time.time()),
+  }
+  payments[payment["id"]] = payment
+  order["attempts"] += 1
+  if status == "captured":
+    order.update(status="paid", amount_paid=order["amount"], amount_due=0)
+    _send_webhook("payment.captured", payment=payment)
+    _send_webhook("order.paid", payment=payment, order=order)
+  elif status == "failed":
+    _send_webhook("payment.failed", payment=payment)
+  signature = hmac.new(
+    KEY_SECRET.encode(), f"{order['id']}|{payment['id']}".encode(), hashlib.sha256,
+  ).hexdigest()
+  return {"payment": payment, "razorpay_signature": signature}
+
+
+@app.post("/stub/faults")
+async def set_faults(request: Request):
+  faults.update({key: float(value) for key, value in (await request.json()).items() if key in faults})
+  return faults
+
+
+@app.get("/stub/stats")
+def stats():
+  return {"calls": calls, "orders": len(orders), "payments": len(payments), "webhooks": webhooks, "faults": faults}
+
+
+@app.post("/stub/reset")
+def reset():
+  orders.clear()
+  payments.clear()
+  calls.update(total=0, failed=0, lost=0)
+  webhooks.update(sent=0, dropped=0, failed=0)
+  faults.update(latency_ms=0, error_rate=0, lost_response_rate=0, webhook_drop_rate=0)
+  return {"ok": True}
@@ -21,7 +21,7 @@ import { useToast } from '@/hooks/use-toast';
 import { Lock, Loader2 } from 'lucide-react';
 import Image from 'next/image';
 import Link from 'next/link';
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 
 const formSchema = z.object({
   name: z.string().min(2, 'Name is too short'),
@@ -54,6 +54,9 @@ export default function CheckoutPage() {
   const { toast } = useToast();
   const [isProcessing, setIsProcessing] = useState(false);
   const [razorpayLoaded, setRazorpayLoaded] = useState(false);
+  // One Idempotency-Key per cart, so resubmitting after a network error
+  // returns the order already created instead of placing a second one.
+  const orderAttempt = useRef<{ body: string; key: string } | null>(null);
 
   const form = useForm<z.infer<typeof formSchema>>({
     resolver: zodResolver(formSchema),
@@ -100,10 +103,18 @@ export default function CheckoutPage() {
         quantity,
       }));
 
+      const orderBody = JSON.stringify({ items: orderItems });
+      if (orderAttempt.current?.body !== orderBody) {
+        orderAttempt.current = { body: orderBody, key: crypto.randomUUID() };
+      }
+
       const createOrderRes = await fetch(`${API_BASE}/orders`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ items: orderItems }),
+        headers: {
+          'Content-Type': 'application/json',
+          'Idempotency-Key': orderAttempt.current.key,
+        },
+        body: orderBody,
       });
 
       if (!createOrderRes.ok) {
@@ -202,6 +213,20 @@ export default function CheckoutPage() {
       };
 
       const razorpay = new window.Razorpay(options);
+      // Releases the order's stock hold; a retry in the same modal that
+      // succeeds still goes through /payments/verify, which re-reserves it.
+      razorpay.on('payment.failed', (response: any) => {
+        fetch(`${API_BASE}/payments/failure`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({
+            order_id: orderId,
+            razorpay_order_id: razorpayOrder.id,
+            razorpay_payment_id: response.error?.metadata?.payment_id,
+            reason: response.error?.description,
+          }),
+        }).catch((error) => console.error('Failed to report payment failure:', error));
+      });
       razorpay.open();
     } catch (error) {
       console.error('Checkout error:', error);